@@ -1,81 +1,70 @@
 from flask_cors import CORS
 from flask import Flask
-from database import init_db, db
+from database import init_db
+from cache import init_cache
+from limites import init_limites
+from respostas import init_respostas
+from werkzeug.middleware.proxy_fix import ProxyFix
+from comandos import registrar_comandos
 from routes.pessoas import pessoas_bp
 from routes.livros import livros_bp
 from routes.emprestimos import emprestimos_bp
 from routes.auth import auth_bp
 from routes.indicacoes import indicacoes_bp
 from routes.categorias import categorias_bp
+from routes.admin import admin_bp
+from routes.tarefas import tarefas_bp
+from routes.estatisticas import estatisticas_bp
 from flask_jwt_extended import JWTManager
+from utils import identidade
 import os 
 from datetime import timedelta
-from models.usuario import Usuario
-from models.pessoa import Pessoa
 
-app = Flask(__name__)
-init_db(app)
-CORS(app)
+def create_app():
+    """
+    Monta o app sem nenhum acesso ao banco. Esquema e administrador padrão
+    ficam no CLI (flask preparar-banco) ou no master do gunicorn.
+    """
+    app = Flask(__name__)
+    init_db(app)
+    init_cache(app)
+    init_limites(app)
+    init_respostas(app)
+    CORS(app)
 
-app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "chave_padrao_insegura_dev")
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=5)
+    # Atrás de proxy (Railway), o IP do cliente vem em X-Forwarded-For
+    proxies = int(os.getenv("PROXIES_CONFIAVEIS", "0"))
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
 
-jwt = JWTManager(app)
+    app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "chave_padrao_insegura_dev")
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=5)
 
-with app.app_context():
-    try:
-        db.create_all()
-        print("Tabelas verificadas/criadas com sucesso")
+    jwt = JWTManager(app)
+    identidade.registrar(jwt)
 
-        admin_existente = Usuario.query.filter_by(role="FUNCIONARIO").first()
+    app.register_blueprint(pessoas_bp)
+    app.register_blueprint(livros_bp)
+    app.register_blueprint(emprestimos_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(indicacoes_bp)
+    app.register_blueprint(categorias_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(tarefas_bp)
+    app.register_blueprint(estatisticas_bp)
 
-        if not admin_existente:
-            print("Nenhum administrador encontrado. Criando conta padrão...")
+    registrar_comandos(app)
 
-            admin_pessoa = Pessoa(
-                nome="Administrador do Sistema",
-                cpf="00000000000", 
-                idade=99,
-                email="admin@biblioteca.com",
-                numero="000000000",
-                tipo="FUNCIONARIO"
-            )
-            
-            db.session.add(admin_pessoa)
-            db.session.flush() 
+    @app.route("/")
+    def home():
+        return "API da Biblioteca está rodando com sucesso!"
 
-            admin_user = Usuario(
-                pessoa_id=admin_pessoa.id,
-                username="admin",
-                role="FUNCIONARIO"
-            )
-            admin_user.set_senha("admin123") 
+    return app
 
-            db.session.add(admin_user)
-            db.session.commit()
-            
-            print("="*50)
-            print("ADMINISTRADOR PADRÃO CRIADO:")
-            print("Username: admin")
-            print("Senha:    admin123")
-            print("="*50)
-        else:
-            print("Administrador já existe no sistema.")
-            
-    except Exception as e:
-        db.session.rollback()
-        print("Erro ao inicializar banco de dados:", e)
-
-app.register_blueprint(pessoas_bp)
-app.register_blueprint(livros_bp)
-app.register_blueprint(emprestimos_bp)
-app.register_blueprint(auth_bp)
-app.register_blueprint(indicacoes_bp)
-app.register_blueprint(categorias_bp)
-
-@app.route("/")
-def home():
-    return "API da Biblioteca está rodando com sucesso!"
+app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    from comandos import preparar_banco
+    with app.app_context():
+        preparar_banco()
+    app.run(debug=True)
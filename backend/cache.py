@@ -0,0 +1,205 @@
+"""
+Cache de leitura (read-through) para os endpoints do acervo.
+
+Backends:
+- "memoria" (padrão): LRU com TTL dentro do processo.
+- "redis": qualquer cliente compatível com redis-py (get/set/delete/scan_iter),
+  o que permite usar um fake local nos testes.
+
+Configuração por ambiente: CACHE_BACKEND, CACHE_TTL, CACHE_MAX_ITENS, REDIS_URL.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import Flask
+
+
+class CacheMemoria:
+    def __init__(self, max_itens=1024):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor, ttl):
+        with self._lock:
+            self._itens[chave] = (valor, time.monotonic() + ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def delete(self, *chaves):
+        with self._lock:
+            for chave in chaves:
+                self._itens.pop(chave, None)
+
+    def delete_prefixo(self, prefixo):
+        with self._lock:
+            for chave in [c for c in self._itens if c.startswith(prefixo)]:
+                del self._itens[chave]
+
+    def tamanho(self):
+        return len(self._itens)
+
+
+class CacheRedis:
+    def __init__(self, cliente, namespace="biblioteca:"):
+        self.cliente = cliente
+        self.namespace = namespace
+
+    def get(self, chave):
+        bruto = self.cliente.get(self.namespace + chave)
+        return json.loads(bruto) if bruto is not None else None
+
+    def set(self, chave, valor, ttl):
+        self.cliente.set(self.namespace + chave, json.dumps(valor), ex=int(ttl))
+
+    def delete(self, *chaves):
+        if chaves:
+            self.cliente.delete(*[self.namespace + c for c in chaves])
+
+    def delete_prefixo(self, prefixo):
+        chaves = list(self.cliente.scan_iter(match=self.namespace + prefixo + "*"))
+        if chaves:
+            self.cliente.delete(*chaves)
+
+    def tamanho(self):
+        return sum(1 for _ in self.cliente.scan_iter(match=self.namespace + "*"))
+
+
+class Cache:
+    def __init__(self, backend=None, ttl=60):
+        self.backend = backend or CacheMemoria()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+
+    def obter_ou_calcular(self, chave, calcular, ttl=None, versoes=None, linhas=None, guarda=()):
+        """
+        `versoes`: chaves de versão (models/versao.py) do que o valor lê, de
+        tabelas ("categorias") ou de linhas ("livros:42"). O item guarda as
+        versões com que foi montado e só vale enquanto forem as atuais: a
+        invalidação explícita só alcança o cache do processo que escreveu.
+
+        `linhas(valor)`: chaves de linha que só se conhecem depois de montar o
+        valor (os livros de uma página). Elas são lidas depois do cálculo; por
+        isso `guarda` lista tabelas que toda escrita nessas linhas também
+        versiona e, se alguma mudar durante o cálculo, o valor não é guardado.
+        """
+        from models.versao import VersaoTabela
+
+        item = self.backend.get(chave)
+        if item is not None:
+            chaves, lidas, valor = item
+            if not chaves or VersaoTabela.obter(chaves) == lidas:
+                self.hits += 1
+                return valor
+
+        self.misses += 1
+        chaves = list(versoes or ())
+        vigiadas = chaves + list(guarda)
+        # Lidas antes do cálculo: se mudarem no meio, o item já nasce vencido
+        antes = VersaoTabela.obter(vigiadas) if vigiadas else []
+        valor = calcular()
+        if valor is None:
+            return valor
+
+        lidas = antes[:len(chaves)]
+        if linhas:
+            extras = list(linhas(valor))
+            depois = VersaoTabela.obter(vigiadas + extras)
+            if depois[:len(vigiadas)] != antes:
+                return valor
+            chaves += extras
+            lidas += depois[len(vigiadas):]
+        self.backend.set(chave, [chaves, lidas, valor], ttl or self.ttl)
+        return valor
+
+    def invalidar(self, *chaves):
+        self.invalidacoes += len(chaves)
+        self.backend.delete(*chaves)
+
+    def invalidar_prefixo(self, prefixo):
+        self.invalidacoes += 1
+        self.backend.delete_prefixo(prefixo)
+
+    def estatisticas(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": round(self.hits / total, 4) if total else None,
+            "invalidacoes": self.invalidacoes,
+            "itens": self.backend.tamanho(),
+            "ttl": self.ttl
+        }
+
+
+cache = Cache()
+
+
+def init_cache(app: Flask):
+    tipo = os.getenv("CACHE_BACKEND", "memoria")
+    cache.ttl = int(os.getenv("CACHE_TTL", "60"))
+
+    if tipo == "redis":
+        import redis
+        cache.backend = CacheRedis(redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0")))
+    else:
+        cache.backend = CacheMemoria(int(os.getenv("CACHE_MAX_ITENS", "1024")))
+
+    app.extensions["cache"] = cache
+
+
+# Chaves usadas pelas rotas
+
+CHAVE_CATEGORIAS = "categorias"
+
+
+def chave_livro(id):
+    return f"livro:{id}"
+
+
+def chave_livros_inicio(per_page):
+    return f"livros:inicio:{per_page}"
+
+
+def chave_indicacoes(dia):
+    return f"indicacoes:{dia.isoformat()}"
+
+
+def invalidar_livros(*ids):
+    """
+    Invalida o que exibe dados de livros: os livros informados (ou todos, sem
+    ids), a primeira página da listagem e as indicações, que embutem o livro.
+    """
+    if ids:
+        cache.invalidar(*[chave_livro(i) for i in ids])
+    else:
+        cache.invalidar_prefixo("livro:")
+    cache.invalidar_prefixo("livros:inicio:")
+    cache.invalidar_prefixo("indicacoes:")
+
+
+def invalidar_categorias():
+    cache.invalidar(CHAVE_CATEGORIAS)
+
+
+def invalidar_indicacoes():
+    cache.invalidar_prefixo("indicacoes:")
@@ -0,0 +1,164 @@
+import time
+import click
+from flask import Flask
+from database import db
+import migracoes
+
+
+def criar_admin_padrao():
+    """Cria o administrador padrão se ainda não houver nenhum FUNCIONARIO."""
+    from models.usuario import Usuario
+    from models.pessoa import Pessoa
+
+    if Usuario.query.filter_by(role="FUNCIONARIO").first():
+        return False
+
+    admin_pessoa = Pessoa(
+        nome="Administrador do Sistema",
+        cpf="00000000000",
+        idade=99,
+        email="admin@biblioteca.com",
+        numero="000000000",
+        tipo="FUNCIONARIO"
+    )
+    db.session.add(admin_pessoa)
+    db.session.flush()
+
+    admin_user = Usuario(
+        pessoa_id=admin_pessoa.id,
+        username="admin",
+        role="FUNCIONARIO"
+    )
+    admin_user.set_senha("admin123")
+
+    db.session.add(admin_user)
+    db.session.commit()
+    return True
+
+
+def migrar():
+    aplicadas = migracoes.aplicar()
+    for nome in aplicadas:
+        click.echo(f"Migração aplicada: {nome}")
+    if not aplicadas:
+        click.echo("Esquema já está atualizado")
+
+
+def semear():
+    if criar_admin_padrao():
+        click.echo("=" * 50)
+        click.echo("ADMINISTRADOR PADRÃO CRIADO:")
+        click.echo("Username: admin")
+        click.echo("Senha:    admin123")
+        click.echo("=" * 50)
+    else:
+        click.echo("Administrador já existe no sistema.")
+
+
+def preparar_banco():
+    """Migrações + dados iniciais. Usado pelo CLI e pelo master do gunicorn."""
+    migrar()
+    semear()
+
+
+def registrar_comandos(app: Flask):
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Aplica as migrações pendentes do esquema."""
+        migrar()
+
+    @app.cli.command("db-status")
+    def db_status():
+        """Lista as migrações ainda não aplicadas."""
+        for nome, _ in migracoes.pendentes():
+            click.echo(f"pendente: {nome}")
+
+    @app.cli.command("seed")
+    def seed():
+        """Cria o administrador padrão, se necessário."""
+        semear()
+
+    @app.cli.command("preparar-banco")
+    def preparar_banco_cmd():
+        """db-upgrade + seed."""
+        inicio = time.perf_counter()
+        preparar_banco()
+        click.echo(f"Concluído em {time.perf_counter() - inicio:.2f}s")
+
+    @app.cli.command("reconciliar-estoque")
+    def reconciliar_estoque():
+        """Recalcula o contador de exemplares emprestados de cada livro."""
+        from models.livro import Livro
+        corrigidos = Livro.reconciliar_estoque()
+        click.echo(f"{corrigidos} livros corrigidos")
+
+    @app.cli.command("reindexar-busca")
+    def reindexar_busca():
+        """Reconstrói o documento e o índice de busca de todos os livros."""
+        from utils import busca
+        total = busca.reindexar()
+        click.echo(f"{total} livros reindexados")
+
+
+    @app.cli.command("importar-livros")
+    @click.argument("arquivo", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--formato", type=click.Choice(["csv", "jsonl"]), help="Padrão: pela extensão do arquivo.")
+    @click.option("--lote", default=1000, show_default=True, help="Linhas por transação.")
+    def importar_livros(arquivo, formato, lote):
+        """Importa/atualiza livros (upsert por ISBN) de um CSV ou JSONL."""
+        from utils import importacao
+
+        formato = formato or importacao.detectar_formato(arquivo)
+        if formato is None:
+            raise click.UsageError("Não foi possível detectar o formato; use --formato")
+
+        def progresso(r):
+            click.echo(f"  {r['linhas']} linhas, {r['linhas_por_segundo']:.0f} linhas/s", err=True)
+
+        with open(arquivo, "rb") as f:
+            r = importacao.importar(f, formato, tamanho_lote=lote, progresso=progresso)
+
+        for erro in r["erros"]:
+            click.echo(f"linha {erro['linha']}: {erro['erro']}")
+        click.echo(
+            f"{r['linhas']} linhas em {r['segundos']:.1f}s ({r['linhas_por_segundo']:.0f} linhas/s): "
+            f"{r['inseridos']} inseridos, {r['atualizados']} atualizados, {r['total_erros']} erros"
+        )
+
+
+    @app.cli.command("trabalhador")
+    @click.option("--threads", default=2, show_default=True, help="Tarefas executadas em paralelo.")
+    def trabalhador(threads):
+        """Executa as tarefas em segundo plano da fila até ser interrompido."""
+        import threading
+        import tarefas
+
+        parar = threading.Event()
+        fios = tarefas.iniciar_trabalhadores(app, threads, daemon=False, parar=parar)
+        click.echo(f"Trabalhador com {threads} threads aguardando tarefas (Ctrl+C para sair)")
+        try:
+            while any(f.is_alive() for f in fios):
+                parar.wait(1)
+        except KeyboardInterrupt:
+            click.echo("Encerrando após as tarefas em andamento...")
+            parar.set()
+            tarefas.acordar()
+            for f in fios:
+                f.join()
+
+
+    @app.cli.command("recalcular-estatisticas")
+    @click.option("--desde", type=click.DateTime(formats=["%Y-%m-%d"]), help="Refaz só a partir deste dia.")
+    def recalcular_estatisticas(desde):
+        """Refaz as contagens diárias de empréstimos a partir do histórico."""
+        from models import estatistica
+        inicio = time.perf_counter()
+        total = estatistica.recalcular(desde.date() if desde else None)
+        click.echo(f"{total} empréstimos contabilizados em {time.perf_counter() - inicio:.2f}s")
+
+
+    @app.cli.command("varrer-atrasos")
+    def varrer_atrasos():
+        """Atualiza dias de atraso e multas dos empréstimos vencidos (roda diariamente nas tarefas)."""
+        from models.emprestimo import Emprestimo
+        click.echo(f"{Emprestimo.varrer_atrasos()} empréstimos em atraso")
@@ -1,19 +1,151 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, NullPool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from collections import deque
+import math
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 db = SQLAlchemy()
 
+
+def _env_bool(nome, padrao):
+    return os.getenv(nome, str(padrao)).strip().lower() in ("1", "true", "sim", "yes")
+
+
+class MetricasPool:
+    """Contadores de uso do pool expostos em /admin/pool."""
+
+    def __init__(self, amostras=1000):
+        self._lock = threading.Lock()
+        self._esperas = deque(maxlen=amostras)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.conexoes_criadas = 0
+        self.invalidadas = 0
+        self.espera_max_ms = 0.0
+
+    def registrar_espera(self, segundos):
+        ms = segundos * 1000
+        with self._lock:
+            self._esperas.append(ms)
+            self.espera_max_ms = max(self.espera_max_ms, ms)
+
+    def resumo(self):
+        with self._lock:
+            esperas = sorted(self._esperas)
+        p95 = esperas[math.ceil(len(esperas) * 0.95) - 1] if esperas else 0.0
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "conexoes_criadas": self.conexoes_criadas,
+            "invalidadas": self.invalidadas,
+            "espera_media_ms": round(sum(esperas) / len(esperas), 3) if esperas else 0.0,
+            "espera_p95_ms": round(p95, 3),
+            "espera_max_ms": round(self.espera_max_ms, 3),
+        }
+
+
+metricas_pool = MetricasPool()
+
+
+class QueuePoolMedido(QueuePool):
+    # Mede quanto tempo cada checkout esperou por uma conexão livre
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metricas_pool.timeouts += 1
+            raise
+        finally:
+            metricas_pool.registrar_espera(time.perf_counter() - inicio)
+
+
+def _opcoes_engine(database_url):
+    """
+    Opções do engine a partir do ambiente:
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING e DB_PGBOUNCER (NullPool, sem prepared statements).
+    """
+    if not database_url or database_url.startswith("sqlite"):
+        return {}
+
+    if _env_bool("DB_PGBOUNCER", False):
+        # O PgBouncer (modo transaction) já faz o pool; psycopg 3 prepararia
+        # statements no servidor, o que não funciona atrás dele
+        opcoes = {"poolclass": NullPool}
+        if "+psycopg" in database_url and "+psycopg2" not in database_url:
+            opcoes["connect_args"] = {"prepare_threshold": None}
+        return opcoes
+
+    return {
+        "poolclass": QueuePoolMedido,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def _instrumentar_pool(engine):
+    @event.listens_for(engine, "connect")
+    def _ao_conectar(dbapi_conn, registro):
+        metricas_pool.conexoes_criadas += 1
+
+    @event.listens_for(engine, "checkout")
+    def _ao_retirar(dbapi_conn, registro, proxy):
+        metricas_pool.checkouts += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _ao_invalidar(dbapi_conn, registro, excecao):
+        metricas_pool.invalidadas += 1
+
+
+def estado_pool():
+    pool = db.engine.pool
+    estado = {"tipo": type(pool).__name__, **metricas_pool.resumo()}
+    if isinstance(pool, QueuePool):
+        estado.update({
+            "tamanho": pool.size(),
+            "em_uso": pool.checkedout(),
+            "livres": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "timeout": pool.timeout(),
+        })
+    return estado
+
+
+def insert_dialeto(tabela):
+    """insert() do dialeto atual, com on_conflict_do_update/do_nothing (PostgreSQL e SQLite)."""
+    dialeto = db.engine.dialect.name
+    if dialeto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialeto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"INSERT ... ON CONFLICT não suportado no banco '{dialeto}'")
+    return insert(tabela)
+
+
 def init_db(app: Flask):
     database_url = os.getenv("DATABASE_URL")
 
-    if database_url and "sslmode" not in database_url:
-        database_url += "?sslmode=require"
+    if database_url and database_url.startswith("postgres") and "sslmode" not in database_url:
+        database_url += ("&" if "?" in database_url else "?") + "sslmode=require"
 
     app.config["SQLALCHEMY_DATABASE_URI"] = database_url
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _opcoes_engine(database_url)
 
     db.init_app(app)
+
+    with app.app_context():
+        _instrumentar_pool(db.engine)
@@ -1,6 +1,8 @@
+import hashlib
+from datetime import date
 from functools import wraps
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
-from flask import jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_current_user
+from flask import jsonify, request, make_response, Response
 
 def role_required(*roles):
     """
@@ -13,11 +15,47 @@ def role_required(*roles):
         def wrapper(*args, **kwargs):
             try:
                 verify_jwt_in_request()
-                claims = get_jwt()
-                if claims.get("role") not in roles:
+                # Role atual do usuário (retrato de utils/identidade.py), não a do momento do login
+                if get_current_user().role not in roles:
                     return jsonify({"msg": "Acesso negado"}), 403
             except Exception:
                 return jsonify({"msg": "Token inválido ou ausente"}), 401
             return fn(*args, **kwargs)
         return wrapper
     return decorator
+
+def etag_versionado(*tabelas, por_usuario=False, diario=False):
+    """
+    Responde GETs condicionais com base nas versões das tabelas lidas pela rota.
+    O ETag é calculado antes de chamar a rota; se bater com If-None-Match,
+    devolve 304 sem executar as consultas nem serializar a resposta.
+    Use depois de @jwt_required().
+    Exemplo:
+    @etag_versionado("emprestimos", "livros", por_usuario=True)
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            from models.versao import VersaoTabela
+
+            claims = get_jwt()
+            partes = [request.path, request.query_string.decode(), str(claims.get("role"))]
+            partes += [f"{t}={v}" for t, v in zip(tabelas, VersaoTabela.obter(tabelas))]
+            if por_usuario:
+                partes.append(str(claims.get("pessoa_id")))
+            if diario:
+                partes.append(date.today().isoformat())
+            etag = hashlib.sha1("|".join(partes).encode()).hexdigest()
+
+            # Comparação fraca: respostas comprimidas levam o ETag como W/ (respostas.py)
+            if request.if_none_match.contains_weak(etag):
+                resposta = Response(status=304)
+            else:
+                resposta = make_response(fn(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+            resposta.set_etag(etag)
+            resposta.headers["Cache-Control"] = "private, no-cache"
+            return resposta
+        return wrapper
+    return decorator
@@ -0,0 +1,94 @@
+"""
+Configuração do gunicorn para produção: gunicorn -c gunicorn.conf.py app:app
+
+Variáveis de ambiente:
+- GUNICORN_WORKER_CLASS: "gthread" (padrão), "gevent" ou "sync"
+- WEB_CONCURRENCY: número de workers (padrão: 2 x CPUs + 1, máx. 8)
+- GUNICORN_THREADS: threads por worker no modo gthread (padrão: 4)
+- GUNICORN_CONNECTIONS: conexões simultâneas por worker no modo gevent (padrão: 100)
+- GUNICORN_TIMEOUT: segundos até um worker travado ser reiniciado (padrão: 60)
+- PORT: porta de escuta (definida pela plataforma)
+- PREPARAR_BANCO: "false" para não aplicar migrações/seed ao subir (padrão: true)
+- PROXIES_CONFIAVEIS: proxies à frente do app (padrão: 1 no Railway, 0 fora dele)
+- SENHA_METODO, SENHA_PROCESSOS, SENHA_FILA, SENHA_ESPERA: hash de senhas (utils/senhas.py)
+
+Com preload_app o app é importado uma única vez no master, e as migrações e o
+administrador padrão (flask preparar-banco) rodam uma vez só, também no
+master. Os workers herdam o código já carregado e sobem sem acessar o banco.
+As conexões abertas no master são descartadas antes do fork para que nenhum
+socket do banco seja compartilhado entre processos.
+"""
+
+import multiprocessing
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+# No Railway o app fica atrás do proxy da plataforma: sem confiar nele, todo
+# login chega com o IP do proxy e o limite por IP vira um balde só para todos.
+# Fora dele não: exposto direto, qualquer um forjaria o X-Forwarded-For.
+if os.getenv("RAILWAY_ENVIRONMENT") or os.getenv("RAILWAY_ENVIRONMENT_NAME"):
+    os.environ.setdefault("PROXIES_CONFIAVEIS", "1")
+
+if worker_class == "gevent":
+    # Precisa acontecer antes de importar o app (preload) e o driver do banco
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.getenv("GUNICORN_THREADS", "4")) if worker_class == "gthread" else 1
+worker_connections = int(os.getenv("GUNICORN_CONNECTIONS", "100"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+# Recicla workers periodicamente para conter vazamentos de memória
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = 100
+
+preload_app = True
+accesslog = "-"
+
+
+def _descartar_conexoes(close):
+    from app import app
+    from database import db
+
+    with app.app_context():
+        db.engine.dispose(close=close)
+
+
+def on_starting(server):
+    if os.getenv("PREPARAR_BANCO", "true").lower() != "true":
+        return
+
+    from app import app
+    from comandos import preparar_banco
+
+    with app.app_context():
+        preparar_banco()
+
+
+def when_ready(server):
+    # Fecha no master as conexões abertas durante o preload
+    _descartar_conexoes(close=True)
+
+    # e o pool de hash de senhas, se o preparar-banco chegou a criá-lo
+    from utils import senhas
+    senhas.encerrar()
+
+
+def post_fork(server, worker):
+    # Garante que o worker não reutilize conexões herdadas do master
+    _descartar_conexoes(close=False)
+
+    # Trabalhadores de tarefas embutidos (TAREFAS_THREADS; padrão 0: ficam no processo "worker" do Procfile)
+    from app import app
+    import tarefas
+    tarefas.garantir_trabalhadores(app)
@@ -0,0 +1,114 @@
+"""
+Limite de tentativas (token bucket) para rotas sensíveis, como o login.
+
+Cada chave (IP, conta) tem um balde com `capacidade` fichas que se recompõe a
+capacidade/periodo fichas por segundo. Uma tentativa retira fichas; sem
+fichas, a rota responde 429 com Retry-After antes de qualquer trabalho caro.
+
+Backends, como em cache.py:
+- "memoria" (padrão): baldes no processo, com LRU de LIMITE_MAX_ITENS chaves.
+  Cada worker do gunicorn conta separado, então o limite efetivo é
+  multiplicado pelo número de workers.
+- "redis": baldes compartilhados entre workers e instâncias, atualizados por
+  um script Lua atômico. Qualquer cliente compatível com redis-py (eval).
+
+Configuração por ambiente: LIMITE_BACKEND, LIMITE_MAX_ITENS, REDIS_URL e os
+limites no formato "fichas/segundos" (LOGIN_LIMITE_IP, LOGIN_LIMITE_CONTA).
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import Flask
+
+
+class BaldesMemoria:
+    def __init__(self, max_itens=100000):
+        self.max_itens = max_itens
+        self._baldes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def retirar(self, chave, capacidade, taxa, custo):
+        agora = time.monotonic()
+        with self._lock:
+            fichas, em = self._baldes.get(chave, (capacidade, agora))
+            fichas = min(capacidade, fichas + (agora - em) * taxa)
+            necessario = max(custo, 1)
+            if fichas < necessario:
+                return False, (necessario - fichas) / taxa
+
+            self._baldes[chave] = (fichas - custo, agora)
+            self._baldes.move_to_end(chave)
+            while len(self._baldes) > self.max_itens:
+                self._baldes.popitem(last=False)
+            return True, 0.0
+
+
+_SCRIPT_REDIS = """
+local balde = redis.call('HMGET', KEYS[1], 'fichas', 'em')
+local capacidade, taxa, custo, agora = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local fichas = tonumber(balde[1]) or capacidade
+local em = tonumber(balde[2]) or agora
+fichas = math.min(capacidade, fichas + math.max(0, agora - em) * taxa)
+local necessario = math.max(custo, 1)
+if fichas < necessario then
+    return {0, tostring((necessario - fichas) / taxa)}
+end
+redis.call('HSET', KEYS[1], 'fichas', tostring(fichas - custo), 'em', tostring(agora))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidade / taxa) + 1)
+return {1, '0'}
+"""
+
+
+class BaldesRedis:
+    def __init__(self, cliente, namespace="biblioteca:limite:"):
+        self.cliente = cliente
+        self.namespace = namespace
+
+    def retirar(self, chave, capacidade, taxa, custo):
+        permitido, espera = self.cliente.eval(
+            _SCRIPT_REDIS, 1, self.namespace + chave, capacidade, taxa, custo, time.time()
+        )
+        return bool(int(permitido)), float(espera)
+
+
+_backend = BaldesMemoria()
+
+
+class Limite:
+    def __init__(self, nome, capacidade, periodo):
+        self.nome = nome
+        self.capacidade = capacidade
+        self.periodo = periodo
+
+    def retirar(self, chave, custo=1):
+        """
+        (permitido, segundos até haver ficha). custo=0 só confere se ainda há
+        ficha, sem gastar: útil para cobrar só as tentativas que falharem.
+        """
+        return _backend.retirar(f"{self.nome}:{chave}", self.capacidade, self.capacidade / self.periodo, custo)
+
+
+def _ler(nome, padrao):
+    fichas, segundos = os.getenv(nome, padrao).split("/")
+    return int(fichas), float(segundos)
+
+
+# Por IP: toda tentativa de login conta. Por conta: só as que falham.
+login_ip = Limite("login:ip", *_ler("LOGIN_LIMITE_IP", "30/60"))
+login_conta = Limite("login:conta", *_ler("LOGIN_LIMITE_CONTA", "5/300"))
+
+
+def retry_after(segundos):
+    return str(max(1, math.ceil(segundos)))
+
+
+def init_limites(app: Flask):
+    global _backend
+    if os.getenv("LIMITE_BACKEND", "memoria") == "redis":
+        import redis
+        _backend = BaldesRedis(redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0")))
+    else:
+        _backend = BaldesMemoria(int(os.getenv("LIMITE_MAX_ITENS", "100000")))
@@ -0,0 +1,165 @@
+"""
+Migrações do esquema, aplicadas em ordem por `flask db-upgrade`.
+
+Cada migração é uma função registrada com @migracao("NNNN_nome") e é
+executada uma única vez; as aplicadas ficam em `esquema_migracoes`. Como a
+primeira migração cria as tabelas a partir dos models atuais, as seguintes
+precisam ser idempotentes (checar antes de criar), já que em um banco novo
+o que elas adicionam pode já existir.
+"""
+
+from datetime import datetime
+from sqlalchemy import text
+from database import db
+
+MIGRACOES = []
+
+esquema_migracoes = db.Table(
+    "esquema_migracoes",
+    db.Column("id", db.String(100), primary_key=True),
+    db.Column("aplicada_em", db.DateTime, nullable=False)
+)
+
+# Chave do pg_advisory_lock que impede dois processos de migrar ao mesmo tempo
+CHAVE_LOCK = 727001
+
+
+def migracao(nome):
+    def registrar(fn):
+        MIGRACOES.append((nome, fn))
+        return fn
+    return registrar
+
+
+def pendentes():
+    esquema_migracoes.create(db.engine, checkfirst=True)
+    aplicadas = {i for (i,) in db.session.execute(db.select(esquema_migracoes.c.id)).all()}
+    return [(nome, fn) for nome, fn in MIGRACOES if nome not in aplicadas]
+
+
+def aplicar():
+    """Aplica as migrações pendentes e retorna os nomes aplicados."""
+    trava = None
+    if db.engine.dialect.name == "postgresql":
+        # Conexão própria: o lock é da sessão do Postgres e precisa sobreviver aos commits
+        trava = db.engine.connect()
+        trava.execute(text("SELECT pg_advisory_lock(:k)"), {"k": CHAVE_LOCK})
+
+    try:
+        aplicadas = []
+        for nome, fn in pendentes():
+            fn()
+            db.session.execute(esquema_migracoes.insert().values(id=nome, aplicada_em=datetime.utcnow()))
+            db.session.commit()
+            aplicadas.append(nome)
+        return aplicadas
+    finally:
+        if trava is not None:
+            trava.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": CHAVE_LOCK})
+            trava.close()
+
+
+@migracao("0001_esquema_inicial")
+def _esquema_inicial():
+    import models.usuario, models.pessoa, models.livro, models.categoria  # noqa: F401
+    import models.emprestimo, models.indicacao, models.versao  # noqa: F401
+    db.create_all()
+
+
+@migracao("0002_busca_livros")
+def _busca_livros():
+    from utils import busca
+    busca.preparar_esquema()
+
+
+@migracao("0003_versoes_tabela")
+def _versoes_tabela():
+    from models.versao import VersaoTabela
+    VersaoTabela.preparar()
+
+
+def criar_indices(*tabelas, nomes=None):
+    """
+    Cria os índices declarados nos models que ainda não existem no banco.
+    Com `nomes`, só esses: os models mudam depois da migração, e um índice
+    novo pode depender de uma coluna que só uma migração seguinte adiciona.
+    """
+    for tabela in tabelas:
+        for indice in db.metadata.tables[tabela].indexes:
+            if nomes is None or indice.name in nomes:
+                indice.create(db.engine, checkfirst=True)
+
+
+@migracao("0004_indices_consultas_quentes")
+def _indices_consultas_quentes():
+    criar_indices(
+        "emprestimos", "indicacoes_semana", "favoritos", "livro_categoria", "usuarios",
+        nomes={
+            "ix_emprestimos_devolucao_data", "ix_emprestimos_ativos_livro", "ix_emprestimos_pessoa_data",
+            "ix_emprestimos_livro_id", "ix_indicacoes_periodo", "ix_favoritos_livro_id",
+            "ix_livro_categoria_categoria_id", "ix_usuarios_pessoa_id",
+        }
+    )
+
+
+def adicionar_coluna(tabela, coluna, ddl):
+    """ALTER TABLE ... ADD COLUMN se a coluna ainda não existir."""
+    from sqlalchemy import inspect
+    if coluna not in [c["name"] for c in inspect(db.engine).get_columns(tabela)]:
+        with db.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {ddl}"))
+
+
+@migracao("0005_livros_emprestados_ativos")
+def _livros_emprestados_ativos():
+    from models.livro import Livro
+    adicionar_coluna("livros", "emprestados_ativos", "INTEGER NOT NULL DEFAULT 0")
+    Livro.reconciliar_estoque()
+
+
+@migracao("0006_tarefas")
+def _tarefas():
+    # Entrada e resultado ficam em arquivos (TAREFAS_DIRETORIO), não na tabela
+    from models.tarefa import Tarefa
+    Tarefa.__table__.create(db.engine, checkfirst=True)
+    criar_indices("tarefas")
+
+
+@migracao("0007_estatisticas")
+def _estatisticas():
+    from models import estatistica
+    from models.versao import VersaoTabela
+    for modelo in estatistica.TABELAS:
+        modelo.__table__.create(db.engine, checkfirst=True)
+    criar_indices(*[m.__tablename__ for m in estatistica.TABELAS])
+    VersaoTabela.preparar()
+    estatistica.recalcular()
+
+
+@migracao("0008_prazo_emprestimos")
+def _prazo_emprestimos():
+    from sqlalchemy import bindparam
+    from datetime import timedelta
+    from models.emprestimo import Emprestimo, PRAZO_EMPRESTIMO_DIAS
+
+    adicionar_coluna("categorias", "prazo_dias", "INTEGER")
+    adicionar_coluna("emprestimos", "data_prevista", "DATE")
+    adicionar_coluna("emprestimos", "dias_atraso", "INTEGER NOT NULL DEFAULT 0")
+    adicionar_coluna("emprestimos", "multa", "NUMERIC(10, 2) NOT NULL DEFAULT 0")
+    criar_indices("emprestimos", nomes={"ix_emprestimos_abertos_prevista"})
+
+    # Até aqui o prazo era fixo; um UPDATE por data de empréstimo distinta
+    tabela = Emprestimo.__table__
+    datas = db.session.execute(
+        db.select(tabela.c.data_emprestimo).where(tabela.c.data_prevista.is_(None)).distinct()
+    ).scalars().all()
+    if datas:
+        db.session.execute(
+            tabela.update()
+            .where(tabela.c.data_emprestimo == bindparam("emprestado"), tabela.c.data_prevista.is_(None))
+            .values(data_prevista=bindparam("prevista")),
+            [{"emprestado": d, "prevista": d + timedelta(days=PRAZO_EMPRESTIMO_DIAS)} for d in datas]
+        )
+    db.session.commit()
+    Emprestimo.varrer_atrasos()
+
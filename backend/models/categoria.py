@@ -5,9 +5,12 @@ class Categoria(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), unique=True, nullable=False)
+    # Prazo de empréstimo dos livros da categoria; nulo usa o padrão (models/emprestimo.py)
+    prazo_dias = db.Column(db.Integer, nullable=True)
 
     def mostrar_dados(self):
         return {
             "id": self.id,
-            "nome": self.nome
+            "nome": self.nome,
+            "prazo_dias": self.prazo_dias
         }
\ No newline at end of file
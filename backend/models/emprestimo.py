@@ -1,29 +1,119 @@
+import os
 from database import db
 from models.pessoa import Pessoa
 from models.livro import Livro
-from datetime import date
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy.orm import joinedload
+
+# Prazo padrão; categorias com prazo_dias próprio e PRAZO_EMPRESTIMO_POR_TIPO
+# ("FUNCIONARIO:14,CLIENTE:7") têm precedência, nesta ordem
+PRAZO_EMPRESTIMO_DIAS = int(os.getenv("PRAZO_EMPRESTIMO_DIAS", "7"))
+PRAZO_EMPRESTIMO_POR_TIPO = {
+    tipo.strip().upper(): int(dias)
+    for tipo, _, dias in (item.partition(":") for item in os.getenv("PRAZO_EMPRESTIMO_POR_TIPO", "").split(","))
+    if tipo.strip() and dias.strip()
+}
+MULTA_DIARIA = Decimal(os.getenv("MULTA_DIARIA", "1.00"))
+
+
+def prazo_dias(livro, pessoa):
+    """Maior prazo entre as categorias do livro que definem um; senão, o do tipo de pessoa."""
+    por_categoria = [c.prazo_dias for c in livro.categorias if c.prazo_dias]
+    if por_categoria:
+        return max(por_categoria)
+    return PRAZO_EMPRESTIMO_POR_TIPO.get(pessoa.tipo, PRAZO_EMPRESTIMO_DIAS)
+
+
+def calcular_atraso(data_prevista, referencia):
+    """(dias de atraso, multa) de um empréstimo com a data prevista, na data de referência."""
+    dias = max((referencia - data_prevista).days, 0) if data_prevista else 0
+    return dias, MULTA_DIARIA * dias
 
 class Emprestimo(db.Model):
     __tablename__ = "emprestimos"
+    __table_args__ = (
+        # Usado pelo /relatorios para contar ativos/atrasados sem varrer o histórico
+        db.Index("ix_emprestimos_devolucao_data", "data_devolucao", "data_emprestimo"),
+        # Empréstimos em aberto por livro: disponibilidade e checagem de estoque
+        db.Index(
+            "ix_emprestimos_ativos_livro", "livro_id",
+            postgresql_where=db.text("data_devolucao IS NULL"),
+            sqlite_where=db.text("data_devolucao IS NULL")
+        ),
+        db.Index("ix_emprestimos_pessoa_data", "pessoa_id", "data_emprestimo"),
+        # Atrasados: só os em aberto, já na ordem de data prevista (/emprestimos/atrasados)
+        db.Index(
+            "ix_emprestimos_abertos_prevista", "data_prevista", "id",
+            postgresql_where=db.text("data_devolucao IS NULL"),
+            sqlite_where=db.text("data_devolucao IS NULL")
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     pessoa_id = db.Column(db.Integer, db.ForeignKey("pessoas.id"), nullable=False)
-    livro_id = db.Column(db.Integer, db.ForeignKey("livros.id"), nullable=False)
+    livro_id = db.Column(db.Integer, db.ForeignKey("livros.id"), nullable=False, index=True)
     
     data_emprestimo = db.Column(db.Date, nullable=False)
     data_devolucao = db.Column(db.Date, nullable=True)
+    data_prevista = db.Column(db.Date, nullable=True)
+    # Mantidos pela varredura diária (varrer_atrasos) e congelados na devolução
+    dias_atraso = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    multa = db.Column(db.Numeric(10, 2), nullable=False, default=0, server_default="0")
 
     pessoa = db.relationship("Pessoa", backref="emprestimos")
     livro = db.relationship("Livro", backref="emprestimos")
 
+    @staticmethod
+    def com_relacionados():
+        """Consulta base que já traz pessoa e livro no mesmo SELECT."""
+        return Emprestimo.query.options(
+            joinedload(Emprestimo.pessoa),
+            joinedload(Emprestimo.livro)
+        )
+
+    @staticmethod
+    def prever(livro, pessoa, data_emprestimo):
+        return data_emprestimo + timedelta(days=prazo_dias(livro, pessoa))
+
+    @staticmethod
+    def varrer_atrasos(referencia=None):
+        """
+        Atualiza dias_atraso e multa dos empréstimos em aberto vencidos. Um
+        UPDATE por data prevista distinta (executemany), não um por empréstimo.
+        Retorna quantos empréstimos estão em atraso.
+        """
+        from sqlalchemy import bindparam, func
+        referencia = referencia or date.today()
+        tabela = Emprestimo.__table__
+        abertos = tabela.c.data_devolucao.is_(None)
+
+        vencimentos = db.session.query(tabela.c.data_prevista, func.count()).filter(
+            abertos, tabela.c.data_prevista < referencia
+        ).group_by(tabela.c.data_prevista).all()
+
+        if vencimentos:
+            parametros = []
+            for prevista, _ in vencimentos:
+                dias, multa = calcular_atraso(prevista, referencia)
+                parametros.append({"prevista": prevista, "dias": dias, "multa": multa})
+            db.session.execute(
+                tabela.update()
+                .where(abertos, tabela.c.data_prevista == bindparam("prevista"))
+                .values(dias_atraso=bindparam("dias"), multa=bindparam("multa")),
+                parametros
+            )
+        db.session.commit()
+        return sum(qtd for _, qtd in vencimentos)
+
     def mostrar_dados(self):
         status = "ativo" if not self.data_devolucao else "devolvido"
         
         data_emp_str = self.data_emprestimo.isoformat() if self.data_emprestimo else None
         data_dev_str = self.data_devolucao.isoformat() if self.data_devolucao else None
         
-        pessoa_obj = Pessoa.query.get(self.pessoa_id)
-        livro_obj = Livro.query.get(self.livro_id)
+        pessoa_obj = self.pessoa
+        livro_obj = self.livro
 
         return {
             "id": self.id,
@@ -33,5 +123,8 @@ class Emprestimo(db.Model):
             "livro_nome": livro_obj.nome if livro_obj else "Desconhecido",
             "data_emprestimo": data_emp_str,
             "data_devolucao": data_dev_str,
+            "data_prevista": self.data_prevista.isoformat() if self.data_prevista else None,
+            "dias_atraso": self.dias_atraso or 0,
+            "multa": float(self.multa or 0),
             "status": status
         }
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Contagens diárias de empréstimos e devoluções, pré-agregadas para os
+relatórios de série temporal (routes/estatisticas.py):
+
+- estatisticas_dia: total da biblioteca por dia;
+- estatisticas_livro_dia: por dia e livro;
+- estatisticas_categoria_dia: por dia e categoria (um livro conta em cada
+  uma das suas categorias).
+
+Empréstimos contam no dia de data_emprestimo e devoluções no dia de
+data_devolucao. As rotas que criam, devolvem ou apagam empréstimos chamam
+registrar_eventos() na mesma transação; o comando `flask
+recalcular-estatisticas` refaz as tabelas a partir de `emprestimos`.
+
+Por categoria vale sempre o conjunto *atual* de categorias de cada livro,
+nos dois caminhos. Quando as categorias de um livro mudam (PUT /livros,
+importação), mover_categorias() tira o histórico do livro das categorias
+removidas e o soma nas adicionadas, a partir de estatisticas_livro_dia; uma
+categoria apagada leva suas linhas junto. Assim o incremental bate com o
+que recalcular() produziria.
+"""
+
+from collections import defaultdict
+from sqlalchemy import delete, event, func, inspect, select, literal, text
+from sqlalchemy.orm import Session
+from database import db, insert_dialeto
+from models.livro import Livro, livro_categoria
+from models.categoria import Categoria
+
+EMPRESTIMO = "emprestimos"
+DEVOLUCAO = "devolucoes"
+
+
+class EstatisticaDia(db.Model):
+    __tablename__ = "estatisticas_dia"
+
+    dia = db.Column(db.Date, primary_key=True)
+    emprestimos = db.Column(db.Integer, nullable=False, default=0)
+    devolucoes = db.Column(db.Integer, nullable=False, default=0)
+
+
+class EstatisticaLivroDia(db.Model):
+    __tablename__ = "estatisticas_livro_dia"
+    __table_args__ = (
+        # A PK (dia, livro_id) atende rankings por período; este, a série de um livro
+        db.Index("ix_estatisticas_livro_dia_livro", "livro_id", "dia"),
+    )
+
+    dia = db.Column(db.Date, primary_key=True)
+    livro_id = db.Column(db.Integer, primary_key=True)
+    emprestimos = db.Column(db.Integer, nullable=False, default=0)
+    devolucoes = db.Column(db.Integer, nullable=False, default=0)
+
+
+class EstatisticaCategoriaDia(db.Model):
+    __tablename__ = "estatisticas_categoria_dia"
+    __table_args__ = (
+        db.Index("ix_estatisticas_categoria_dia_categoria", "categoria_id", "dia"),
+    )
+
+    dia = db.Column(db.Date, primary_key=True)
+    categoria_id = db.Column(db.Integer, primary_key=True)
+    emprestimos = db.Column(db.Integer, nullable=False, default=0)
+    devolucoes = db.Column(db.Integer, nullable=False, default=0)
+
+
+TABELAS = (EstatisticaDia, EstatisticaLivroDia, EstatisticaCategoriaDia)
+
+
+def _somar(modelo, chaves, contagens):
+    """Upsert somando: INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x."""
+    if not contagens:
+        return
+    tabela = modelo.__table__
+    stmt = insert_dialeto(tabela)
+    stmt = stmt.on_conflict_do_update(index_elements=list(chaves), set_={
+        c: tabela.c[c] + stmt.excluded[c] for c in (EMPRESTIMO, DEVOLUCAO)
+    })
+    db.session.execute(stmt, [
+        {**dict(zip(chaves, chave)), EMPRESTIMO: emp, DEVOLUCAO: dev}
+        for chave, (emp, dev) in sorted(contagens.items())
+    ])
+
+
+def registrar_eventos(eventos):
+    """
+    Soma eventos (livro_id, dia, EMPRESTIMO|DEVOLUCAO, delta) às três tabelas.
+    Delta negativo desfaz (empréstimo apagado). Uma consulta para as
+    categorias e um executemany por tabela, qualquer que seja o número de eventos.
+    """
+    por_livro = defaultdict(lambda: [0, 0])
+    for livro_id, dia, tipo, delta in eventos:
+        if dia is None or not delta:
+            continue
+        por_livro[(dia, livro_id)][0 if tipo == EMPRESTIMO else 1] += delta
+    if not por_livro:
+        return
+
+    por_dia = defaultdict(lambda: [0, 0])
+    for (dia, _), (emp, dev) in por_livro.items():
+        por_dia[(dia,)][0] += emp
+        por_dia[(dia,)][1] += dev
+
+    categorias = defaultdict(list)
+    for livro_id, categoria_id in db.session.execute(
+        select(livro_categoria.c.livro_id, livro_categoria.c.categoria_id)
+        .where(livro_categoria.c.livro_id.in_({l for _, l in por_livro}))
+    ):
+        categorias[livro_id].append(categoria_id)
+
+    por_categoria = defaultdict(lambda: [0, 0])
+    for (dia, livro_id), (emp, dev) in por_livro.items():
+        for categoria_id in categorias[livro_id]:
+            por_categoria[(dia, categoria_id)][0] += emp
+            por_categoria[(dia, categoria_id)][1] += dev
+
+    # Ordem fixa de tabelas e chaves para transações concorrentes não se travarem
+    _somar(EstatisticaDia, ("dia",), por_dia)
+    _somar(EstatisticaLivroDia, ("dia", "livro_id"), por_livro)
+    _somar(EstatisticaCategoriaDia, ("dia", "categoria_id"), por_categoria)
+
+
+def mover_categorias(mudancas):
+    """
+    Aplica mudanças (livro_id, categoria_id, +1|-1) de livro_categoria às
+    contagens por categoria: +1 soma o histórico diário do livro na categoria,
+    -1 subtrai. Um INSERT ... SELECT por (categoria, sinal).
+    """
+    grupos = defaultdict(set)
+    for livro_id, categoria_id, sinal in mudancas:
+        grupos[(categoria_id, sinal)].add(livro_id)
+
+    tabela = EstatisticaCategoriaDia.__table__
+    for (categoria_id, sinal), livro_ids in sorted(grupos.items()):
+        consulta = select(
+            EstatisticaLivroDia.dia,
+            literal(categoria_id),
+            func.sum(EstatisticaLivroDia.emprestimos) * sinal,
+            func.sum(EstatisticaLivroDia.devolucoes) * sinal,
+        ).where(EstatisticaLivroDia.livro_id.in_(livro_ids)).group_by(EstatisticaLivroDia.dia)
+        stmt = insert_dialeto(tabela).from_select(["dia", "categoria_id", EMPRESTIMO, DEVOLUCAO], consulta)
+        stmt = stmt.on_conflict_do_update(index_elements=["dia", "categoria_id"], set_={
+            c: tabela.c[c] + stmt.excluded[c] for c in (EMPRESTIMO, DEVOLUCAO)
+        })
+        db.session.execute(stmt)
+
+
+@event.listens_for(Session, "after_flush")
+def _acompanhar_categorias(session, flush_context):
+    mudancas = []
+    for obj in session.dirty:
+        if isinstance(obj, Livro):
+            historico = inspect(obj).attrs.categorias.history
+            mudancas += [(obj.id, c.id, 1) for c in historico.added]
+            mudancas += [(obj.id, c.id, -1) for c in historico.deleted]
+    if mudancas:
+        mover_categorias(mudancas)
+
+    apagadas = [obj.id for obj in session.deleted if isinstance(obj, Categoria)]
+    if apagadas:
+        session.execute(delete(EstatisticaCategoriaDia).where(EstatisticaCategoriaDia.categoria_id.in_(apagadas)))
+
+
+def eventos_emprestimo(emprestimo, delta=1):
+    """Eventos de um empréstimo inteiro: retirada e, se houver, devolução."""
+    eventos = [(emprestimo.livro_id, emprestimo.data_emprestimo, EMPRESTIMO, delta)]
+    if emprestimo.data_devolucao:
+        eventos.append((emprestimo.livro_id, emprestimo.data_devolucao, DEVOLUCAO, delta))
+    return eventos
+
+
+def recalcular(desde=None):
+    """
+    Refaz as contagens a partir de `emprestimos` (a partir de `desde`, ou
+    tudo) com INSERT ... SELECT agrupado, em uma transação.
+    """
+    from models.emprestimo import Emprestimo
+
+    if db.engine.dialect.name == "postgresql":
+        # Segura novas escritas em emprestimos enquanto recalcula, para não perder eventos
+        db.session.execute(text("LOCK TABLE emprestimos IN SHARE MODE"))
+
+    for modelo in TABELAS:
+        consulta = delete(modelo)
+        if desde:
+            consulta = consulta.where(modelo.dia >= desde)
+        db.session.execute(consulta)
+
+    for coluna_data, tipo in ((Emprestimo.data_emprestimo, EMPRESTIMO), (Emprestimo.data_devolucao, DEVOLUCAO)):
+        outro = DEVOLUCAO if tipo == EMPRESTIMO else EMPRESTIMO
+        filtro = [coluna_data.isnot(None)]
+        if desde:
+            filtro.append(coluna_data >= desde)
+
+        for modelo, chaves, agrupamento, juncao in (
+            (EstatisticaDia, ("dia",), [coluna_data], None),
+            (EstatisticaLivroDia, ("dia", "livro_id"), [coluna_data, Emprestimo.livro_id], None),
+            (EstatisticaCategoriaDia, ("dia", "categoria_id"), [coluna_data, livro_categoria.c.categoria_id], livro_categoria),
+        ):
+            consulta = select(*agrupamento, func.count(), literal(0)).where(*filtro)
+            if juncao is not None:
+                consulta = consulta.join(juncao, juncao.c.livro_id == Emprestimo.livro_id)
+            consulta = consulta.group_by(*agrupamento)
+
+            tabela = modelo.__table__
+            stmt = insert_dialeto(tabela).from_select(list(chaves) + [tipo, outro], consulta)
+            stmt = stmt.on_conflict_do_update(index_elements=list(chaves), set_={tipo: stmt.excluded[tipo]})
+            db.session.execute(stmt)
+
+    db.session.commit()
+    return db.session.query(func.coalesce(func.sum(EstatisticaDia.emprestimos), 0)).scalar()
@@ -3,6 +3,10 @@ from datetime import date
 
 class IndicacaoSemana(db.Model):
     __tablename__ = "indicacoes_semana"
+    __table_args__ = (
+        db.Index("ix_indicacoes_periodo", "data_inicio", "data_fim"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     livro_id = db.Column(db.Integer, db.ForeignKey("livros.id"), nullable=False)
     data_inicio = db.Column(db.Date, nullable=False)
@@ -1,9 +1,12 @@
 from database import db
 from datetime import date
+from sqlalchemy import update, case, bindparam
+from models import versao
 
 livro_categoria = db.Table('livro_categoria',
     db.Column('livro_id', db.Integer, db.ForeignKey('livros.id'), primary_key=True),
-    db.Column('categoria_id', db.Integer, db.ForeignKey('categorias.id'), primary_key=True)
+    db.Column('categoria_id', db.Integer, db.ForeignKey('categorias.id'), primary_key=True),
+    db.Index('ix_livro_categoria_categoria_id', 'categoria_id')
 )
 
 class Livro(db.Model):
@@ -18,14 +21,92 @@ class Livro(db.Model):
     imagem_url = db.Column(db.String(500), nullable=True)
     quantidade = db.Column(db.Integer, nullable=False, default=1)
     ativo = db.Column(db.Boolean, default=True, nullable=False)
+    # Exemplares em empréstimo agora; mantido por reservar/liberar_exemplares
+    emprestados_ativos = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Texto normalizado para a busca (ver utils/busca.py); não vai para o JSON
+    documento_busca = db.deferred(db.Column(db.Text, nullable=True))
 
     categorias = db.relationship('Categoria', secondary=livro_categoria, backref=db.backref('livros_rel', lazy='dynamic'))
 
-    def mostrar_dados(self):
+    @staticmethod
+    def reservar_exemplar(livro_id):
+        """
+        Conta mais um exemplar emprestado se ainda houver algum livre.
+        O WHERE é reavaliado pelo banco com a linha travada, então dois
+        empréstimos simultâneos do último exemplar não passam juntos.
+        Retorna False quando o estoque está esgotado.
+        """
+        resultado = db.session.execute(
+            update(Livro)
+            .where(Livro.id == livro_id, Livro.emprestados_ativos < Livro.quantidade)
+            .values(emprestados_ativos=Livro.emprestados_ativos + 1)
+            .execution_options(synchronize_session=False, versao_por_linha=True)
+        )
+        Livro._contador_alterado(livro_id)
+        return resultado.rowcount == 1
+
+    @staticmethod
+    def liberar_exemplares(livro_id, qtd=1):
+        db.session.execute(
+            update(Livro)
+            .where(Livro.id == livro_id)
+            .values(emprestados_ativos=case(
+                (Livro.emprestados_ativos > qtd, Livro.emprestados_ativos - qtd), else_=0
+            ))
+            .execution_options(synchronize_session=False, versao_por_linha=True)
+        )
+        Livro._contador_alterado(livro_id)
+
+    @staticmethod
+    def ajustar_emprestados(deltas):
+        """
+        Soma deltas {livro_id: +n/-n} ao contador em um único executemany.
+        Quem aumenta o contador deve ter travado as linhas (with_for_update)
+        e conferido o estoque antes.
+        """
+        if not deltas:
+            return
+        tabela = Livro.__table__
+        novo = tabela.c.emprestados_ativos + bindparam("delta")
+        db.session.execute(
+            tabela.update()
+            .where(tabela.c.id == bindparam("livro"))
+            .values(emprestados_ativos=case((novo > 0, novo), else_=0))
+            .execution_options(versao_por_linha=True),
+            [{"livro": livro_id, "delta": delta} for livro_id, delta in deltas.items()]
+        )
+        for livro_id in deltas:
+            Livro._contador_alterado(livro_id)
+
+    @staticmethod
+    def _contador_alterado(livro_id):
+        # Só a versão desta linha sobe (models/versao.py): empréstimos não invalidam o acervo todo
+        versao.marcar_linhas(db.session, "livros", [livro_id])
+        livro = db.session.identity_map.get(db.session.identity_key(Livro, livro_id))
+        if livro is not None:
+            db.session.expire(livro, ["emprestados_ativos"])
+
+    @staticmethod
+    def reconciliar_estoque():
+        """Recalcula emprestados_ativos a partir dos empréstimos em aberto. Retorna quantos livros mudaram."""
         from models.emprestimo import Emprestimo
 
-        qtd_emprestados = Emprestimo.query.filter_by(livro_id=self.id, data_devolucao=None).count()
-        disponiveis = self.quantidade - qtd_emprestados
+        ativos = db.select(db.func.count(Emprestimo.id)).where(
+            Emprestimo.livro_id == Livro.id,
+            Emprestimo.data_devolucao.is_(None)
+        ).scalar_subquery()
+
+        resultado = db.session.execute(
+            update(Livro)
+            .where(Livro.emprestados_ativos != ativos)
+            .values(emprestados_ativos=ativos)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return resultado.rowcount
+
+    def mostrar_dados(self):
+        disponiveis = self.quantidade - self.emprestados_ativos
 
         lista_categorias = [{"id": c.id, "nome": c.nome} for c in self.categorias]
 
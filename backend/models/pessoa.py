@@ -3,7 +3,9 @@ from database import db
 tabela_favoritos = db.Table(
     "favoritos",
     db.Column("pessoa_id", db.Integer, db.ForeignKey("pessoas.id"), primary_key=True),
-    db.Column("livro_id", db.Integer, db.ForeignKey("livros.id"), primary_key=True)
+    db.Column("livro_id", db.Integer, db.ForeignKey("livros.id"), primary_key=True),
+    # A PK começa por pessoa_id; este índice cobre a busca no sentido inverso
+    db.Index("ix_favoritos_livro_id", "livro_id")
 )
 
 class Pessoa(db.Model):
@@ -0,0 +1,58 @@
+import json
+import uuid
+from datetime import datetime
+from database import db
+
+STATUS_PENDENTE = "pendente"
+STATUS_EXECUTANDO = "executando"
+STATUS_CONCLUIDA = "concluida"
+STATUS_ERRO = "erro"
+
+
+class Tarefa(db.Model):
+    """Tarefa em segundo plano (ver tarefas.py). Entrada e resultado ficam em arquivos gzip, fora do banco."""
+    __tablename__ = "tarefas"
+    __table_args__ = (
+        # Fila: a próxima pendente mais antiga
+        db.Index("ix_tarefas_status_criada", "status", "criada_em"),
+        # Reaproveitamento de resultado por tipo + parâmetros
+        db.Index("ix_tarefas_chave_status", "chave", "status"),
+    )
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: Tarefa.novo_id())
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.Text, nullable=False, default="{}")
+    # Hash de tipo + parâmetros; nulo para tarefas que não podem ser reaproveitadas
+    chave = db.Column(db.String(40), nullable=True)
+    # Versões das tabelas lidas quando a tarefa começou (ver models/versao.py)
+    versoes = db.Column(db.String(200), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDENTE)
+    pessoa_id = db.Column(db.Integer, nullable=True)
+
+    mimetype = db.Column(db.String(50), nullable=True)
+    nome_arquivo = db.Column(db.String(100), nullable=True)
+    erro = db.Column(db.Text, nullable=True)
+
+    criada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    iniciada_em = db.Column(db.DateTime, nullable=True)
+    concluida_em = db.Column(db.DateTime, nullable=True)
+
+    @staticmethod
+    def novo_id():
+        return uuid.uuid4().hex
+
+    def mostrar_dados(self):
+        def iso(valor):
+            return valor.isoformat() if valor else None
+
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "parametros": json.loads(self.parametros or "{}"),
+            "status": self.status,
+            "erro": self.erro,
+            "criada_em": iso(self.criada_em),
+            "iniciada_em": iso(self.iniciada_em),
+            "concluida_em": iso(self.concluida_em),
+            "resultado_url": f"/tarefas/{self.id}/resultado" if self.status == STATUS_CONCLUIDA else None,
+        }
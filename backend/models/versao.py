@@ -0,0 +1,114 @@
+from database import db, insert_dialeto
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+# Tabelas cujas escritas são versionadas para o ETag das rotas de leitura
+TABELAS_VERSIONADAS = (
+    "livros", "pessoas", "emprestimos", "categorias", "indicacoes_semana", "usuarios",
+    "estatisticas_dia", "estatisticas_livro_dia", "estatisticas_categoria_dia"
+)
+
+# Além da versão da tabela há versões por linha ("livros:42"), criadas na
+# primeira escrita. Escritas que só mudam o que uma linha exibe (o contador de
+# exemplares emprestados, a cada empréstimo) levam
+# execution_options(versao_por_linha=True) e marcam as linhas com
+# marcar_linhas(): não sobem a versão da tabela inteira, que todas as outras
+# escritas disputariam e que derrubaria todo o cache do acervo.
+
+
+def linha(tabela, id):
+    """Chave de versão de uma linha."""
+    return f"{tabela}:{id}"
+
+class VersaoTabela(db.Model):
+    __tablename__ = "versoes_tabela"
+
+    tabela = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.BigInteger, nullable=False, default=0)
+
+    @staticmethod
+    def preparar():
+        """Garante uma linha por tabela versionada."""
+        existentes = {t for (t,) in db.session.query(VersaoTabela.tabela).all()}
+        for tabela in TABELAS_VERSIONADAS:
+            if tabela not in existentes:
+                db.session.add(VersaoTabela(tabela=tabela, versao=0))
+        db.session.commit()
+
+    @staticmethod
+    def obter(tabelas):
+        """Versões atuais das tabelas pedidas, na mesma ordem, em uma consulta."""
+        linhas = dict(db.session.query(VersaoTabela.tabela, VersaoTabela.versao).filter(
+            VersaoTabela.tabela.in_(tabelas)
+        ).all())
+        return [linhas.get(t, 0) for t in tabelas]
+
+
+def _incrementar(conexao, chaves):
+    """Sobe as versões e devolve as novas versões das linhas ({chave: versao})."""
+    tabela = VersaoTabela.__table__
+    tabelas = sorted(c for c in chaves if c in TABELAS_VERSIONADAS)
+    linhas = sorted(c for c in chaves if c.partition(":")[0] in TABELAS_VERSIONADAS and ":" in c)
+    if tabelas:
+        conexao.execute(
+            update(tabela)
+            .where(tabela.c.tabela.in_(tabelas))
+            .values(versao=tabela.c.versao + 1)
+        )
+    if linhas:
+        stmt = insert_dialeto(tabela).values([{"tabela": c, "versao": 1} for c in linhas])
+        return dict(conexao.execute(stmt.on_conflict_do_update(
+            index_elements=[tabela.c.tabela], set_={"versao": tabela.c.versao + 1}
+        ).returning(tabela.c.tabela, tabela.c.versao)).all())
+    return {}
+
+
+def _marcar(session, chaves):
+    session.info.setdefault("versoes_pendentes", set()).update(chaves)
+
+
+def marcar_linhas(session, tabela, ids):
+    """Versiona só estas linhas na transação atual (escritas com versao_por_linha)."""
+    _marcar(session, {linha(tabela, i) for i in ids})
+
+
+def versoes_aplicadas(session):
+    """Versões de linha gravadas pelo commit em andamento; vale nos eventos after_commit."""
+    return session.info.get("versoes_aplicadas", {})
+
+
+@event.listens_for(Session, "after_flush")
+def _versionar_flush(session, flush_context):
+    tabelas = {obj.__table__.name for obj in list(session.new) + list(session.deleted)}
+    tabelas |= {obj.__table__.name for obj in session.dirty if session.is_modified(obj)}
+    _marcar(session, tabelas)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _versionar_em_massa(orm_execute_state):
+    # INSERT/UPDATE/DELETE em massa (ORM ou Core) não passam pelo flush
+    if orm_execute_state.execution_options.get("versao_por_linha"):
+        return
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        tabela = getattr(orm_execute_state.statement, "table", None)
+        if tabela is not None and tabela.name != VersaoTabela.__tablename__:
+            _marcar(orm_execute_state.session, {tabela.name})
+
+
+@event.listens_for(Session, "before_commit")
+def _aplicar_versoes(session):
+    # As linhas de versoes_tabela são disputadas pelas escritas: só são
+    # travadas aqui, no fim da transação, uma vez e sempre na mesma ordem
+    # (tabelas, depois linhas), para que duas transações não esperem uma pela outra. Na mesma transação da
+    # escrita: se ela sofrer rollback, a versão também volta.
+    session.flush()
+    tabelas = session.info.pop("versoes_pendentes", None)
+    if tabelas:
+        session.info["versoes_aplicadas"] = _incrementar(session.connection(), tabelas)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _descartar_versoes(session, transacao):
+    if transacao.parent is None:
+        session.info.pop("versoes_pendentes", None)
+        session.info.pop("versoes_aplicadas", None)
@@ -0,0 +1,126 @@
+"""
+Codificação e compressão das respostas JSON.
+
+- ProvedorJSON: provider do Flask (app.json) que usa orjson quando instalado e
+  cai para o json da stdlib (o provider padrão do Flask) quando não. Datas
+  saem em ISO 8601 nos dois casos, como as rotas já formatam à mão. As chaves
+  continuam ordenadas, como no provider padrão.
+- comprimir: after_request que comprime com brotli (se instalado) ou gzip as
+  respostas acima de COMPRESSAO_MINIMO bytes, quando o cliente aceita.
+  Respostas em streaming (exportações) e já codificadas (resultado de
+  tarefas) passam direto.
+
+Configuração por ambiente: JSON_BACKEND ("orjson" ou "stdlib"), COMPRESSAO
+("false" desliga, por exemplo quando o proxy já comprime),
+COMPRESSAO_MINIMO, COMPRESSAO_NIVEL_GZIP e COMPRESSAO_NIVEL_BROTLI.
+"""
+
+import gzip
+import os
+from datetime import date, datetime
+from flask import Flask, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _padrao(o):
+    if isinstance(o, (date, datetime)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    default = staticmethod(_padrao)
+    ensure_ascii = False
+
+    def __init__(self, app, usar_orjson=True):
+        super().__init__(app)
+        self.usar_orjson = usar_orjson and orjson is not None
+
+    def codificar(self, obj):
+        """JSON compacto em bytes UTF-8."""
+        if self.usar_orjson:
+            try:
+                return orjson.dumps(obj, default=self.default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                # Ex.: inteiros acima de 64 bits; o json da stdlib aceita
+                pass
+        return super().dumps(obj, separators=(",", ":")).encode()
+
+    def dumps(self, obj, **kwargs):
+        if kwargs or not self.usar_orjson:
+            return super().dumps(obj, **kwargs)
+        return self.codificar(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs or not self.usar_orjson:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.codificar(obj) + b"\n", mimetype=self.mimetype)
+
+
+COMPRESSAO = os.getenv("COMPRESSAO", "true").lower() == "true"
+COMPRESSAO_MINIMO = int(os.getenv("COMPRESSAO_MINIMO", "1024"))
+COMPRESSAO_NIVEL_GZIP = int(os.getenv("COMPRESSAO_NIVEL_GZIP", "6"))
+COMPRESSAO_NIVEL_BROTLI = int(os.getenv("COMPRESSAO_NIVEL_BROTLI", "4"))
+TIPOS_COMPRIMIVEIS = ("application/json", "text/csv", "application/x-ndjson", "text/plain")
+
+
+def _codificacao_aceita():
+    aceitas = request.accept_encodings
+    if brotli is not None and aceitas["br"]:
+        return "br"
+    if aceitas["gzip"]:
+        return "gzip"
+    return None
+
+
+def comprimir(resposta):
+    if (
+        resposta.status_code != 200
+        or resposta.direct_passthrough
+        or resposta.is_streamed
+        or "Content-Encoding" in resposta.headers
+        or resposta.mimetype not in TIPOS_COMPRIMIVEIS
+    ):
+        return resposta
+
+    resposta.vary.add("Accept-Encoding")
+    corpo = resposta.get_data()
+    if len(corpo) < COMPRESSAO_MINIMO:
+        return resposta
+    codificacao = _codificacao_aceita()
+    if codificacao is None:
+        return resposta
+
+    if codificacao == "br":
+        resposta.set_data(brotli.compress(corpo, quality=COMPRESSAO_NIVEL_BROTLI))
+    else:
+        resposta.set_data(gzip.compress(corpo, compresslevel=COMPRESSAO_NIVEL_GZIP, mtime=0))
+    resposta.headers["Content-Encoding"] = codificacao
+
+    # O corpo mudou de bytes: o ETag forte vira fraco (a comparação do If-None-Match é fraca)
+    etag, fraco = resposta.get_etag()
+    if etag and not fraco:
+        resposta.set_etag(etag, weak=True)
+    return resposta
+
+
+def init_respostas(app: Flask):
+    app.json = ProvedorJSON(app, usar_orjson=os.getenv("JSON_BACKEND", "orjson") == "orjson")
+    if COMPRESSAO:
+        app.after_request(comprimir)
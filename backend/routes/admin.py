@@ -0,0 +1,19 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+from decorators import role_required
+from cache import cache
+from database import estado_pool
+
+admin_bp = Blueprint("admin", __name__, url_prefix='/admin')
+
+@admin_bp.route("/cache", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def estatisticas_cache():
+    return jsonify(cache.estatisticas()), 200
+
+@admin_bp.route("/pool", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def estatisticas_pool():
+    return jsonify(estado_pool()), 200
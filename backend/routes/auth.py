@@ -3,13 +3,22 @@ from utils.validarCPF import validar_cpf
 from models.pessoa import Pessoa
 from models.usuario import Usuario
 from database import db
-from sqlalchemy import or_
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+import limites
+from sqlalchemy import select, union
+from sqlalchemy.orm import joinedload
+from flask_jwt_extended import create_access_token, jwt_required, current_user
+from utils.identidade import usuario_atual
+from utils.senhas import SenhasOcupadas
 from sqlalchemy.exc import IntegrityError
-from werkzeug.security import generate_password_hash, check_password_hash
 
 auth_bp = Blueprint("auth", __name__, url_prefix='/auth')
 
+def _ocupado(e):
+    # Fila do pool de hash cheia (utils/senhas.py)
+    resposta = jsonify({"msg": str(e)})
+    resposta.headers["Retry-After"] = "1"
+    return resposta, 503
+
 @auth_bp.route('/registrar', methods=['POST'])
 def registrar():
     data = request.get_json()
@@ -62,6 +71,9 @@ def registrar():
     except IntegrityError:
         db.session.rollback()
         return jsonify({"msg": "CPF, email ou username já cadastrados"}), 409
+    except SenhasOcupadas as e:
+        db.session.rollback()
+        return _ocupado(e)
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
@@ -72,15 +84,38 @@ def login():
     if not (login_input and senha):
         return jsonify({"msg": "Username/Email e senha são obrigatórios"}), 400
     
-    usuario = Usuario.query.join(Pessoa).filter(
-        or_(
-            Usuario.username == login_input,
-            Pessoa.email == login_input
-        )
-    ).first()
+    # Barra rajadas antes de consultar o banco ou calcular qualquer hash
+    conta = str(login_input).strip().lower()
+    for limite, chave, custo in ((limites.login_ip, request.remote_addr, 1), (limites.login_conta, conta, 0)):
+        permitido, espera = limite.retirar(chave, custo)
+        if not permitido:
+            resposta = jsonify({"msg": "Muitas tentativas de login. Tente novamente mais tarde"})
+            resposta.headers["Retry-After"] = limites.retry_after(espera)
+            return resposta, 429
+
+    # Um SELECT: cada ramo do UNION usa um índice único (username ou email)
+    ids = union(
+        select(Usuario.id).where(Usuario.username == login_input),
+        select(Usuario.id).join(Pessoa, Pessoa.id == Usuario.pessoa_id).where(Pessoa.email == login_input)
+    ).subquery()
+    usuario = Usuario.query.join(ids, Usuario.id == ids.c.id).options(
+        joinedload(Usuario.pessoa, innerjoin=True)
+    ).order_by(Usuario.id).first()
 
-    if not usuario or not usuario.checar_senha(senha):
-        return jsonify({"msg": "Credenciais inválidas"}), 401
+    try:
+        if not usuario or not usuario.checar_senha(senha):
+            limites.login_conta.retirar(conta)
+            return jsonify({"msg": "Credenciais inválidas"}), 401
+    except SenhasOcupadas as e:
+        return _ocupado(e)
+
+    if usuario.precisa_rehash():
+        # SENHA_METODO mudou: regrava o hash agora que temos a senha em claro
+        try:
+            usuario.set_senha(senha)
+            db.session.commit()
+        except SenhasOcupadas:
+            pass
 
     additional_claims = {"role": usuario.role, "pessoa_id": usuario.pessoa_id}
     access_token = create_access_token(identity=str(usuario.id), additional_claims=additional_claims)
@@ -98,31 +133,19 @@ def login():
 @auth_bp.route("/perfil", methods=["GET"])
 @jwt_required()
 def ver_perfil():
-    identity = get_jwt_identity()
-    print("DEBUG: identity recebido do token:", identity)
-
-    usuario = Usuario.query.get(int(identity))
-    if not usuario:
-        print("DEBUG: Usuario não encontrado")
-        return jsonify({"msg": "Usuário não encontrado"}), 404
-
-    pessoa = Pessoa.query.get(usuario.pessoa_id)
-    if not pessoa:
-        print("DEBUG: Pessoa não encontrada")
+    # Identidade resolvida (e cacheada) pelo user_lookup_loader de utils/identidade.py
+    if current_user.pessoa is None:
         return jsonify({"msg": "Pessoa associada não encontrada"}), 404
-
-    print("DEBUG: Pessoa encontrada:", pessoa)
-    return jsonify(pessoa.mostrar_dados())
+    return jsonify(current_user.pessoa)
 
 @auth_bp.route("/perfil", methods=["PUT"])
 @jwt_required()
 def atualizar_perfil():
-    identity = get_jwt_identity()
-    usuario = Usuario.query.get(int(identity))
+    usuario = usuario_atual()
     if not usuario:
         return jsonify({"msg": "Usuário não encontrado"}), 404
 
-    pessoa = Pessoa.query.get(usuario.pessoa_id)
+    pessoa = usuario.pessoa
     if not pessoa:
         return jsonify({"msg": "Pessoa associada não encontrada"}), 404
 
@@ -138,6 +161,9 @@ def atualizar_perfil():
 
         db.session.commit()
         return jsonify({"msg": "Perfil atualizado com sucesso", "usuario": pessoa.mostrar_dados()})
+    except SenhasOcupadas as e:
+        db.session.rollback()
+        return _ocupado(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({"msg": "Erro ao atualizar perfil", "erro": str(e)}), 400
@@ -1,16 +1,21 @@
 from flask import Blueprint, request, jsonify
 from database import db
 from models.categoria import Categoria
-from decorators import role_required
+from decorators import role_required, etag_versionado
 from flask_jwt_extended import jwt_required
+from utils import serializacao
+from cache import cache, CHAVE_CATEGORIAS, invalidar_categorias, invalidar_livros
 
 categorias_bp = Blueprint("categorias", __name__)
 
 @categorias_bp.route("/categorias", methods=["GET"])
 @jwt_required()
+@etag_versionado("categorias")
 def listar_categorias():
-    categorias = Categoria.query.all()
-    return jsonify([c.mostrar_dados() for c in categorias]), 200
+    def carregar():
+        return serializacao.categorias(Categoria.query.all())
+
+    return jsonify(cache.obter_ou_calcular(CHAVE_CATEGORIAS, carregar, versoes=["categorias"])), 200
 
 @categorias_bp.route("/categorias", methods=["POST"])
 @jwt_required()
@@ -25,11 +30,43 @@ def criar_categoria():
     if Categoria.query.filter_by(nome=nome).first():
         return jsonify({"error": "Categoria já existe"}), 400
 
-    nova_categoria = Categoria(nome=nome)
+    prazo_dias = data.get("prazo_dias")
+    if prazo_dias is not None and (not isinstance(prazo_dias, int) or prazo_dias <= 0):
+        return jsonify({"error": "prazo_dias deve ser um número inteiro positivo"}), 400
+
+    nova_categoria = Categoria(nome=nome, prazo_dias=prazo_dias)
     db.session.add(nova_categoria)
     db.session.commit()
+    invalidar_categorias()
     return jsonify(nova_categoria.mostrar_dados()), 201
 
+@categorias_bp.route("/categorias/<int:id>", methods=["PUT"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def atualizar_categoria(id):
+    categoria = Categoria.query.get(id)
+    if not categoria:
+        return jsonify({"error": "Categoria não encontrada"}), 404
+
+    data = request.json or {}
+    if "prazo_dias" in data:
+        prazo_dias = data["prazo_dias"]
+        if prazo_dias is not None and (not isinstance(prazo_dias, int) or prazo_dias <= 0):
+            return jsonify({"error": "prazo_dias deve ser um número inteiro positivo"}), 400
+        # Vale para os próximos empréstimos; os em aberto mantêm a data prevista
+        categoria.prazo_dias = prazo_dias
+
+    nome = data.get("nome")
+    if nome and nome != categoria.nome:
+        if Categoria.query.filter_by(nome=nome).first():
+            return jsonify({"error": "Categoria já existe"}), 400
+        categoria.nome = nome
+
+    db.session.commit()
+    invalidar_categorias()
+    invalidar_livros()
+    return jsonify(categoria.mostrar_dados()), 200
+
 @categorias_bp.route("/categorias/<int:id>", methods=["DELETE"])
 @jwt_required()
 @role_required("FUNCIONARIO")
@@ -41,6 +78,9 @@ def deletar_categoria(id):
     try:
         db.session.delete(categoria)
         db.session.commit()
+        invalidar_categorias()
+        # Os livros exibem os nomes das suas categorias
+        invalidar_livros()
         return jsonify({"msg": "Categoria removida com sucesso"}), 200
     except Exception as e:
         db.session.rollback()
@@ -2,10 +2,19 @@ from flask import Blueprint, request, jsonify
 from database import db
 from models.pessoa import Pessoa
 from models.livro import Livro  
-from models.emprestimo import Emprestimo
-from decorators import role_required
-from datetime import datetime, timedelta, date
+from models.emprestimo import Emprestimo, calcular_atraso
+from models import estatistica
+from decorators import role_required, etag_versionado
+from datetime import datetime, date
 from flask_jwt_extended import jwt_required, get_jwt
+from sqlalchemy import func, case, and_, or_, update
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from utils.paginacao import pede_paginacao, ler_ordenacao, paginar, limitar_legado
+from utils.exportacao import exportar, ler_data
+from utils import serializacao
+from utils.campos import Selecao, EMPRESTIMOS
+from cache import invalidar_livros
 
 
 emprestimos_bp = Blueprint("emprestimos", __name__)
@@ -25,33 +34,39 @@ def criar_emprestimo():
         else:
             data_emprestimo_obj = date.today()
 
-        if not Pessoa.query.get(pessoa_id):
+        pessoa = Pessoa.query.get(pessoa_id)
+        if not pessoa:
             return jsonify({"msg": "Pessoa não encontrada"}), 404
         
         livro = Livro.query.get(livro_id)
         if not livro:
             return jsonify({"msg": "Livro não encontrado"}), 404
             
-        emprestimos_ativos = Emprestimo.query.filter_by(livro_id=livro_id, data_devolucao=None).count()
-        
-        if emprestimos_ativos >= livro.quantidade:
+        if not Livro.reservar_exemplar(livro.id):
+            db.session.rollback()
             return jsonify({
                 "msg": f"Estoque esgotado! Todos os {livro.quantidade} exemplares estão emprestados."
             }), 400
 
         emprestimo = Emprestimo(
-            pessoa_id=pessoa_id,
-            livro_id=livro_id,
+            pessoa=pessoa,
+            livro=livro,
             data_emprestimo=data_emprestimo_obj,
-            data_devolucao=None
+            data_devolucao=None,
+            data_prevista=Emprestimo.prever(livro, pessoa, data_emprestimo_obj)
         )
 
         db.session.add(emprestimo)
+        db.session.flush()
+        estatistica.registrar_eventos(estatistica.eventos_emprestimo(emprestimo))
+        # Serializa antes do commit para não recarregar pessoa/livro expirados
+        dados = emprestimo.mostrar_dados()
         db.session.commit()
+        invalidar_livros(livro_id)
 
         return jsonify({
             "msg": "Empréstimo criado com sucesso",
-            "emprestimo": emprestimo.mostrar_dados()
+            "emprestimo": dados
         }), 201
 
     except Exception as e:
@@ -62,7 +77,7 @@ def criar_emprestimo():
 @jwt_required()
 @role_required("FUNCIONARIO")
 def devolver_emprestimo(id):
-    emprestimo = Emprestimo.query.get(id)
+    emprestimo = Emprestimo.com_relacionados().filter_by(id=id).first()
 
     if not emprestimo:
         return jsonify({"msg": "Empréstimo não encontrado"}), 404
@@ -70,12 +85,30 @@ def devolver_emprestimo(id):
         return jsonify({"msg": "Este empréstimo já foi devolvido anteriormente"}), 400
 
     try:
-        emprestimo.data_devolucao = date.today()
+        hoje = date.today()
+        # Condicional para que duas devoluções simultâneas não liberem o exemplar duas vezes
+        resultado = db.session.execute(
+            update(Emprestimo)
+            .where(Emprestimo.id == id, Emprestimo.data_devolucao.is_(None))
+            .values(data_devolucao=hoje)
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount == 0:
+            db.session.rollback()
+            return jsonify({"msg": "Este empréstimo já foi devolvido anteriormente"}), 400
+
+        set_committed_value(emprestimo, "data_devolucao", hoje)
+        # Congela atraso e multa na data da devolução
+        emprestimo.dias_atraso, emprestimo.multa = calcular_atraso(emprestimo.data_prevista, hoje)
+        Livro.liberar_exemplares(emprestimo.livro_id)
+        estatistica.registrar_eventos([(emprestimo.livro_id, hoje, estatistica.DEVOLUCAO, 1)])
+        dados = emprestimo.mostrar_dados()
         db.session.commit()
+        invalidar_livros(dados["livro_id"])
 
         return jsonify({
             "msg": "Livro devolvido com sucesso",
-            "emprestimo": emprestimo.mostrar_dados()
+            "emprestimo": dados
         }), 200
 
     except Exception as ex:
@@ -84,27 +117,135 @@ def devolver_emprestimo(id):
 
 @emprestimos_bp.route("/meus-emprestimos", methods=["GET"])
 @jwt_required()
+@etag_versionado("emprestimos", "livros", "pessoas", por_usuario=True)
 def meus_emprestimos():
     claims = get_jwt()
     pessoa_id = claims.get("pessoa_id")
     if not pessoa_id:
          return jsonify([])
          
-    emprestimos = Emprestimo.query.filter_by(pessoa_id=pessoa_id).all()
-    return jsonify([e.mostrar_dados() for e in emprestimos])
+    emprestimos = Emprestimo.com_relacionados().filter_by(pessoa_id=pessoa_id).all()
+    return jsonify(serializacao.emprestimos(emprestimos))
+
+def filtrar_emprestimos(query):
+    """Filtros de ?status, pessoa_id, livro_id, data_inicio/data_fim e q (Query ou select)."""
+    status = request.args.get('status', '', type=str).lower()
+    if status == "ativo":
+        query = query.filter(Emprestimo.data_devolucao.is_(None))
+    elif status == "devolvido":
+        query = query.filter(Emprestimo.data_devolucao.isnot(None))
+    elif status == "atrasado":
+        query = query.filter(
+            Emprestimo.data_devolucao.is_(None),
+            Emprestimo.data_prevista < date.today()
+        )
+
+    pessoa_id = request.args.get('pessoa_id', type=int)
+    if pessoa_id:
+        query = query.filter(Emprestimo.pessoa_id == pessoa_id)
+
+    livro_id = request.args.get('livro_id', type=int)
+    if livro_id:
+        query = query.filter(Emprestimo.livro_id == livro_id)
+
+    data_inicio = ler_data('data_inicio')
+    if data_inicio:
+        query = query.filter(Emprestimo.data_emprestimo >= data_inicio)
+    data_fim = ler_data('data_fim')
+    if data_fim:
+        query = query.filter(Emprestimo.data_emprestimo <= data_fim)
+
+    termo = request.args.get('q', '', type=str)
+    if termo:
+        query = query.filter(
+            or_(
+                Emprestimo.pessoa.has(Pessoa.nome.ilike(f'%{termo}%')),
+                Emprestimo.livro.has(Livro.nome.ilike(f'%{termo}%'))
+            )
+        )
+
+    return query
 
 @emprestimos_bp.route("/emprestimos", methods=["GET"])
 @jwt_required()
 @role_required("CLIENTE", "FUNCIONARIO")
+@etag_versionado("emprestimos", "livros", "pessoas", diario=True)
 def listar_emprestimos():
-    emprestimos = Emprestimo.query.all()
-    return jsonify([e.mostrar_dados() for e in emprestimos])
+    try:
+        # ?fields=/?compacto=: consulta só das colunas pedidas (utils/campos.py)
+        selecao = Selecao.ler(EMPRESTIMOS)
+        query = filtrar_emprestimos(Emprestimo.query if selecao else Emprestimo.com_relacionados())
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    if not pede_paginacao():
+        if selecao:
+            return jsonify(selecao.serializar(limitar_legado(selecao.aplicar(query), Emprestimo.id).all()))
+        return jsonify(serializacao.emprestimos(limitar_legado(query, Emprestimo.id).all()))
+
+    coluna, desc = ler_ordenacao({
+        "id": Emprestimo.id,
+        "data_emprestimo": Emprestimo.data_emprestimo
+    }, "-data_emprestimo")
+    if selecao:
+        query = selecao.aplicar(query, coluna)
+
+    try:
+        itens, meta = paginar(query, coluna, Emprestimo.id, desc)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    return jsonify({"emprestimos": selecao.serializar(itens) if selecao else serializacao.emprestimos(itens), **meta})
+
+def consulta_exportacao():
+    """(consulta, coluna_id, colunas, nome) da exportação; usada também pelas tarefas."""
+    consulta = db.select(
+        Emprestimo.id, Emprestimo.pessoa_id, Pessoa.nome, Emprestimo.livro_id, Livro.nome,
+        Emprestimo.data_emprestimo, Emprestimo.data_devolucao, Emprestimo.data_prevista,
+        Emprestimo.dias_atraso, Emprestimo.multa,
+        case((Emprestimo.data_devolucao.is_(None), "ativo"), else_="devolvido")
+    ).join(Pessoa, Emprestimo.pessoa_id == Pessoa.id).join(Livro, Emprestimo.livro_id == Livro.id)
+
+    return filtrar_emprestimos(consulta), Emprestimo.id, [
+        "id", "pessoa_id", "pessoa_nome", "livro_id", "livro_nome",
+        "data_emprestimo", "data_devolucao", "data_prevista", "dias_atraso", "multa", "status"
+    ], "emprestimos"
+
+@emprestimos_bp.route("/emprestimos/atrasados", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+@etag_versionado("emprestimos", "livros", "pessoas", diario=True)
+def listar_atrasados():
+    """
+    Empréstimos em aberto vencidos, do mais antigo ao mais recente. Uma varredura
+    do índice parcial ix_emprestimos_abertos_prevista; paginado como /emprestimos
+    (?cursor= para keyset). dias_atraso e multa vêm da varredura diária.
+    """
+    query = Emprestimo.com_relacionados().filter(
+        Emprestimo.data_devolucao.is_(None),
+        Emprestimo.data_prevista < date.today()
+    )
+    try:
+        itens, meta = paginar(query, Emprestimo.data_prevista, Emprestimo.id, False)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    return jsonify({"emprestimos": serializacao.emprestimos(itens), **meta})
+
+@emprestimos_bp.route("/emprestimos/exportar", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def exportar_emprestimos():
+    try:
+        return exportar(*consulta_exportacao())
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
 
 @emprestimos_bp.route("/emprestimos/<int:id>", methods=["GET"])
 @jwt_required()
 @role_required("CLIENTE", "FUNCIONARIO")
 def buscar_emprestimo(id):
-    e = Emprestimo.query.get(id)
+    e = Emprestimo.com_relacionados().filter_by(id=id).first()
     if not e:
         return jsonify({"msg": "Empréstimo não encontrado"}), 404
     return jsonify(e.mostrar_dados())
@@ -118,8 +259,13 @@ def deletar_emprestimo(id):
         return jsonify({"msg": "Empréstimo não encontrado"}), 404
 
     try:
+        livro_id = e.livro_id
+        if e.data_devolucao is None:
+            Livro.liberar_exemplares(livro_id)
+        estatistica.registrar_eventos(estatistica.eventos_emprestimo(e, delta=-1))
         db.session.delete(e)
         db.session.commit()
+        invalidar_livros(livro_id)
         return jsonify({"msg": "Empréstimo deletado com sucesso"})
     except Exception as ex:
         db.session.rollback()
@@ -128,35 +274,213 @@ def deletar_emprestimo(id):
 @emprestimos_bp.route("/relatorios", methods=["GET"])
 @jwt_required()
 @role_required("FUNCIONARIO")
+@etag_versionado("emprestimos", "livros", diario=True)
 def relatorios():
-    emprestimos = Emprestimo.query.all()
-    
-    total_emprestimos = len(emprestimos)
-    ativos = sum(1 for e in emprestimos if e.data_devolucao is None)
+    return jsonify(calcular_relatorios(request.args.get('limite', 10, type=int)))
+
+MAX_LIVROS_RELATORIO = 100
+
+def calcular_relatorios(limite=10):
+    # Vale também para a tarefa "relatorios", que recebe o limite do corpo
+    limite = max(1, min(limite, MAX_LIVROS_RELATORIO))
+    ativo = Emprestimo.data_devolucao.is_(None)
+    atrasado = and_(ativo, Emprestimo.data_prevista < date.today())
+
+    total_emprestimos, ativos, atrasados = db.session.query(
+        func.count(Emprestimo.id),
+        func.coalesce(func.sum(case((ativo, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((atrasado, 1), else_=0)), 0)
+    ).one()
     devolvidos = total_emprestimos - ativos
 
-    hoje = date.today()
-    atrasados = 0
-    for e in emprestimos:
-        if e.data_devolucao is None:
-            prazo = e.data_emprestimo + timedelta(days=7)
-            if hoje > prazo:
-                atrasados += 1
-
-    livros_count = {}
-    for e in emprestimos:
-        nome_livro = e.livro.nome if e.livro else "Livro Deletado"
-        livros_count[nome_livro] = livros_count.get(nome_livro, 0) + 1
-        
-    livros_mais_emprestados = [{"nome": nome, "qtd": qtd} 
-                               for nome, qtd in livros_count.items()]
-    
-    livros_mais_emprestados.sort(key=lambda x: x["qtd"], reverse=True)
+    qtd = func.count(Emprestimo.id).label("qtd")
+    top_livros = db.session.query(Livro.nome, qtd).join(
+        Emprestimo, Emprestimo.livro_id == Livro.id
+    ).group_by(Livro.id, Livro.nome).order_by(qtd.desc(), Livro.nome).limit(limite).all()
 
-    return jsonify({
+    livros_mais_emprestados = [{"nome": nome, "qtd": qtd} for nome, qtd in top_livros]
+
+    return {
         "total_emprestimos": total_emprestimos,
         "ativos": ativos,
         "devolvidos": devolvidos,
         "atrasados": atrasados,
         "livros_mais_emprestados": livros_mais_emprestados
-    })
\ No newline at end of file
+    }
+
+MAX_ITENS_LOTE = 500
+
+def _ler_id(valor):
+    """Id inteiro positivo vindo do corpo (aceita "12"), ou None se inválido."""
+    if isinstance(valor, str) and valor.strip().isdigit():
+        valor = int(valor)
+    # Acima de 2**31 - 1 o INTEGER do banco estouraria e derrubaria o lote inteiro
+    if isinstance(valor, bool) or not isinstance(valor, int) or not 0 < valor < 2**31:
+        return None
+    return valor
+
+@emprestimos_bp.route("/emprestimos/lote", methods=["POST"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def criar_emprestimos_lote():
+    """
+    Cria vários empréstimos em uma transação.
+    Corpo: {"itens": [{"pessoa_id": 1, "livro_id": 2, "data_emprestimo": "AAAA-MM-DD"?}, ...]}
+    Cada item recebe seu próprio status; itens inválidos não impedem os demais.
+    """
+    data = request.get_json() or {}
+    itens = data.get("itens")
+    if not isinstance(itens, list) or not itens:
+        return jsonify({"msg": "Informe a lista 'itens'"}), 400
+    if len(itens) > MAX_ITENS_LOTE:
+        return jsonify({"msg": f"Máximo de {MAX_ITENS_LOTE} itens por lote"}), 400
+
+    # Ids validados item a item antes do IN: um item malformado vira erro só dele
+    chaves = [
+        (_ler_id(i.get("pessoa_id")), _ler_id(i.get("livro_id"))) if isinstance(i, dict) else (None, None)
+        for i in itens
+    ]
+
+    try:
+        pessoa_ids = {p for p, _ in chaves if p is not None}
+        livro_ids = {l for _, l in chaves if l is not None}
+
+        pessoas = {p.id: p for p in Pessoa.query.filter(Pessoa.id.in_(pessoa_ids)).all()}
+        # Trava as linhas dos livros até o commit para que a conta de estoque seja exata
+        livros = {l.id: l for l in Livro.query.filter(Livro.id.in_(livro_ids)).options(
+            selectinload(Livro.categorias)
+        ).with_for_update().all()}
+        livres = {l.id: l.quantidade - l.emprestados_ativos for l in livros.values()}
+
+        resultados, novos, reservados = [], [], {}
+        for indice, item in enumerate(itens):
+            if not isinstance(item, dict):
+                resultados.append({"indice": indice, "status": "erro", "msg": "Item inválido"})
+                continue
+
+            pessoa_id, livro_id = chaves[indice]
+            if pessoa_id is None:
+                resultados.append({"indice": indice, "status": "erro", "msg": "pessoa_id inválido"})
+                continue
+            if livro_id is None:
+                resultados.append({"indice": indice, "status": "erro", "msg": "livro_id inválido"})
+                continue
+
+            pessoa = pessoas.get(pessoa_id)
+            livro = livros.get(livro_id)
+            if not pessoa:
+                resultados.append({"indice": indice, "status": "erro", "msg": "Pessoa não encontrada"})
+                continue
+            if not livro:
+                resultados.append({"indice": indice, "status": "erro", "msg": "Livro não encontrado"})
+                continue
+            if livres[livro.id] <= 0:
+                resultados.append({"indice": indice, "status": "erro", "msg": f"Estoque esgotado para '{livro.nome}'"})
+                continue
+
+            try:
+                data_str = item.get("data_emprestimo")
+                data_emprestimo_obj = datetime.strptime(data_str, "%Y-%m-%d").date() if data_str else date.today()
+            except (TypeError, ValueError):
+                resultados.append({"indice": indice, "status": "erro", "msg": "Data inválida"})
+                continue
+
+            livres[livro.id] -= 1
+            reservados[livro.id] = reservados.get(livro.id, 0) + 1
+            emprestimo = Emprestimo(
+                pessoa=pessoa, livro=livro, data_emprestimo=data_emprestimo_obj,
+                data_prevista=Emprestimo.prever(livro, pessoa, data_emprestimo_obj)
+            )
+            novos.append(emprestimo)
+            resultados.append({"indice": indice, "status": "criado", "emprestimo": emprestimo})
+
+        db.session.add_all(novos)
+        Livro.ajustar_emprestados(reservados)
+        db.session.flush()
+        estatistica.registrar_eventos(ev for e in novos for ev in estatistica.eventos_emprestimo(e))
+
+        criados = [r for r in resultados if "emprestimo" in r]
+        for r, dados in zip(criados, serializacao.emprestimos(r["emprestimo"] for r in criados)):
+            r["emprestimo"] = dados
+        db.session.commit()
+        if reservados:
+            invalidar_livros(*reservados)
+
+        return jsonify({
+            "criados": len(novos),
+            "erros": len(resultados) - len(novos),
+            "resultados": resultados
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Erro ao criar empréstimos", "erro": str(e)}), 400
+
+@emprestimos_bp.route("/emprestimos/lote/devolver", methods=["PUT"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def devolver_emprestimos_lote():
+    """
+    Registra a devolução de vários empréstimos em uma transação.
+    Corpo: {"ids": [1, 2, 3]}
+    """
+    data = request.get_json() or {}
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"msg": "Informe a lista 'ids'"}), 400
+    if len(ids) > MAX_ITENS_LOTE:
+        return jsonify({"msg": f"Máximo de {MAX_ITENS_LOTE} itens por lote"}), 400
+
+    lidos = [_ler_id(id) for id in ids]
+
+    try:
+        hoje = date.today()
+        validos = {id for id in lidos if id is not None}
+        emprestimos = {e.id: e for e in Emprestimo.com_relacionados().filter(Emprestimo.id.in_(validos)).all()}
+
+        # Só os que ainda estavam em aberto no momento do UPDATE são devolvidos
+        devolvidos = set(db.session.execute(
+            update(Emprestimo)
+            .where(Emprestimo.id.in_(list(emprestimos)), Emprestimo.data_devolucao.is_(None))
+            .values(data_devolucao=hoje)
+            .returning(Emprestimo.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+
+        resultados, liberados = [], {}
+        for bruto, id in zip(ids, lidos):
+            if id is None:
+                resultados.append({"id": bruto, "status": "erro", "msg": "Id inválido"})
+                continue
+            e = emprestimos.get(id)
+            if not e:
+                resultados.append({"id": id, "status": "erro", "msg": "Empréstimo não encontrado"})
+            elif id not in devolvidos:
+                resultados.append({"id": id, "status": "erro", "msg": "Este empréstimo já foi devolvido anteriormente"})
+            else:
+                set_committed_value(e, "data_devolucao", hoje)
+                e.dias_atraso, e.multa = calcular_atraso(e.data_prevista, hoje)
+                liberados[e.livro_id] = liberados.get(e.livro_id, 0) - 1
+                resultados.append({"id": id, "status": "devolvido", "emprestimo": e.mostrar_dados()})
+                # Ids repetidos no corpo só contam uma vez
+                devolvidos.discard(id)
+
+        Livro.ajustar_emprestados(liberados)
+        estatistica.registrar_eventos(
+            (r["emprestimo"]["livro_id"], hoje, estatistica.DEVOLUCAO, 1)
+            for r in resultados if r["status"] == "devolvido"
+        )
+        db.session.commit()
+        if liberados:
+            invalidar_livros(*liberados)
+
+        total = sum(1 for r in resultados if r["status"] == "devolvido")
+        return jsonify({
+            "devolvidos": total,
+            "erros": len(resultados) - total,
+            "resultados": resultados
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Erro ao registrar devoluções", "erro": str(e)}), 400
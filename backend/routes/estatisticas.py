@@ -0,0 +1,143 @@
+from datetime import date, timedelta
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from sqlalchemy import func
+from database import db
+from decorators import role_required, etag_versionado
+from models.livro import Livro
+from models.categoria import Categoria
+from models.estatistica import EstatisticaDia, EstatisticaLivroDia, EstatisticaCategoriaDia
+from utils.exportacao import ler_data
+
+# Séries e rankings lidos só das tabelas pré-agregadas (models/estatistica.py)
+estatisticas_bp = Blueprint("estatisticas", __name__)
+
+# Período padrão (em dias) quando data_inicio não é informada
+PERIODO_PADRAO = {"dia": 30, "semana": 12 * 7, "mes": 365}
+MAX_DIAS = 366 * 20
+
+
+def _inicio_periodo(dia, agrupar):
+    if agrupar == "semana":
+        return dia - timedelta(days=dia.weekday())
+    if agrupar == "mes":
+        return dia.replace(day=1)
+    return dia
+
+
+def _proximo_periodo(dia, agrupar):
+    if agrupar == "semana":
+        return dia + timedelta(days=7)
+    if agrupar == "mes":
+        return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return dia + timedelta(days=1)
+
+
+def _ler_intervalo(padrao_dias):
+    fim = ler_data("data_fim") or date.today()
+    inicio = ler_data("data_inicio") or fim - timedelta(days=padrao_dias - 1)
+    if inicio > fim:
+        raise ValueError("data_inicio deve ser anterior a data_fim")
+    if (fim - inicio).days > MAX_DIAS:
+        raise ValueError(f"Intervalo máximo de {MAX_DIAS} dias")
+    return inicio, fim
+
+
+@estatisticas_bp.route("/relatorios/serie", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+@etag_versionado("estatisticas_dia", "estatisticas_livro_dia", "estatisticas_categoria_dia", diario=True)
+def serie_emprestimos():
+    """
+    Empréstimos e devoluções por dia/semana/mês.
+    ?agrupar=dia|semana|mes, data_inicio, data_fim e opcionalmente livro_id ou categoria_id.
+    """
+    agrupar = request.args.get("agrupar", "dia", type=str)
+    if agrupar not in PERIODO_PADRAO:
+        return jsonify({"msg": "agrupar deve ser dia, semana ou mes"}), 400
+    try:
+        inicio, fim = _ler_intervalo(PERIODO_PADRAO[agrupar])
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    livro_id = request.args.get("livro_id", type=int)
+    categoria_id = request.args.get("categoria_id", type=int)
+    if livro_id:
+        modelo, filtro = EstatisticaLivroDia, EstatisticaLivroDia.livro_id == livro_id
+    elif categoria_id:
+        modelo, filtro = EstatisticaCategoriaDia, EstatisticaCategoriaDia.categoria_id == categoria_id
+    else:
+        modelo, filtro = EstatisticaDia, None
+
+    consulta = db.select(modelo.dia, modelo.emprestimos, modelo.devolucoes).where(modelo.dia.between(inicio, fim))
+    if filtro is not None:
+        consulta = consulta.where(filtro)
+
+    # Todos os períodos do intervalo, inclusive os sem movimento
+    periodos = {}
+    periodo = _inicio_periodo(inicio, agrupar)
+    while periodo <= fim:
+        periodos[periodo] = [0, 0]
+        periodo = _proximo_periodo(periodo, agrupar)
+
+    for dia, emprestimos, devolucoes in db.session.execute(consulta):
+        contagem = periodos[_inicio_periodo(dia, agrupar)]
+        contagem[0] += emprestimos
+        contagem[1] += devolucoes
+
+    serie = [
+        {"periodo": p.isoformat(), "emprestimos": emp, "devolucoes": dev}
+        for p, (emp, dev) in periodos.items()
+    ]
+    return jsonify({
+        "agrupar": agrupar,
+        "data_inicio": inicio.isoformat(),
+        "data_fim": fim.isoformat(),
+        "livro_id": livro_id,
+        "categoria_id": categoria_id,
+        "total_emprestimos": sum(p["emprestimos"] for p in serie),
+        "total_devolucoes": sum(p["devolucoes"] for p in serie),
+        "serie": serie
+    }), 200
+
+
+@estatisticas_bp.route("/relatorios/ranking", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+@etag_versionado("estatisticas_livro_dia", "estatisticas_categoria_dia", "livros", "categorias", diario=True)
+def ranking_emprestimos():
+    """Livros ou categorias mais emprestados no período. ?dimensao=livro|categoria&limite=10"""
+    dimensao = request.args.get("dimensao", "livro", type=str)
+    if dimensao == "livro":
+        modelo, chave, entidade = EstatisticaLivroDia, EstatisticaLivroDia.livro_id, Livro
+    elif dimensao == "categoria":
+        modelo, chave, entidade = EstatisticaCategoriaDia, EstatisticaCategoriaDia.categoria_id, Categoria
+    else:
+        return jsonify({"msg": "dimensao deve ser livro ou categoria"}), 400
+
+    try:
+        inicio, fim = _ler_intervalo(PERIODO_PADRAO["dia"])
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    limite = max(1, min(request.args.get("limite", 10, type=int), 100))
+
+    emprestimos = func.sum(modelo.emprestimos).label("emprestimos")
+    linhas = db.session.execute(
+        db.select(chave, entidade.nome, emprestimos, func.sum(modelo.devolucoes))
+        .join(entidade, entidade.id == chave)
+        .where(modelo.dia.between(inicio, fim))
+        .group_by(chave, entidade.nome)
+        .having(emprestimos > 0)
+        .order_by(emprestimos.desc(), entidade.nome)
+        .limit(limite)
+    ).all()
+
+    return jsonify({
+        "dimensao": dimensao,
+        "data_inicio": inicio.isoformat(),
+        "data_fim": fim.isoformat(),
+        "ranking": [
+            {"id": id_, "nome": nome, "emprestimos": emp, "devolucoes": dev}
+            for id_, nome, emp, dev in linhas
+        ]
+    }), 200
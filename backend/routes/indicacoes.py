@@ -2,33 +2,35 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from models.indicacao import IndicacaoSemana
 from models.livro import Livro
+from models.versao import linha
 from database import db
-from decorators import role_required
+from decorators import role_required, etag_versionado
 from datetime import date, datetime
 from sqlalchemy import and_
+from utils import serializacao
+from cache import cache, chave_indicacoes, invalidar_indicacoes
 
 indicacoes_bp = Blueprint("indicacoes_bp", __name__)
 
 @indicacoes_bp.route("/indicacoes", methods=["GET"])
 @jwt_required()
+@etag_versionado("indicacoes_semana", "livros", "emprestimos", "categorias", diario=True)
 def livros_semana():
     hoje = date.today()
-    indicacoes = IndicacaoSemana.query.filter(
-        and_(
-            IndicacaoSemana.data_inicio <= hoje,
-            IndicacaoSemana.data_fim >= hoje
-        )
-    ).all()
-    
-    resultado = []
-    for i in indicacoes:
-        livro_dados = i.livro.mostrar_dados()
-        livro_dados["id_indicacao"] = i.id
-        livro_dados["data_inicio"] = i.data_inicio.isoformat()
-        livro_dados["data_fim"] = i.data_fim.isoformat()
-        resultado.append(livro_dados)
 
-    return jsonify(resultado)
+    def carregar():
+        indicacoes = IndicacaoSemana.query.filter(
+            and_(
+                IndicacaoSemana.data_inicio <= hoje,
+                IndicacaoSemana.data_fim >= hoje
+            )
+        ).all()
+        return serializacao.indicacoes(indicacoes)
+
+    return jsonify(cache.obter_ou_calcular(
+        chave_indicacoes(hoje), carregar, versoes=["indicacoes_semana", "livros", "categorias"],
+        linhas=lambda livros: [linha("livros", l["id"]) for l in livros], guarda=["emprestimos"]
+    ))
 
 @indicacoes_bp.route("/indicacoes", methods=["POST"])
 @jwt_required()
@@ -43,6 +45,7 @@ def criar_indicacao():
         )
         db.session.add(indicacao)
         db.session.commit()
+        invalidar_indicacoes()
         return jsonify({"msg": "Indicação criada com sucesso"}), 201
     except Exception as e:
         db.session.rollback()
@@ -55,4 +58,5 @@ def deletar_indicacao(id):
     indicacao = IndicacaoSemana.query.get_or_404(id)
     db.session.delete(indicacao)
     db.session.commit()
+    invalidar_indicacoes()
     return jsonify({"msg": "Indicação removida com sucesso"})
\ No newline at end of file
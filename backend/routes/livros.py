@@ -1,24 +1,28 @@
 from flask import Blueprint, request, jsonify
 from database import db
-from models.livro import Livro
-from models.pessoa import Pessoa
+from models.livro import Livro, livro_categoria
+from models.pessoa import Pessoa, tabela_favoritos
 from models.categoria import Categoria
-from decorators import role_required
-from flask_jwt_extended import jwt_required, get_jwt
+from models.versao import linha
+from decorators import role_required, etag_versionado
+from flask_jwt_extended import jwt_required, get_jwt, current_user
 from datetime import date
-from sqlalchemy import or_
+from utils import busca, importacao, serializacao
+from utils.campos import Selecao, LIVROS
+from utils.exportacao import exportar, ler_data
+from utils.sugestoes import indice_livros, normalizar_consulta, ler_limite
+from cache import cache, chave_livro, chave_livros_inicio, invalidar_livros
 
 livros_bp = Blueprint("livros", __name__)
 
 @livros_bp.route("/livros/<int:id>/favoritar", methods=["POST"])
 @jwt_required()
 def favoritar_livro(id):
-    claims = get_jwt()
-    pessoa_id = claims.get("pessoa_id")
+    pessoa_id = current_user.pessoa_id
     if not pessoa_id: return jsonify({"error": "Erro de permissão"}), 400
-    pessoa = Pessoa.query.get(pessoa_id)
+    pessoa = db.session.get(Pessoa, pessoa_id)
     livro = Livro.query.get_or_404(id)
-    if livro in pessoa.favoritos:
+    if pessoa.favoritos.filter(Livro.id == livro.id).first():
         pessoa.favoritos.remove(livro)
         msg, is_fav = "Removido dos favoritos", False
     else:
@@ -29,12 +33,15 @@ def favoritar_livro(id):
 
 @livros_bp.route("/livros/meus-favoritos-ids", methods=["GET"])
 @jwt_required()
+@etag_versionado("pessoas", "livros", por_usuario=True)
 def listar_ids_favoritos():
-    claims = get_jwt()
-    pessoa_id = claims.get("pessoa_id")
+    pessoa_id = current_user.pessoa_id
     if not pessoa_id: return jsonify([])
-    pessoa = Pessoa.query.get(pessoa_id)
-    return jsonify([l.id for l in pessoa.favoritos])
+    # Só os ids, direto da tabela de associação: não precisa carregar a Pessoa
+    ids = db.session.execute(
+        db.select(tabela_favoritos.c.livro_id).where(tabela_favoritos.c.pessoa_id == pessoa_id)
+    ).scalars()
+    return jsonify(list(ids))
 
 
 @livros_bp.route("/livros", methods=["POST"])
@@ -69,19 +76,46 @@ def criar_livro():
         
         db.session.add(livro)
         db.session.commit()
+        invalidar_livros(livro.id)
         return jsonify(livro.mostrar_dados()), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+@livros_bp.route("/livros/importar", methods=["POST"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def importar_livros():
+    # Arquivo no campo "arquivo" (multipart) ou no corpo da requisição com ?formato=csv|jsonl.
+    # Para arquivos muito grandes prefira o comando `flask importar-livros`.
+    arquivo = request.files.get("arquivo")
+    if arquivo:
+        formato = request.args.get("formato") or importacao.detectar_formato(arquivo.filename)
+        fluxo = arquivo.stream
+    else:
+        formato = request.args.get("formato")
+        fluxo = request.stream
+
+    lote = request.args.get("lote", importacao.TAMANHO_LOTE, type=int)
+    try:
+        relatorio = importacao.importar(fluxo, formato, tamanho_lote=max(1, min(lote, 5000)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(relatorio), 200
+
 @livros_bp.route("/livros", methods=["GET"])
 @jwt_required()
+@etag_versionado("livros", "emprestimos", "categorias", "pessoas", por_usuario=True)
 def listar_livros():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 8, type=int)
     termo = request.args.get('q', '', type=str)
     somente_favoritos = request.args.get('apenas_favoritos', 'false') == 'true'
     ver_arquivados = request.args.get('ver_arquivados', 'false') == 'true'
+    try:
+        selecao = Selecao.ler(LIVROS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     claims = get_jwt()
     role = claims.get("role")
@@ -97,32 +131,100 @@ def listar_livros():
         if pessoa_id:
             query = query.join(Pessoa.favoritos).filter(Pessoa.id == pessoa_id)
     
+    relevancia = None
     if termo:
-        query = query.filter(
-            or_(
-                Livro.nome.ilike(f'%{termo}%'),
-                Livro.autor.ilike(f'%{termo}%'),
-                Livro.descricao.ilike(f'%{termo}%'),
-                Livro.categorias.any(Categoria.nome.ilike(f'%{termo}%'))
-            )
-        )
-    
-    query = query.order_by(Livro.nome)
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        query, relevancia = busca.filtrar(query, termo)
+
+    ordem = [relevancia, Livro.nome] if relevancia is not None else [Livro.nome]
+    query = query.order_by(*ordem)
+    if selecao:
+        query = selecao.aplicar(query)
+
+    def montar_pagina():
+        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        return {
+            "livros": selecao.serializar(pagination.items) if selecao else serializacao.livros(pagination.items),
+            "total_itens": pagination.total,
+            "total_paginas": pagination.pages,
+            "pagina_atual": page
+        }
+
+    # A primeira página sem filtros é igual para todos e é a mais acessada
+    if page == 1 and not (termo or somente_favoritos or ver_arquivados or selecao):
+        # Vale por livro da página: um empréstimo só sobe a versão da linha do livro (models/versao.py)
+        return jsonify(cache.obter_ou_calcular(
+            chave_livros_inicio(per_page), montar_pagina, versoes=["livros", "categorias"],
+            linhas=lambda pagina: [linha("livros", l["id"]) for l in pagina["livros"]], guarda=["emprestimos"]
+        )), 200
+
+    return jsonify(montar_pagina()), 200
 
-    return jsonify({
-        "livros": [l.mostrar_dados() for l in pagination.items],
-        "total_itens": pagination.total,
-        "total_paginas": pagination.pages,
-        "pagina_atual": page
-    }), 200
+def _incluir_categorias(linhas):
+    # Uma consulta por bloco em vez de agregar (string_agg/group_concat variam por banco)
+    por_livro = {}
+    for livro_id, nome in db.session.execute(
+        db.select(livro_categoria.c.livro_id, Categoria.nome)
+        .join(Categoria, Categoria.id == livro_categoria.c.categoria_id)
+        .where(livro_categoria.c.livro_id.in_([l["id"] for l in linhas]))
+        .order_by(Categoria.nome)
+    ):
+        por_livro.setdefault(livro_id, []).append(nome)
+    for l in linhas:
+        l["categorias"] = ";".join(por_livro.get(l["id"], []))
+
+def consulta_exportacao():
+    colunas = ["id", "nome", "autor", "isbn", "descricao", "data_aquisicao", "quantidade",
+               "quantidade_disponivel", "ativo", "categorias"]
+    consulta = db.select(
+        Livro.id, Livro.nome, Livro.autor, Livro.isbn, Livro.descricao, Livro.data_aquisicao,
+        Livro.quantidade, Livro.quantidade - Livro.emprestados_ativos, Livro.ativo
+    )
+
+    status = request.args.get('status', '', type=str).lower()
+    if status == "ativo":
+        consulta = consulta.where(Livro.ativo == True)
+    elif status == "arquivado":
+        consulta = consulta.where(Livro.ativo == False)
+
+    data_inicio = ler_data('data_inicio')
+    if data_inicio:
+        consulta = consulta.where(Livro.data_aquisicao >= data_inicio)
+    data_fim = ler_data('data_fim')
+    if data_fim:
+        consulta = consulta.where(Livro.data_aquisicao <= data_fim)
+
+    termo = request.args.get('q', '', type=str)
+    if termo:
+        consulta, _ = busca.filtrar(consulta, termo)
+
+    return consulta, Livro.id, colunas, "livros", _incluir_categorias
+
+@livros_bp.route("/livros/exportar", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def exportar_livros():
+    try:
+        return exportar(*consulta_exportacao())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@livros_bp.route("/livros/sugestoes", methods=["GET"])
+@jwt_required()
+def sugerir_livros():
+    termo = normalizar_consulta(request.args.get('q', '', type=str))
+    return jsonify(indice_livros.buscar(termo, ler_limite())), 200
 
 @livros_bp.route("/livros/<int:id>", methods=["GET"])
 @jwt_required()
+@etag_versionado("livros", "emprestimos", "categorias")
 def buscar_livro(id):
-    livro = Livro.query.get(id)
-    if not livro: return jsonify({"error": "Livro não encontrado"}), 404
-    return jsonify(livro.mostrar_dados()), 200
+    def carregar():
+        livro = Livro.query.get(id)
+        return livro.mostrar_dados() if livro else None
+
+    dados = cache.obter_ou_calcular(chave_livro(id), carregar, versoes=["livros", "categorias", linha("livros", id)])
+    if not dados: return jsonify({"error": "Livro não encontrado"}), 404
+    return jsonify(dados), 200
 
 @livros_bp.route("/livros/<int:id>", methods=["PUT"])
 @jwt_required()
@@ -152,6 +254,7 @@ def atualizar_livro(id):
             livro.ativo = bool(data["ativo"])
 
         db.session.commit()
+        invalidar_livros(id)
         return jsonify(livro.mostrar_dados()), 200
     except Exception as e:
         db.session.rollback()
@@ -166,6 +269,7 @@ def deletar_livro(id):
     try:
         livro.ativo = False 
         db.session.commit()
+        invalidar_livros(id)
         return jsonify({"message": "Livro arquivado com sucesso"}), 200
     except Exception as e:
         db.session.rollback()
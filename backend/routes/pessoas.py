@@ -2,17 +2,85 @@ from flask import Blueprint, request, jsonify
 from database import db
 from models.pessoa import Pessoa
 from models.emprestimo import Emprestimo
-from decorators import role_required
+from models.livro import Livro
+from models import estatistica
+from decorators import role_required, etag_versionado
 from flask_jwt_extended import jwt_required
+from sqlalchemy import or_, func
+from utils.paginacao import pede_paginacao, ler_ordenacao, paginar, limitar_legado
+from utils.exportacao import exportar
+from utils import serializacao
+from utils.campos import Selecao, PESSOAS
+from utils.sugestoes import indice_pessoas, normalizar_consulta, ler_limite
+from cache import invalidar_livros
 
 pessoas_bp = Blueprint("pessoas", __name__)
 
 @pessoas_bp.route("/pessoas", methods=["GET"])
 @jwt_required()
 @role_required("FUNCIONARIO")
+@etag_versionado("pessoas")
 def listar_pessoas():
-    pessoas = Pessoa.query.all()
-    return jsonify([p.mostrar_dados() for p in pessoas]), 200
+    try:
+        selecao = Selecao.ler(PESSOAS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    query = Pessoa.query
+
+    termo = request.args.get('q', '', type=str)
+    if termo:
+        query = query.filter(
+            or_(
+                Pessoa.nome.ilike(f'%{termo}%'),
+                Pessoa.email.ilike(f'%{termo}%'),
+                Pessoa.cpf.ilike(f'%{termo}%')
+            )
+        )
+
+    tipo = request.args.get('tipo', '', type=str)
+    if tipo:
+        query = query.filter(Pessoa.tipo == tipo.upper())
+
+    if not pede_paginacao():
+        if selecao:
+            return jsonify(selecao.serializar(limitar_legado(selecao.aplicar(query), Pessoa.id).all())), 200
+        return jsonify(serializacao.pessoas(limitar_legado(query, Pessoa.id).all())), 200
+
+    coluna, desc = ler_ordenacao({"id": Pessoa.id, "nome": Pessoa.nome}, "nome")
+    if selecao:
+        query = selecao.aplicar(query, coluna)
+
+    try:
+        itens, meta = paginar(query, coluna, Pessoa.id, desc)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"pessoas": selecao.serializar(itens) if selecao else serializacao.pessoas(itens), **meta}), 200
+
+def consulta_exportacao():
+    colunas = ["id", "cpf", "nome", "idade", "email", "numero", "tipo"]
+    consulta = db.select(*[getattr(Pessoa, c) for c in colunas])
+
+    tipo = request.args.get('tipo', '', type=str)
+    if tipo:
+        consulta = consulta.where(Pessoa.tipo == tipo.upper())
+    return consulta, Pessoa.id, colunas, "pessoas"
+
+@pessoas_bp.route("/pessoas/exportar", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def exportar_pessoas():
+    try:
+        return exportar(*consulta_exportacao())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@pessoas_bp.route("/pessoas/sugestoes", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def sugerir_pessoas():
+    termo = normalizar_consulta(request.args.get('q', '', type=str))
+    return jsonify(indice_pessoas.buscar(termo, ler_limite())), 200
 
 @pessoas_bp.route("/pessoas/<int:id>", methods=["GET"])
 @jwt_required()
@@ -59,6 +127,24 @@ def delete_pessoa(id):
         pessoa = Pessoa.query.get(id)
         if not pessoa:
             return {"msg": "Pessoa não encontrada"}, 404
+        ativos = db.session.query(Emprestimo.livro_id, func.count(Emprestimo.id)).filter_by(
+            pessoa_id=id, data_devolucao=None
+        ).group_by(Emprestimo.livro_id).all()
+        for livro_id, qtd in ativos:
+            Livro.liberar_exemplares(livro_id, qtd)
+
+        # Desconta das estatísticas o histórico apagado, agrupado por livro e dia
+        historico = []
+        for coluna, tipo in ((Emprestimo.data_emprestimo, estatistica.EMPRESTIMO),
+                             (Emprestimo.data_devolucao, estatistica.DEVOLUCAO)):
+            historico += [
+                (livro_id, dia, tipo, -qtd)
+                for livro_id, dia, qtd in db.session.query(Emprestimo.livro_id, coluna, func.count(Emprestimo.id))
+                .filter(Emprestimo.pessoa_id == id, coluna.isnot(None))
+                .group_by(Emprestimo.livro_id, coluna)
+            ]
+        estatistica.registrar_eventos(historico)
+
         Emprestimo.query.filter_by(pessoa_id=id).delete()
         
         if pessoa.usuario:
@@ -66,6 +152,9 @@ def delete_pessoa(id):
 
         db.session.delete(pessoa)
         db.session.commit()
+        # Os empréstimos em aberto apagados liberam exemplares
+        if ativos:
+            invalidar_livros(*[livro_id for livro_id, _ in ativos])
 
         return {"msg": "Pessoa, usuário e histórico de empréstimos deletados com sucesso"}, 200
 
@@ -0,0 +1,88 @@
+import gzip
+import os
+from flask import Blueprint, request, jsonify, Response, current_app, send_file
+from flask_jwt_extended import jwt_required, get_jwt
+from decorators import role_required
+from database import db
+from models.tarefa import Tarefa, STATUS_CONCLUIDA
+import tarefas
+
+tarefas_bp = Blueprint("tarefas", __name__)
+
+@tarefas_bp.route("/tarefas", methods=["POST"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def submeter_tarefa():
+    # JSON {"tipo", "parametros"} ou multipart com "tipo", "arquivo" e os parâmetros como campos
+    arquivo = request.files.get("arquivo")
+    if arquivo:
+        tipo = request.form.get("tipo", "")
+        parametros = {k: v for k, v in request.form.items() if k != "tipo"}
+        if tipo == "importar_livros" and not parametros.get("formato"):
+            from utils.importacao import detectar_formato
+            parametros["formato"] = detectar_formato(arquivo.filename)
+    else:
+        data = request.get_json(silent=True) or {}
+        tipo = data.get("tipo", "")
+        parametros = data.get("parametros") or {}
+        if not isinstance(parametros, dict):
+            return jsonify({"error": "'parametros' deve ser um objeto"}), 400
+
+    try:
+        tarefa, nova = tarefas.submeter(
+            tipo, parametros,
+            entrada=arquivo.stream if arquivo else None,
+            pessoa_id=get_jwt().get("pessoa_id")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    tarefas.garantir_trabalhadores(current_app._get_current_object())
+
+    resposta = jsonify({**tarefa.mostrar_dados(), "reaproveitada": not nova})
+    resposta.headers["Location"] = f"/tarefas/{tarefa.id}"
+    return resposta, 202 if tarefa.status != STATUS_CONCLUIDA else 200
+
+@tarefas_bp.route("/tarefas", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def listar_tarefas():
+    query = Tarefa.query
+    status = request.args.get('status', '', type=str)
+    if status:
+        query = query.filter(Tarefa.status == status)
+    limite = min(request.args.get('limite', 50, type=int), 200)
+    return jsonify([t.mostrar_dados() for t in query.order_by(Tarefa.criada_em.desc()).limit(limite)]), 200
+
+@tarefas_bp.route("/tarefas/<id>", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def buscar_tarefa(id):
+    tarefa = db.session.get(Tarefa, id)
+    if not tarefa: return jsonify({"error": "Tarefa não encontrada"}), 404
+    return jsonify(tarefa.mostrar_dados()), 200
+
+@tarefas_bp.route("/tarefas/<id>/resultado", methods=["GET"])
+@jwt_required()
+@role_required("FUNCIONARIO")
+def baixar_resultado(id):
+    tarefa = db.session.get(Tarefa, id)
+    if not tarefa: return jsonify({"error": "Tarefa não encontrada"}), 404
+    if tarefa.status != STATUS_CONCLUIDA:
+        return jsonify({"error": "Tarefa ainda não concluída", "status": tarefa.status}), 409
+
+    caminho = tarefas.caminho_resultado(tarefa.id)
+    if not os.path.exists(caminho):
+        return jsonify({"error": "Resultado não está mais disponível; submeta a tarefa de novo"}), 410
+
+    # O arquivo já está gzipado: vai direto do disco para quem aceita gzip
+    if "gzip" in request.accept_encodings:
+        resposta = send_file(caminho, mimetype=tarefa.mimetype, conditional=False, etag=False)
+        resposta.headers["Content-Encoding"] = "gzip"
+    else:
+        def descompactar():
+            with gzip.open(caminho, "rb") as arquivo:
+                while bloco := arquivo.read(64 * 1024):
+                    yield bloco
+        resposta = Response(descompactar(), mimetype=tarefa.mimetype)
+    resposta.headers["Content-Disposition"] = f"attachment; filename={tarefa.nome_arquivo}"
+    return resposta
@@ -0,0 +1,190 @@
+"""
+Benchmark dos índices das consultas quentes (migração 0004).
+
+Uso (sempre contra um banco descartável):
+    DATABASE_URL=sqlite:////tmp/bench.db python scripts/benchmark_indices.py --popular
+    DATABASE_URL=postgresql://.../bench python scripts/benchmark_indices.py --popular --emprestimos 2000000
+
+Com --popular, gera um acervo sintético. Depois remove os índices, mede cada
+consulta (mediana de N execuções) e mostra o plano (EXPLAIN), recria os
+índices e mede de novo.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, insert
+from app import create_app
+from database import db
+import migracoes
+from models.livro import Livro, livro_categoria
+from models.pessoa import Pessoa, tabela_favoritos
+from models.categoria import Categoria
+from models.emprestimo import Emprestimo
+from models.indicacao import IndicacaoSemana
+
+TABELAS_INDICES = ("emprestimos", "indicacoes_semana", "favoritos", "livro_categoria", "usuarios")
+LOTE = 10000
+
+CONSULTAS = {
+    "ativos de um livro": (
+        "SELECT count(*) FROM emprestimos WHERE livro_id = :livro AND data_devolucao IS NULL"
+    ),
+    "ativos por livro (página)": (
+        "SELECT livro_id, count(id) FROM emprestimos WHERE livro_id IN ({ids}) "
+        "AND data_devolucao IS NULL GROUP BY livro_id"
+    ),
+    "meus empréstimos": (
+        "SELECT * FROM emprestimos WHERE pessoa_id = :pessoa"
+    ),
+    "indicações vigentes": (
+        "SELECT * FROM indicacoes_semana WHERE data_inicio <= :hoje AND data_fim >= :hoje"
+    ),
+    "quem favoritou o livro": (
+        "SELECT count(*) FROM favoritos WHERE livro_id = :livro"
+    ),
+    "livros da categoria": (
+        "SELECT count(*) FROM livro_categoria WHERE categoria_id = :categoria"
+    ),
+    "atrasados (página)": (
+        "SELECT id FROM emprestimos WHERE data_devolucao IS NULL AND data_prevista < :hoje "
+        "ORDER BY data_prevista, id LIMIT 20"
+    ),
+}
+
+
+def popular(n_livros, n_pessoas, n_emprestimos, n_indicacoes):
+    r = random.Random(42)
+    hoje = date.today()
+
+    db.session.execute(insert(Categoria), [{"nome": f"Categoria {i}"} for i in range(50)])
+    for inicio in range(0, n_livros, LOTE):
+        db.session.execute(insert(Livro), [{
+            "nome": f"Livro {i}", "autor": f"Autor {i % 3000}", "isbn": f"bench-{i}",
+            "descricao": "", "data_aquisicao": hoje, "quantidade": r.randint(1, 5), "ativo": True
+        } for i in range(inicio, min(inicio + LOTE, n_livros))])
+    for inicio in range(0, n_pessoas, LOTE):
+        db.session.execute(insert(Pessoa), [{
+            "nome": f"Pessoa {i}", "cpf": f"b{i:010d}", "idade": 30, "email": f"bench{i}@x",
+            "numero": "0", "tipo": "CLIENTE"
+        } for i in range(inicio, min(inicio + LOTE, n_pessoas))])
+    db.session.commit()
+
+    livros = [i for (i,) in db.session.query(Livro.id).all()]
+    pessoas = [i for (i,) in db.session.query(Pessoa.id).all()]
+    categorias = [i for (i,) in db.session.query(Categoria.id).all()]
+
+    db.session.execute(insert(livro_categoria), [
+        {"livro_id": l, "categoria_id": c} for l in livros for c in r.sample(categorias, 2)
+    ])
+    favoritos = {(r.choice(pessoas), r.choice(livros)) for _ in range(n_pessoas * 3)}
+    db.session.execute(insert(tabela_favoritos), [{"pessoa_id": p, "livro_id": l} for p, l in favoritos])
+    db.session.execute(insert(IndicacaoSemana), [{
+        "livro_id": r.choice(livros),
+        "data_inicio": hoje - timedelta(days=r.randint(0, 3000)),
+        "data_fim": hoje - timedelta(days=r.randint(-7, 3000))
+    } for _ in range(n_indicacoes)])
+
+    for inicio in range(0, n_emprestimos, LOTE):
+        linhas = []
+        for _ in range(inicio, min(inicio + LOTE, n_emprestimos)):
+            emprestado = hoje - timedelta(days=r.randint(0, 3650))
+            devolvido = emprestado + timedelta(days=r.randint(1, 30)) if r.random() < 0.97 else None
+            linhas.append({
+                "pessoa_id": r.choice(pessoas), "livro_id": r.choice(livros),
+                "data_emprestimo": emprestado, "data_devolucao": devolvido,
+                "data_prevista": emprestado + timedelta(days=7)
+            })
+        db.session.execute(insert(Emprestimo), linhas)
+        db.session.commit()
+        print(f"  {min(inicio + LOTE, n_emprestimos)} empréstimos", end="\r")
+    print()
+
+
+def indices():
+    return [i for t in TABELAS_INDICES for i in db.metadata.tables[t].indexes]
+
+
+def plano(sql, params):
+    if db.engine.dialect.name == "postgresql":
+        linhas = db.session.execute(text("EXPLAIN ANALYZE " + sql), params).all()
+    else:
+        linhas = db.session.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+    return [str(l[-1]) for l in linhas]
+
+
+def medir(repeticoes):
+    r = random.Random(7)
+    n_livros = db.session.query(Livro.id).count()
+    n_pessoas = db.session.query(Pessoa.id).count()
+    resultados = {}
+
+    for nome, sql in CONSULTAS.items():
+        tempos = []
+        for _ in range(repeticoes):
+            params = {
+                "livro": r.randint(1, n_livros),
+                "pessoa": r.randint(1, n_pessoas),
+                "categoria": r.randint(1, 50),
+                "hoje": date.today(),
+            }
+            consulta = sql.format(ids=",".join(str(r.randint(1, n_livros)) for _ in range(50)))
+            inicio = time.perf_counter()
+            db.session.execute(text(consulta), params).all()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        resultados[nome] = (statistics.median(tempos), plano(consulta, params))
+    db.session.rollback()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--popular", action="store_true")
+    parser.add_argument("--livros", type=int, default=20000)
+    parser.add_argument("--pessoas", type=int, default=5000)
+    parser.add_argument("--emprestimos", type=int, default=500000)
+    parser.add_argument("--indicacoes", type=int, default=5000)
+    parser.add_argument("--repeticoes", type=int, default=30)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        migracoes.aplicar()
+
+        if args.popular:
+            if db.session.query(Emprestimo.id).first():
+                sys.exit("O banco já tem dados; use um banco vazio para --popular")
+            print("Populando acervo sintético...")
+            popular(args.livros, args.pessoas, args.emprestimos, args.indicacoes)
+
+        for indice in indices():
+            indice.drop(db.engine, checkfirst=True)
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        antes = medir(args.repeticoes)
+
+        for indice in indices():
+            indice.create(db.engine, checkfirst=True)
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        depois = medir(args.repeticoes)
+
+    print(f"\n{'consulta':<28}{'sem índices':>14}{'com índices':>14}")
+    for nome in CONSULTAS:
+        print(f"{nome:<28}{antes[nome][0]:>11.3f} ms{depois[nome][0]:>11.3f} ms")
+
+    for nome in CONSULTAS:
+        print(f"\n== {nome}")
+        print("  antes:  " + "\n          ".join(antes[nome][1]))
+        print("  depois: " + "\n          ".join(depois[nome][1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark da codificação JSON das listas grandes (respostas.py).
+
+Uso:
+    python scripts/benchmark_json.py
+    python scripts/benchmark_json.py --itens 10000 --repeticoes 20
+
+Monta --itens dicts no formato de Livro.mostrar_dados() e de
+Emprestimo.mostrar_dados() (sem banco) e mede, para cada lista, o tempo de
+codificação (mediana) do provider padrão do Flask, do ProvedorJSON com a
+stdlib e com orjson, além dos bytes na rede sem compressão, com gzip e com
+brotli (se instalado).
+"""
+
+import argparse
+import gzip
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+import respostas
+from respostas import ProvedorJSON
+
+
+def livros(n, r):
+    hoje = date.today()
+    return [{
+        "id": i,
+        "nome": f"Livro de ação número {i}",
+        "autor": f"Autor {i % 3000}",
+        "isbn": f"978-{r.randint(0, 10**9):09d}",
+        "categorias": [{"id": c, "nome": f"Categoria {c}"} for c in r.sample(range(50), 2)],
+        "descricao": "Uma descrição razoavelmente longa do livro, com acentuação e tudo. " * 4,
+        "data_aquisicao": (hoje - timedelta(days=r.randint(0, 3000))).isoformat(),
+        "imagem_url": f"https://exemplo.com/capas/{i}.jpg",
+        "quantidade": r.randint(1, 5),
+        "quantidade_disponivel": r.randint(0, 5),
+        "ativo": True,
+    } for i in range(n)]
+
+
+def emprestimos(n, r):
+    hoje = date.today()
+    itens = []
+    for i in range(n):
+        emprestado = hoje - timedelta(days=r.randint(0, 3650))
+        devolvido = emprestado + timedelta(days=r.randint(1, 30)) if r.random() < 0.9 else None
+        itens.append({
+            "id": i,
+            "pessoa_id": r.randint(1, 5000),
+            "pessoa_nome": f"Pessoa {r.randint(1, 5000)} da Conceição",
+            "livro_id": r.randint(1, 20000),
+            "livro_nome": f"Livro de ação número {r.randint(1, 20000)}",
+            "data_emprestimo": emprestado.isoformat(),
+            "data_devolucao": devolvido.isoformat() if devolvido else None,
+            "data_prevista": (emprestado + timedelta(days=7)).isoformat(),
+            "dias_atraso": 0,
+            "multa": 0.0,
+            "status": "devolvido" if devolvido else "ativo",
+        })
+    return itens
+
+
+def medir(fn, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        corpo = fn()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), corpo
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--itens", type=int, default=10000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    padrao = DefaultJSONProvider(app)
+    provedores = [("flask padrão", lambda obj: padrao.response(obj).get_data())]
+    stdlib = ProvedorJSON(app, usar_orjson=False)
+    provedores.append(("stdlib", lambda obj: stdlib.response(obj).get_data()))
+    if respostas.orjson is not None:
+        rapido = ProvedorJSON(app)
+        provedores.append(("orjson", lambda obj: rapido.response(obj).get_data()))
+    else:
+        print("orjson não instalado: só a stdlib será medida")
+
+    r = random.Random(42)
+    for nome, dados in (("livros", livros(args.itens, r)), ("emprestimos", emprestimos(args.itens, r))):
+        print(f"\n== {args.itens} {nome}")
+        print(f"{'encoder':<14}{'codificar':>12}{'bytes':>12}{'gzip':>12}{'gzip ms':>10}{'brotli':>12}{'br ms':>10}")
+        with app.app_context():
+            for rotulo, fn in provedores:
+                ms, corpo = medir(lambda: fn(dados), args.repeticoes)
+                gz_ms, gz = medir(lambda: gzip.compress(corpo, compresslevel=respostas.COMPRESSAO_NIVEL_GZIP), 3)
+                linha = f"{rotulo:<14}{ms:>9.1f} ms{len(corpo):>12}{len(gz):>12}{gz_ms:>7.1f} ms"
+                if respostas.brotli is not None:
+                    br_ms, br = medir(lambda: respostas.brotli.compress(corpo, quality=respostas.COMPRESSAO_NIVEL_BROTLI), 3)
+                    linha += f"{len(br):>12}{br_ms:>7.1f} ms"
+                print(linha)
+
+
+if __name__ == "__main__":
+    main()
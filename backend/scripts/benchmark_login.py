@@ -0,0 +1,127 @@
+"""
+Benchmark de vazão do /auth/login com o hash de senhas na thread da
+requisição (SENHA_PROCESSOS=0) e no pool de processos (utils/senhas.py).
+
+Uso (sempre contra um banco descartável):
+    DATABASE_URL=sqlite:////tmp/bench_login.db python scripts/benchmark_login.py
+    DATABASE_URL=sqlite:////tmp/bench_login.db python scripts/benchmark_login.py --processos 0,2,4 --threads 16
+
+Roda dentro do processo, com o cliente de teste do Flask: --threads threads
+fazem login em sequência durante --duracao segundos enquanto outra thread
+consulta GET / (rota sem hash), para mostrar quanto o hash atrasa as
+requisições que disputam o GIL com ele.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from app import create_app
+from database import db
+import migracoes
+from models.pessoa import Pessoa
+from models.usuario import Usuario
+from utils import senhas
+
+SENHA = "senha-benchmark"
+
+
+def popular(n_usuarios):
+    if db.session.query(Usuario.id).filter(Usuario.username == "bench-login-0").first():
+        return
+    db.session.execute(insert(Pessoa), [{
+        "nome": f"Bench {i}", "cpf": f"l{i:010d}", "idade": 30, "email": f"bench-login{i}@x",
+        "numero": "0", "tipo": "CLIENTE"
+    } for i in range(n_usuarios)])
+    ids = dict(db.session.query(Pessoa.email, Pessoa.id).filter(Pessoa.email.like("bench-login%@x")).all())
+    # Um hash só para todos: o que se mede é a verificação no login
+    senha_hash = senhas.gerar_hash(SENHA)
+    db.session.execute(insert(Usuario), [{
+        "pessoa_id": ids[f"bench-login{i}@x"], "username": f"bench-login-{i}",
+        "senha_hash": senha_hash, "role": "CLIENTE"
+    } for i in range(n_usuarios)])
+    db.session.commit()
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def rodada(app, processos, n_threads, n_usuarios, duracao):
+    senhas.encerrar()
+    senhas.SENHA_PROCESSOS = processos
+    if processos:
+        senhas.verificar(senhas.gerar_hash("aquecimento"), "aquecimento")
+
+    logins, erros, latencias_leitura = [0], [0], []
+    lock = threading.Lock()
+    fim = time.monotonic() + duracao
+
+    def logar(n):
+        cliente = app.test_client()
+        i = n
+        while time.monotonic() < fim:
+            r = cliente.post("/auth/login", json={"username": f"bench-login-{i % n_usuarios}", "senha": SENHA})
+            i += n_threads
+            with lock:
+                if r.status_code == 200:
+                    logins[0] += 1
+                else:
+                    erros[0] += 1
+
+    def ler():
+        cliente = app.test_client()
+        while time.monotonic() < fim:
+            inicio = time.perf_counter()
+            cliente.get("/")
+            latencias_leitura.append((time.perf_counter() - inicio) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=logar, args=(n,)) for n in range(n_threads)]
+    threads.append(threading.Thread(target=ler))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return {
+        "logins_s": logins[0] / duracao,
+        "erros": erros[0],
+        "leitura_p50": statistics.median(latencias_leitura) if latencias_leitura else 0.0,
+        "leitura_p95": percentil(latencias_leitura, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processos", default=f"0,{min(os.cpu_count() or 1, 4)}")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--duracao", type=float, default=10)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        migracoes.aplicar()
+        popular(args.usuarios)
+
+    print(f"método: {senhas.SENHA_METODO}, CPUs: {os.cpu_count()}, threads de login: {args.threads}")
+    print(f"\n{'processos':>10}{'logins/s':>12}{'erros':>8}{'GET / p50':>12}{'GET / p95':>12}")
+    for processos in (int(p) for p in args.processos.split(",")):
+        r = rodada(app, processos, args.threads, args.usuarios, args.duracao)
+        print(f"{processos:>10}{r['logins_s']:>12.1f}{r['erros']:>8}"
+              f"{r['leitura_p50']:>9.1f} ms{r['leitura_p95']:>9.1f} ms")
+    senhas.encerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Teste de carga simples contra uma instância em execução da API.
+
+Uso:
+    python scripts/teste_carga.py --url http://localhost:8000 --usuarios 20 --duracao 20
+
+Faz login com o administrador, dispara requisições concorrentes em uma mistura
+de rotas de leitura (incluindo /relatorios, a mais pesada) e imprime vazão e
+latências. Rode uma vez para cada GUNICORN_WORKER_CLASS para comparar os modos.
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROTAS = [
+    "/livros",
+    "/livros?page=2",
+    "/indicacoes",
+    "/categorias",
+    "/relatorios",
+    "/emprestimos?page=1&per_page=50",
+]
+
+
+def login(url, usuario, senha):
+    corpo = json.dumps({"username": usuario, "senha": senha}).encode()
+    req = urllib.request.Request(url + "/auth/login", data=corpo, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as resp:
+        return json.load(resp)["access_token"]
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--usuarios", type=int, default=20)
+    parser.add_argument("--duracao", type=float, default=20)
+    parser.add_argument("--login", default="admin")
+    parser.add_argument("--senha", default="admin123")
+    args = parser.parse_args()
+
+    token = login(args.url, args.login, args.senha)
+    cabecalhos = {"Authorization": f"Bearer {token}"}
+    latencias, erros = [], [0]
+    lock = threading.Lock()
+    fim = time.monotonic() + args.duracao
+
+    def usuario(n):
+        i = n
+        while time.monotonic() < fim:
+            rota = ROTAS[i % len(ROTAS)]
+            i += 1
+            inicio = time.perf_counter()
+            try:
+                req = urllib.request.Request(args.url + rota, headers=cabecalhos)
+                with urllib.request.urlopen(req, timeout=60) as resp:
+                    resp.read()
+                ok = True
+            except (urllib.error.URLError, TimeoutError):
+                ok = False
+            ms = (time.perf_counter() - inicio) * 1000
+            with lock:
+                if ok:
+                    latencias.append(ms)
+                else:
+                    erros[0] += 1
+
+    threads = [threading.Thread(target=usuario, args=(n,)) for n in range(args.usuarios)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencias.sort()
+    print(f"requisições: {len(latencias)}  erros: {erros[0]}")
+    print(f"vazão: {len(latencias) / args.duracao:.1f} req/s")
+    print(f"latência p50: {percentil(latencias, 0.50):.1f} ms  "
+          f"p95: {percentil(latencias, 0.95):.1f} ms  "
+          f"p99: {percentil(latencias, 0.99):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Tarefas em segundo plano, sem broker externo: a fila é a tabela `tarefas`.
+
+Relatórios, exportações completas e importações em massa são submetidos por
+POST /tarefas e executados fora da requisição por trabalhadores que
+reservam a próxima tarefa pendente com um UPDATE condicional (só um
+trabalhador vence, como em Livro.reservar_exemplar). Os trabalhadores rodam:
+
+- em um processo separado: `flask trabalhador --threads N` (o processo
+  "worker" do Procfile). É o padrão: uma exportação longa não disputa CPU
+  nem memória com as requisições;
+- ou embutidos no processo web, com TAREFAS_THREADS > 0: threads iniciadas
+  em cada worker do gunicorn (post_fork) ou na primeira submissão. Útil em
+  desenvolvimento, sem o processo separado.
+
+Arquivo enviado e resultado não passam pela memória nem pelo banco: são
+gravados gzipados em TAREFAS_DIRETORIO (<id>.entrada.gz e <id>.gz) à medida
+que são lidos/gerados, e o download é servido do arquivo. O diretório
+precisa ser o mesmo para o web e o trabalhador (mesma máquina ou um volume
+montado nos dois).
+
+Reaproveitamento: cada tipo declara as tabelas que lê. Ao começar, a tarefa
+guarda as versões dessas tabelas (models/versao.py). Uma nova submissão com
+o mesmo tipo e parâmetros devolve a tarefa já concluída enquanto as versões
+não mudarem (e o dia, para tipos que dependem da data). Tipos sem tabelas,
+como a importação, nunca são reaproveitados.
+
+Tarefas diárias (TAREFAS_DIARIAS, como a varredura de atrasos) são
+enfileiradas pelos próprios trabalhadores quando a fila está vazia; o
+reaproveitamento por dia garante uma execução diária mesmo com vários
+processos.
+
+Outras variáveis: TAREFAS_INTERVALO (segundos entre consultas à fila vazia),
+TAREFAS_TIMEOUT (após quantos segundos uma tarefa "executando" é tida como
+abandonada e volta para a fila) e TAREFAS_RETENCAO_DIAS (também apaga os
+arquivos).
+"""
+
+import gzip
+import hashlib
+import importlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, delete, or_, and_
+from database import db
+from models.tarefa import Tarefa, STATUS_PENDENTE, STATUS_EXECUTANDO, STATUS_CONCLUIDA, STATUS_ERRO
+from models.versao import VersaoTabela
+
+TAREFAS_THREADS = int(os.getenv("TAREFAS_THREADS", "0"))
+TAREFAS_INTERVALO = float(os.getenv("TAREFAS_INTERVALO", "2"))
+TAREFAS_TIMEOUT = int(os.getenv("TAREFAS_TIMEOUT", "3600"))
+TAREFAS_RETENCAO_DIAS = int(os.getenv("TAREFAS_RETENCAO_DIAS", "7"))
+TAREFAS_DIRETORIO = os.getenv("TAREFAS_DIRETORIO", os.path.join(tempfile.gettempdir(), "biblioteca-tarefas"))
+
+log = logging.getLogger(__name__)
+
+TIPOS = {}
+
+
+def tipo_tarefa(nome, tabelas=None, diario=False):
+    """
+    Registra um executor fn(parametros, entrada, saida) -> (mimetype, nome_arquivo).
+    `entrada` é o arquivo enviado (ou None) e `saida` um arquivo binário onde
+    o resultado deve ser escrito.
+    """
+    def registrar(fn):
+        TIPOS[nome] = {"executar": fn, "tabelas": tabelas, "diario": diario}
+        return fn
+    return registrar
+
+
+def caminho_entrada(tarefa_id):
+    return os.path.join(TAREFAS_DIRETORIO, f"{tarefa_id}.entrada.gz")
+
+
+def caminho_resultado(tarefa_id):
+    return os.path.join(TAREFAS_DIRETORIO, f"{tarefa_id}.gz")
+
+
+@contextmanager
+def _gravar_gzip(caminho):
+    """
+    Arquivo gzip para escrita em `caminho`.tmp, renomeado para `caminho` só
+    se o bloco terminar sem erro: ninguém lê um arquivo pela metade.
+    """
+    os.makedirs(TAREFAS_DIRETORIO, exist_ok=True)
+    temporario = caminho + ".tmp"
+    try:
+        with gzip.open(temporario, "wb") as arquivo:
+            yield arquivo
+        os.replace(temporario, caminho)
+    except BaseException:
+        _apagar(caminho)
+        raise
+
+
+def _apagar(*caminhos):
+    for caminho in caminhos:
+        for c in (caminho, caminho + ".tmp"):
+            try:
+                os.remove(c)
+            except FileNotFoundError:
+                pass
+
+
+def _chave(tipo, parametros):
+    if TIPOS[tipo]["tabelas"] is None:
+        return None
+    return hashlib.sha1(json.dumps([tipo, parametros], sort_keys=True).encode()).hexdigest()
+
+
+def _versoes_atuais(tipo):
+    tipo = TIPOS.get(tipo)
+    if not tipo or tipo["tabelas"] is None:
+        return None
+    versoes = VersaoTabela.obter(tipo["tabelas"])
+    if tipo["diario"]:
+        versoes.append(date.today().isoformat())
+    return json.dumps(versoes)
+
+
+def submeter(tipo, parametros, entrada=None, pessoa_id=None):
+    """
+    Enfileira uma tarefa. Retorna (tarefa, nova): se já houver uma equivalente
+    pendente, ou em andamento/concluída sobre os mesmos dados, devolve ela.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de tarefa inválido. Use: {', '.join(sorted(TIPOS))}")
+
+    chave = _chave(tipo, parametros)
+    if chave:
+        versoes = _versoes_atuais(tipo)
+        anteriores = Tarefa.query.filter(
+            Tarefa.chave == chave,
+            Tarefa.status.in_([STATUS_PENDENTE, STATUS_EXECUTANDO, STATUS_CONCLUIDA])
+        ).order_by(Tarefa.criada_em.desc()).limit(5).all()
+        for anterior in anteriores:
+            if anterior.status == STATUS_PENDENTE or anterior.versoes == versoes:
+                # Concluída, mas com o arquivo já apagado: gera de novo
+                if anterior.status != STATUS_CONCLUIDA or os.path.exists(caminho_resultado(anterior.id)):
+                    return anterior, False
+
+    tarefa = Tarefa(
+        tipo=tipo,
+        parametros=json.dumps(parametros, sort_keys=True),
+        chave=chave,
+        pessoa_id=pessoa_id
+    )
+    if entrada is not None:
+        # Em disco antes do commit: um trabalhador pode pegar a tarefa logo em seguida
+        tarefa.id = Tarefa.novo_id()
+        with _gravar_gzip(caminho_entrada(tarefa.id)) as destino:
+            shutil.copyfileobj(entrada, destino, 1024 * 1024)
+    db.session.add(tarefa)
+    db.session.commit()
+
+    acordar()
+    return tarefa, True
+
+
+def _reservar():
+    """Marca a próxima tarefa como executando e retorna seu id (ou None)."""
+    abandono = datetime.utcnow() - timedelta(seconds=TAREFAS_TIMEOUT)
+    while True:
+        candidata = db.session.query(Tarefa.id, Tarefa.tipo, Tarefa.status, Tarefa.iniciada_em).filter(or_(
+            Tarefa.status == STATUS_PENDENTE,
+            and_(Tarefa.status == STATUS_EXECUTANDO, Tarefa.iniciada_em < abandono)
+        )).order_by(Tarefa.criada_em).first()
+        if candidata is None:
+            db.session.rollback()
+            return None
+
+        # Condicional: se outro trabalhador reservou antes, o WHERE não casa mais
+        resultado = db.session.execute(
+            update(Tarefa)
+            .where(
+                Tarefa.id == candidata.id,
+                Tarefa.status == candidata.status,
+                Tarefa.iniciada_em.is_(None) if candidata.iniciada_em is None
+                else Tarefa.iniciada_em == candidata.iniciada_em
+            )
+            .values(
+                status=STATUS_EXECUTANDO,
+                iniciada_em=datetime.utcnow(),
+                versoes=_versoes_atuais(candidata.tipo)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if resultado.rowcount == 1:
+            return candidata.id
+
+
+def executar_proxima():
+    """Reserva e executa uma tarefa. Retorna False se a fila estava vazia."""
+    tarefa_id = _reservar()
+    if tarefa_id is None:
+        return False
+
+    tarefa = db.session.get(Tarefa, tarefa_id)
+    inicio = time.perf_counter()
+    try:
+        tipo = TIPOS.get(tarefa.tipo)
+        if tipo is None:
+            raise ValueError(f"Tipo de tarefa desconhecido: {tarefa.tipo}")
+
+        entrada = gzip.open(caminho_entrada(tarefa_id), "rb") if os.path.exists(caminho_entrada(tarefa_id)) else None
+        try:
+            with _gravar_gzip(caminho_resultado(tarefa_id)) as saida:
+                mimetype, nome_arquivo = tipo["executar"](json.loads(tarefa.parametros), entrada, saida)
+        finally:
+            if entrada is not None:
+                entrada.close()
+
+        # O executor pode ter feito commit/rollback; recarrega antes de gravar
+        tarefa = db.session.get(Tarefa, tarefa_id)
+        tarefa.mimetype = mimetype
+        tarefa.nome_arquivo = nome_arquivo
+        tarefa.status = STATUS_CONCLUIDA
+    except Exception as e:
+        db.session.rollback()
+        log.exception("Tarefa %s falhou", tarefa_id)
+        _apagar(caminho_resultado(tarefa_id))
+        tarefa = db.session.get(Tarefa, tarefa_id)
+        tarefa.status = STATUS_ERRO
+        tarefa.erro = str(e)[:1000]
+
+    _apagar(caminho_entrada(tarefa_id))
+    tarefa.concluida_em = datetime.utcnow()
+    db.session.commit()
+    log.info("Tarefa %s (%s): %s em %.2fs", tarefa_id, tarefa.tipo, tarefa.status, time.perf_counter() - inicio)
+    return True
+
+
+def limpar_antigas():
+    limite = datetime.utcnow() - timedelta(days=TAREFAS_RETENCAO_DIAS)
+    antigas = Tarefa.status.in_([STATUS_CONCLUIDA, STATUS_ERRO]), Tarefa.concluida_em < limite
+    ids = db.session.execute(db.select(Tarefa.id).where(*antigas)).scalars().all()
+    resultado = db.session.execute(
+        delete(Tarefa).where(*antigas).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    for tarefa_id in ids:
+        _apagar(caminho_entrada(tarefa_id), caminho_resultado(tarefa_id))
+    return resultado.rowcount
+
+
+# Tipos enfileirados automaticamente uma vez por dia
+TAREFAS_DIARIAS = ("varrer_atrasos",)
+
+_acordar = threading.Event()
+_lock = threading.Lock()
+_threads = []
+_pid = None
+_ultima_limpeza = 0.0
+_ultimo_agendamento = 0.0
+
+
+def agendar_diarias():
+    for tipo in TAREFAS_DIARIAS:
+        submeter(tipo, {})
+
+
+def _laco(app, parar):
+    global _ultima_limpeza, _ultimo_agendamento
+    while not parar.is_set():
+        trabalhou = False
+        try:
+            with app.app_context():
+                trabalhou = executar_proxima()
+                if not trabalhou and time.monotonic() - _ultimo_agendamento > 600:
+                    _ultimo_agendamento = time.monotonic()
+                    agendar_diarias()
+                if not trabalhou and time.monotonic() - _ultima_limpeza > 3600:
+                    _ultima_limpeza = time.monotonic()
+                    limpar_antigas()
+        except Exception:
+            log.exception("Erro no trabalhador de tarefas")
+        if not trabalhou:
+            _acordar.wait(TAREFAS_INTERVALO)
+            _acordar.clear()
+
+
+def acordar():
+    # Acorda os trabalhadores deste processo sem esperar o TAREFAS_INTERVALO
+    _acordar.set()
+
+
+def iniciar_trabalhadores(app, quantidade, daemon=True, parar=None):
+    parar = parar or threading.Event()
+    threads = [
+        threading.Thread(target=_laco, args=(app, parar), name=f"tarefas-{i}", daemon=daemon)
+        for i in range(quantidade)
+    ]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def garantir_trabalhadores(app):
+    """Sobe as threads embutidas deste processo (uma vez por processo, após o fork)."""
+    global _pid, _threads
+    if TAREFAS_THREADS <= 0:
+        return
+    with _lock:
+        if _pid != os.getpid():
+            _pid, _threads = os.getpid(), []
+        vivas = [t for t in _threads if t.is_alive()]
+        if len(vivas) < TAREFAS_THREADS:
+            vivas += iniciar_trabalhadores(app, TAREFAS_THREADS - len(vivas))
+        _threads = vivas
+
+
+@tipo_tarefa("relatorio", tabelas=("emprestimos", "livros"), diario=True)
+def _relatorio(parametros, entrada, saida):
+    from routes.emprestimos import calcular_relatorios
+    saida.write(json.dumps(calcular_relatorios(int(parametros.get("limite", 10)))).encode())
+    return "application/json", "relatorio.json"
+
+
+def _exportacao(modulo):
+    # Reaproveita filtros e consulta da rota GET /<recurso>/exportar, sem timeout
+    def executar(parametros, entrada, saida):
+        from utils.exportacao import FORMATOS, gerar, ler_formato, ordenar
+
+        with current_app.test_request_context(query_string=parametros):
+            consulta, coluna_id, colunas, nome, *complementar = importlib.import_module(modulo).consulta_exportacao()
+            formato = ler_formato()
+            for bloco in gerar(ordenar(consulta, coluna_id), colunas, formato, *complementar):
+                saida.write(bloco.encode())
+        return FORMATOS[formato], f"{nome}.{formato}"
+    return executar
+
+
+tipo_tarefa("exportar_emprestimos", tabelas=("emprestimos", "livros", "pessoas"), diario=True)(
+    _exportacao("routes.emprestimos"))
+tipo_tarefa("exportar_livros", tabelas=("livros", "categorias", "emprestimos"))(_exportacao("routes.livros"))
+tipo_tarefa("exportar_pessoas", tabelas=("pessoas",))(_exportacao("routes.pessoas"))
+
+
+@tipo_tarefa("varrer_atrasos", tabelas=(), diario=True)
+def _varrer_atrasos(parametros, entrada, saida):
+    from models.emprestimo import Emprestimo
+    atrasados = Emprestimo.varrer_atrasos()
+    saida.write(json.dumps({"atrasados": atrasados, "dia": date.today().isoformat()}).encode())
+    return "application/json", "atrasos.json"
+
+
+@tipo_tarefa("importar_livros")
+def _importar_livros(parametros, entrada, saida):
+    from utils import importacao
+    if entrada is None:
+        raise ValueError("Envie o arquivo no campo 'arquivo'")
+    relatorio = importacao.importar(entrada, parametros.get("formato"))
+    saida.write(json.dumps(relatorio).encode())
+    return "application/json", "importacao.json"
@@ -0,0 +1,140 @@
+"""
+Fixtures dos testes: um app por teste, em um banco SQLite novo.
+
+O DATABASE_URL é definido antes de qualquer import do app, para que o
+load_dotenv() do database.py não aponte os testes para o banco do .env.
+"""
+
+import os
+import sys
+import tempfile
+
+_DIRETORIO = tempfile.mkdtemp(prefix="biblioteca-testes-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DIRETORIO}/importacao.db"
+os.environ.setdefault("SENHA_PROCESSOS", "0")
+os.environ.setdefault("SENHA_METODO", "pbkdf2:sha256:1000")
+os.environ.setdefault("JWT_SECRET_KEY", "chave-dos-testes-com-32-bytes-ou-mais")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date
+import pytest
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from comandos import preparar_banco
+from database import db
+from models.categoria import Categoria
+from models.emprestimo import Emprestimo
+from models.livro import Livro
+from models.pessoa import Pessoa
+from models.usuario import Usuario
+from utils import sugestoes
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/biblioteca.db")
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        preparar_banco()
+        # Os índices de sugestões são do processo; cada teste tem um banco novo
+        sugestoes.indice_livros.invalidar()
+        sugestoes.indice_pessoas.invalidar()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(app):
+    """Cabeçalhos de um FUNCIONARIO (o administrador criado pelo preparar_banco)."""
+    usuario = Usuario.query.filter_by(username="admin").one()
+    token = create_access_token(
+        identity=str(usuario.id),
+        additional_claims={"role": usuario.role, "pessoa_id": usuario.pessoa_id}
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+class ContadorConsultas:
+    def __init__(self, engine):
+        self.engine = engine
+        self.total = 0
+        event.listen(engine, "before_cursor_execute", self._contar)
+
+    def _contar(self, *args, **kwargs):
+        self.total += 1
+
+    def __call__(self, fn, *args, **kwargs):
+        """Executa fn e devolve (resultado, consultas feitas)."""
+        self.total = 0
+        resultado = fn(*args, **kwargs)
+        return resultado, self.total
+
+    def remover(self):
+        event.remove(self.engine, "before_cursor_execute", self._contar)
+
+
+@pytest.fixture
+def consultas(app):
+    contador = ContadorConsultas(db.engine)
+    yield contador
+    contador.remover()
+
+
+@pytest.fixture
+def acervo(app):
+    """
+    Popula o banco e devolve uma função acervo(livros, pessoas, emprestimos).
+    Os empréstimos se espalham por livros e pessoas; metade fica em aberto.
+    Pode ser chamada de novo para aumentar o acervo (reusa as categorias).
+    """
+    def popular(livros=20, pessoas=10, emprestimos=40):
+        categorias = Categoria.query.filter(Categoria.nome.like("Categoria %")).order_by(Categoria.id).all()
+        if not categorias:
+            categorias = [Categoria(nome=f"Categoria {i}") for i in range(4)]
+            db.session.add_all(categorias)
+        inicio_livros = Livro.query.count()
+        inicio_pessoas = Pessoa.query.filter(Pessoa.nome.like("Pessoa %")).count()
+        lista_livros = []
+        for i in range(inicio_livros, inicio_livros + livros):
+            livro = Livro(
+                nome=f"Livro {i}", autor=f"Autor {i % 5}", isbn=f"978{i:010d}", descricao="Descrição",
+                data_aquisicao=date(2024, 1, 1), quantidade=5
+            )
+            livro.categorias = [categorias[i % 4], categorias[(i + 1) % 4]]
+            lista_livros.append(livro)
+        lista_pessoas = [
+            Pessoa(nome=f"Pessoa {i}", cpf=f"1{i:010d}", idade=30, email=f"pessoa{i}@teste.com",
+                   numero="000000000", tipo="CLIENTE")
+            for i in range(inicio_pessoas, inicio_pessoas + pessoas)
+        ]
+        db.session.add_all(lista_livros + lista_pessoas)
+        db.session.flush()
+
+        reservados = {}
+        for i in range(emprestimos):
+            livro = lista_livros[i % livros]
+            if reservados.get(livro.id, 0) >= livro.quantidade:
+                continue
+            emprestado = date(2024, 2, 1 + i % 28)
+            aberto = i % 2 == 0
+            db.session.add(Emprestimo(
+                pessoa_id=lista_pessoas[i % pessoas].id, livro_id=livro.id,
+                data_emprestimo=emprestado, data_prevista=emprestado,
+                data_devolucao=None if aberto else emprestado
+            ))
+            if aberto:
+                reservados[livro.id] = reservados.get(livro.id, 0) + 1
+        Livro.ajustar_emprestados(reservados)
+        db.session.commit()
+        return lista_livros, lista_pessoas
+    return popular
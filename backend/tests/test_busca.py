@@ -0,0 +1,22 @@
+from sqlalchemy import text
+from database import db
+
+
+def _ids_buscados(client, admin, termo):
+    resposta = client.get(f"/livros?q={termo}&per_page=50", headers=admin)
+    assert resposta.status_code == 200
+    return {l["id"] for l in resposta.get_json()["livros"]}
+
+
+def test_categoria_renomeada_entra_na_busca(client, admin, acervo):
+    livros, _ = acervo(livros=4, emprestimos=0)
+    categoria = livros[0].categorias[0]
+    esperados = {l.id for l in livros if categoria in l.categorias}
+
+    resposta = client.put(f"/categorias/{categoria.id}", json={"nome": "Ficção Científica"}, headers=admin)
+    assert resposta.status_code == 200
+
+    assert _ids_buscados(client, admin, "ficcao") == esperados
+    documentos = db.session.execute(text("SELECT documento FROM livros_fts")).scalars().all()
+    assert sum("ficcao cientifica" in d for d in documentos) == len(esperados)
+    assert not any("categoria 0" in d for d in documentos)
@@ -0,0 +1,69 @@
+from datetime import date
+from sqlalchemy import insert, update
+from cache import cache
+from database import db
+from models.categoria import Categoria
+from models.emprestimo import Emprestimo
+from models.livro import Livro
+
+
+def _outro_worker(instrucao):
+    # Escrita que não passa pelas invalidações deste processo, como a de outro worker
+    db.session.execute(instrucao)
+    db.session.commit()
+
+
+def test_cache_nao_serve_corpo_antigo_com_etag_novo(client, admin, acervo):
+    livros, _ = acervo(livros=3, emprestimos=0)
+    url = f"/livros/{livros[0].id}"
+
+    antes = client.get(url, headers=admin)
+    assert client.get(url, headers=admin).get_json()["nome"] == "Livro 0"
+
+    _outro_worker(update(Livro).where(Livro.id == livros[0].id).values(nome="Renomeado"))
+
+    depois = client.get(url, headers=admin)
+    assert depois.get_etag() != antes.get_etag()
+    assert depois.get_json()["nome"] == "Renomeado"
+
+
+def test_listas_em_cache_seguem_a_versao(client, admin, acervo):
+    acervo(livros=3, emprestimos=0)
+
+    assert "Categoria 0" in [c["nome"] for c in client.get("/categorias", headers=admin).get_json()]
+    assert client.get("/livros?per_page=8", headers=admin).get_json()["livros"][0]["nome"] == "Livro 0"
+
+    _outro_worker(update(Categoria).where(Categoria.nome == "Categoria 0").values(nome="Contos"))
+    _outro_worker(update(Livro).where(Livro.nome == "Livro 0").values(nome="A Primeira"))
+
+    assert "Contos" in [c["nome"] for c in client.get("/categorias", headers=admin).get_json()]
+    assert client.get("/livros?per_page=8", headers=admin).get_json()["livros"][0]["nome"] == "A Primeira"
+
+
+def _emprestar_em_outro_worker(livro):
+    # Como o POST /emprestimos, mas sem as invalidações explícitas deste processo
+    _outro_worker(insert(Emprestimo).values(
+        pessoa_id=1, livro_id=livro.id, data_emprestimo=date.today(), data_prevista=date.today()
+    ))
+    Livro.ajustar_emprestados({livro.id: 1})
+    db.session.commit()
+
+
+def test_emprestimo_so_vence_o_cache_do_livro_emprestado(client, admin, acervo):
+    livros, _ = acervo(livros=12, emprestimos=0)
+    # Ordem por nome: "Livro 9" fica depois de "Livro 10", "Livro 11"... e fora da primeira página
+    primeiro, fora_da_pagina = livros[0], livros[9]
+    pagina = "/livros?per_page=8"
+    for url in (pagina, f"/livros/{primeiro.id}", f"/livros/{fora_da_pagina.id}"):
+        client.get(url, headers=admin)
+
+    _emprestar_em_outro_worker(fora_da_pagina)
+    acertos = cache.hits
+    client.get(pagina, headers=admin)
+    client.get(f"/livros/{primeiro.id}", headers=admin)
+    assert cache.hits == acertos + 2
+    assert client.get(f"/livros/{fora_da_pagina.id}", headers=admin).get_json()["quantidade_disponivel"] == 4
+
+    _emprestar_em_outro_worker(primeiro)
+    assert client.get(pagina, headers=admin).get_json()["livros"][0]["quantidade_disponivel"] == 4
+    assert client.get(f"/livros/{primeiro.id}", headers=admin).get_json()["quantidade_disponivel"] == 4
@@ -0,0 +1,64 @@
+"""
+Requisições simultâneas contra o mesmo exemplar/empréstimo. No SQLite as
+escritas são serializadas pelo lock do banco; o que se verifica é que a
+condição do UPDATE é reavaliada e só uma das requisições passa.
+"""
+
+import threading
+from database import db
+from models.emprestimo import Emprestimo
+from models.livro import Livro
+
+REQUISICOES = 8
+
+
+def _simultaneas(app, admin, metodo, url, corpo=None):
+    barreira = threading.Barrier(REQUISICOES)
+    status = []
+
+    def enviar():
+        cliente = app.test_client()
+        barreira.wait()
+        resposta = getattr(cliente, metodo)(url, json=corpo, headers=admin)
+        status.append(resposta.status_code)
+
+    threads = [threading.Thread(target=enviar) for _ in range(REQUISICOES)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    return sorted(status)
+
+
+def test_ultimo_exemplar_nao_e_emprestado_duas_vezes(app, admin, acervo):
+    livros, pessoas = acervo(livros=1, emprestimos=0)
+    livro = livros[0]
+    livro.quantidade = 1
+    db.session.commit()
+    corpo = {"pessoa_id": pessoas[0].id, "livro_id": livro.id}
+
+    status = _simultaneas(app, admin, "post", "/emprestimos", corpo)
+
+    assert status.count(201) == 1
+    assert status.count(400) == REQUISICOES - 1
+    db.session.expire_all()
+    assert db.session.get(Livro, livro.id).emprestados_ativos == 1
+    assert Emprestimo.query.filter_by(livro_id=livro.id).count() == 1
+
+
+def test_devolucao_simultanea_so_conta_uma_vez(app, admin, acervo):
+    livros, pessoas = acervo(livros=1, emprestimos=0)
+    livro = livros[0]
+    resposta = app.test_client().post(
+        "/emprestimos", json={"pessoa_id": pessoas[0].id, "livro_id": livro.id}, headers=admin
+    )
+    emprestimo_id = resposta.get_json()["emprestimo"]["id"]
+    # Um segundo empréstimo em aberto: uma devolução dupla zeraria o contador dele também
+    app.test_client().post("/emprestimos", json={"pessoa_id": pessoas[1].id, "livro_id": livro.id}, headers=admin)
+
+    status = _simultaneas(app, admin, "put", f"/emprestimos/{emprestimo_id}/devolver")
+
+    assert status.count(200) == 1
+    assert status.count(400) == REQUISICOES - 1
+    db.session.expire_all()
+    assert db.session.get(Livro, livro.id).emprestados_ativos == 1
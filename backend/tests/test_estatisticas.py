@@ -0,0 +1,68 @@
+import io
+import json
+from database import db
+from models import estatistica
+from models.categoria import Categoria
+from models.estatistica import EstatisticaCategoriaDia
+
+
+def _por_categoria():
+    return {
+        (e.dia, e.categoria_id): (e.emprestimos, e.devolucoes)
+        for e in EstatisticaCategoriaDia.query.all() if e.emprestimos or e.devolucoes
+    }
+
+
+def _emprestar(client, admin, pessoa, livro, dia):
+    resposta = client.post("/emprestimos", json={
+        "pessoa_id": pessoa.id, "livro_id": livro.id, "data_emprestimo": dia
+    }, headers=admin)
+    assert resposta.status_code == 201
+    return resposta.get_json()["emprestimo"]["id"]
+
+
+def _confere_com_recalculo():
+    incremental = _por_categoria()
+    estatistica.recalcular()
+    assert incremental == _por_categoria()
+    return incremental
+
+
+def test_troca_de_categorias_move_o_historico(client, admin, acervo):
+    livros, pessoas = acervo(livros=2, emprestimos=0)
+    livro = livros[0]
+    emprestimo = _emprestar(client, admin, pessoas[0], livro, "2024-03-01")
+    client.put(f"/emprestimos/{emprestimo}/devolver", headers=admin)
+    _emprestar(client, admin, pessoas[1], livro, "2024-03-02")
+    _emprestar(client, admin, pessoas[1], livros[1], "2024-03-02")
+
+    nova = Categoria.query.filter_by(nome="Categoria 3").one()
+    resposta = client.put(f"/livros/{livro.id}", json={"categoria_ids": [nova.id]}, headers=admin)
+    assert resposta.status_code == 200
+
+    contagens = _confere_com_recalculo()
+    assert {c for _, c in contagens} == {nova.id, *[c.id for c in livros[1].categorias]}
+
+
+def test_importacao_que_muda_categorias_move_o_historico(client, admin, acervo):
+    livros, pessoas = acervo(livros=1, emprestimos=0)
+    _emprestar(client, admin, pessoas[0], livros[0], "2024-03-01")
+
+    linha = {"nome": "Livro 0", "autor": "Autor 0", "isbn": livros[0].isbn, "categorias": "Categoria 0;Poesia"}
+    resposta = client.post(
+        "/livros/importar?formato=jsonl", data=io.BytesIO(json.dumps(linha).encode()), headers=admin
+    )
+    assert resposta.get_json()["atualizados"] == 1
+
+    _confere_com_recalculo()
+
+
+def test_categoria_apagada_leva_as_contagens(client, admin, acervo):
+    livros, pessoas = acervo(livros=1, emprestimos=0)
+    _emprestar(client, admin, pessoas[0], livros[0], "2024-03-01")
+    categoria = livros[0].categorias[0]
+
+    assert client.delete(f"/categorias/{categoria.id}", headers=admin).status_code == 200
+
+    contagens = _confere_com_recalculo()
+    assert categoria.id not in {c for _, c in contagens}
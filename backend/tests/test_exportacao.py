@@ -0,0 +1,38 @@
+import gzip
+import json
+from decimal import Decimal
+import pytest
+import tarefas
+from database import db
+from models.emprestimo import Emprestimo
+
+
+@pytest.fixture
+def multado(acervo):
+    acervo(livros=2, pessoas=2, emprestimos=2)
+    emprestimo = Emprestimo.query.order_by(Emprestimo.id).first()
+    emprestimo.dias_atraso, emprestimo.multa = 5, Decimal("2.50")
+    db.session.commit()
+    return emprestimo.id
+
+
+def _linhas(texto):
+    return {l["id"]: l for l in map(json.loads, texto.splitlines())}
+
+
+def test_exportacao_ndjson_com_multa(client, admin, multado):
+    resposta = client.get("/emprestimos/exportar?formato=ndjson", headers=admin)
+    assert resposta.status_code == 200
+    linha = _linhas(resposta.get_data(as_text=True))[multado]
+    assert linha["multa"] == 2.5
+    assert linha["dias_atraso"] == 5
+
+
+def test_tarefa_de_exportacao_ndjson_com_multa(client, admin, multado, tmp_path, monkeypatch):
+    monkeypatch.setattr(tarefas, "TAREFAS_DIRETORIO", str(tmp_path / "tarefas"))
+    corpo = {"tipo": "exportar_emprestimos", "parametros": {"formato": "ndjson"}}
+    tarefa_id = client.post("/tarefas", json=corpo, headers=admin).get_json()["id"]
+
+    assert tarefas.executar_proxima()
+    with gzip.open(tarefas.caminho_resultado(tarefa_id), "rt") as arquivo:
+        assert _linhas(arquivo.read())[multado]["multa"] == 2.5
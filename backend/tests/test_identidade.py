@@ -0,0 +1,22 @@
+from models.pessoa import Pessoa
+from utils import identidade
+
+
+def test_geracoes_ficam_limitadas(app, monkeypatch):
+    monkeypatch.setattr(identidade, "IDENTIDADE_MAX_ITENS", 10)
+    identidade.invalidar(usuario_ids=range(1, 1001))
+    assert len(identidade._geracoes) <= 10
+
+
+def test_retrato_nao_volta_a_valer_quando_a_geracao_e_descartada(client, admin, monkeypatch):
+    monkeypatch.setattr(identidade, "IDENTIDADE_MAX_ITENS", 4)
+    assert client.get("/auth/perfil", headers=admin).get_json()["nome"] != "Renomeada"
+
+    pessoa = Pessoa.query.filter_by(email="admin@biblioteca.com").one()
+    pessoa.nome = "Renomeada"
+    identidade.db.session.commit()
+    # Outras invalidações empurram a geração desta pessoa para fora do dicionário
+    identidade.invalidar(usuario_ids=range(1000, 1010))
+    assert ("pessoa", pessoa.id) not in identidade._geracoes
+
+    assert client.get("/auth/perfil", headers=admin).get_json()["nome"] == "Renomeada"
@@ -0,0 +1,24 @@
+def test_listagem_nao_faz_consultas_por_livro(client, admin, acervo, consultas):
+    acervo(livros=60, emprestimos=120)
+    # Primeira requisição do token: resolve a identidade (utils/identidade.py)
+    client.get("/livros?page=2", headers=admin)
+
+    resposta, pequena = consultas(client.get, "/livros?per_page=8", headers=admin)
+    assert resposta.status_code == 200
+    assert len(resposta.get_json()["livros"]) == 8
+
+    resposta, grande = consultas(client.get, "/livros?per_page=500", headers=admin)
+    assert resposta.status_code == 200
+    assert len(resposta.get_json()["livros"]) == 60
+
+    assert pequena == grande
+
+
+def test_listagem_traz_disponibilidade_e_categorias(client, admin, acervo):
+    livros, _ = acervo(livros=4, emprestimos=8)
+
+    dados = {l["id"]: l for l in client.get("/livros?per_page=10", headers=admin).get_json()["livros"]}
+
+    for livro in livros:
+        assert dados[livro.id]["quantidade_disponivel"] == livro.quantidade - livro.emprestados_ativos
+        assert len(dados[livro.id]["categorias"]) == 2
@@ -0,0 +1,38 @@
+import os
+import runpy
+import limites
+from app import create_app
+
+
+def _login(client, ip):
+    return client.post(
+        "/auth/login", json={"username": "ninguem", "senha": "x"},
+        headers={"X-Forwarded-For": ip}
+    ).status_code
+
+
+def test_limite_por_ip_usa_o_cliente_atras_do_proxy(app, monkeypatch):
+    monkeypatch.setenv("PROXIES_CONFIAVEIS", "1")
+    monkeypatch.setattr(limites, "login_ip", limites.Limite("login:ip", 2, 60))
+    monkeypatch.setattr(limites, "login_conta", limites.Limite("login:conta", 100, 60))
+    client = create_app().test_client()
+
+    assert [_login(client, "203.0.113.1") for _ in range(3)] == [401, 401, 429]
+    assert _login(client, "203.0.113.2") == 401
+
+
+def _carregar_gunicorn(monkeypatch, **ambiente):
+    # setenv antes do delenv: o monkeypatch guarda o valor original e o restaura no fim
+    for nome in ("PROXIES_CONFIAVEIS", "RAILWAY_ENVIRONMENT", "RAILWAY_ENVIRONMENT_NAME"):
+        monkeypatch.setenv(nome, "0")
+        monkeypatch.delenv(nome)
+    for nome, valor in ambiente.items():
+        monkeypatch.setenv(nome, valor)
+    runpy.run_path(os.path.join(os.path.dirname(limites.__file__), "gunicorn.conf.py"))
+    return os.environ.get("PROXIES_CONFIAVEIS")
+
+
+def test_gunicorn_confia_no_proxy_so_no_railway(monkeypatch):
+    assert _carregar_gunicorn(monkeypatch) is None
+    assert _carregar_gunicorn(monkeypatch, RAILWAY_ENVIRONMENT="production") == "1"
+    assert _carregar_gunicorn(monkeypatch, RAILWAY_ENVIRONMENT="production", PROXIES_CONFIAVEIS="2") == "2"
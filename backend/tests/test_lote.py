@@ -0,0 +1,39 @@
+def test_lote_reporta_itens_malformados_individualmente(client, admin, acervo):
+    livros, pessoas = acervo(livros=2, emprestimos=0)
+    valido = {"pessoa_id": pessoas[0].id, "livro_id": livros[0].id}
+    itens = [
+        valido,
+        {"pessoa_id": [1], "livro_id": livros[0].id},
+        {"pessoa_id": pessoas[0].id, "livro_id": {"id": 1}},
+        {"pessoa_id": "abc", "livro_id": livros[1].id},
+        {"pessoa_id": True, "livro_id": livros[1].id},
+        {"pessoa_id": 10**30, "livro_id": livros[1].id},
+        {"pessoa_id": str(pessoas[1].id), "livro_id": livros[1].id},
+        "não é um item",
+    ]
+
+    resposta = client.post("/emprestimos/lote", json={"itens": itens}, headers=admin)
+
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados["criados"] == 2
+    status = [r["status"] for r in sorted(dados["resultados"], key=lambda r: r["indice"])]
+    assert status == ["criado", "erro", "erro", "erro", "erro", "erro", "criado", "erro"]
+
+
+def test_devolucao_em_lote_reporta_ids_malformados_individualmente(client, admin, acervo):
+    livros, pessoas = acervo(livros=2, emprestimos=0)
+    criados = client.post("/emprestimos/lote", json={"itens": [
+        {"pessoa_id": pessoas[0].id, "livro_id": livros[0].id},
+        {"pessoa_id": pessoas[1].id, "livro_id": livros[1].id},
+    ]}, headers=admin).get_json()["resultados"]
+    primeiro, segundo = (r["emprestimo"]["id"] for r in criados)
+
+    resposta = client.put("/emprestimos/lote/devolver", json={
+        "ids": [primeiro, [2], "x", None, 10**30, str(segundo), primeiro]
+    }, headers=admin)
+
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados["devolvidos"] == 2
+    assert [r["status"] for r in dados["resultados"]] == ["devolvido", "erro", "erro", "erro", "erro", "devolvido", "erro"]
@@ -0,0 +1,72 @@
+import sqlite3
+from sqlalchemy import inspect, text
+from app import create_app
+from comandos import preparar_banco
+from database import db
+from models.livro import Livro
+
+# Esquema de um banco criado antes das migrações (db.create_all dos models originais)
+ESQUEMA_ORIGINAL = """
+CREATE TABLE pessoas (
+    id INTEGER PRIMARY KEY, cpf VARCHAR(14) NOT NULL UNIQUE, nome VARCHAR(100) NOT NULL,
+    idade INTEGER NOT NULL, email VARCHAR(100) NOT NULL UNIQUE, numero VARCHAR(20) NOT NULL,
+    tipo VARCHAR(50) NOT NULL
+);
+CREATE TABLE categorias (id INTEGER PRIMARY KEY, nome VARCHAR(100) NOT NULL UNIQUE);
+CREATE TABLE livros (
+    id INTEGER PRIMARY KEY, nome VARCHAR(200) NOT NULL, autor VARCHAR(100) NOT NULL,
+    isbn VARCHAR(20) NOT NULL UNIQUE, descricao VARCHAR(500), data_aquisicao DATE NOT NULL,
+    imagem_url VARCHAR(500), quantidade INTEGER NOT NULL, ativo BOOLEAN NOT NULL
+);
+CREATE TABLE livro_categoria (
+    livro_id INTEGER NOT NULL REFERENCES livros (id), categoria_id INTEGER NOT NULL REFERENCES categorias (id),
+    PRIMARY KEY (livro_id, categoria_id)
+);
+CREATE TABLE favoritos (
+    pessoa_id INTEGER NOT NULL REFERENCES pessoas (id), livro_id INTEGER NOT NULL REFERENCES livros (id),
+    PRIMARY KEY (pessoa_id, livro_id)
+);
+CREATE TABLE usuarios (
+    id INTEGER PRIMARY KEY, pessoa_id INTEGER NOT NULL REFERENCES pessoas (id),
+    username VARCHAR(100) NOT NULL UNIQUE, senha_hash VARCHAR(200) NOT NULL, role VARCHAR(50) NOT NULL
+);
+CREATE TABLE emprestimos (
+    id INTEGER PRIMARY KEY, pessoa_id INTEGER NOT NULL REFERENCES pessoas (id),
+    livro_id INTEGER NOT NULL REFERENCES livros (id), data_emprestimo DATE NOT NULL, data_devolucao DATE
+);
+CREATE TABLE indicacoes_semana (
+    id INTEGER PRIMARY KEY, livro_id INTEGER NOT NULL REFERENCES livros (id),
+    data_inicio DATE NOT NULL, data_fim DATE NOT NULL
+);
+INSERT INTO pessoas VALUES (1, '10000000000', 'Ana', 30, 'ana@teste.com', '000', 'CLIENTE');
+INSERT INTO categorias VALUES (1, 'Romance');
+INSERT INTO livros VALUES (1, 'Dom Casmurro', 'Machado', '9780000000001', NULL, '2024-01-01', NULL, 2, 1);
+INSERT INTO livro_categoria VALUES (1, 1);
+INSERT INTO emprestimos VALUES (1, 1, 1, '2024-03-01', NULL);
+INSERT INTO emprestimos VALUES (2, 1, 1, '2024-02-01', '2024-02-05');
+"""
+
+
+def test_banco_anterior_as_migracoes_chega_ao_esquema_atual(tmp_path, monkeypatch):
+    arquivo = tmp_path / "antigo.db"
+    with sqlite3.connect(arquivo) as conn:
+        conn.executescript(ESQUEMA_ORIGINAL)
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{arquivo}")
+
+    app = create_app()
+    with app.app_context():
+        try:
+            preparar_banco()
+
+            inspetor = inspect(db.engine)
+            indices = {i["name"] for i in inspetor.get_indexes("emprestimos")}
+            assert {"ix_emprestimos_ativos_livro", "ix_emprestimos_abertos_prevista"} <= indices
+            assert {"data_prevista", "dias_atraso", "multa"} <= {c["name"] for c in inspetor.get_columns("emprestimos")}
+            assert not {"entrada", "resultado"} & {c["name"] for c in inspetor.get_columns("tarefas")}
+
+            assert db.session.get(Livro, 1).emprestados_ativos == 1
+            prevista = db.session.execute(text("SELECT data_prevista FROM emprestimos WHERE id = 1")).scalar()
+            assert prevista is not None
+        finally:
+            db.session.remove()
+            db.engine.dispose()
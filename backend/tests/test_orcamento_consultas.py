@@ -0,0 +1,64 @@
+"""
+Orçamento de consultas das listas: cada rota tem um máximo de consultas, que
+não pode crescer com o tamanho do acervo nem da página. As contagens incluem
+a leitura de versões do ETag e, nas rotas com cache, as do próprio cache
+(que aqui está sempre vazio).
+"""
+
+from datetime import date, timedelta
+import pytest
+from cache import cache
+from database import db
+from models.indicacao import IndicacaoSemana
+
+ORCAMENTOS = {
+    # ETag, versões do cache antes/depois, COUNT, página, categorias
+    "/livros?per_page=500": 6,
+    # ETag, COUNT, colunas, categorias
+    "/livros?per_page=500&fields=id,nome,categorias": 4,
+    # ETag, versões do cache antes/depois, indicações, livros, categorias
+    "/indicacoes": 6,
+    # ETag, lista (pessoa e livro por JOIN)
+    "/emprestimos": 2,
+    # ETag, COUNT, página
+    "/emprestimos?per_page=500": 3,
+    "/emprestimos?per_page=500&fields=id,pessoa_nome,livro_nome": 3,
+    # ETag, lista
+    "/pessoas": 2,
+    # ETag, COUNT, página
+    "/pessoas?per_page=500": 3,
+    # ETag, versões do cache, lista
+    "/categorias": 3,
+}
+
+
+def _indicar(livros):
+    hoje = date.today()
+    db.session.add_all(
+        IndicacaoSemana(livro_id=l.id, data_inicio=hoje, data_fim=hoje + timedelta(days=7)) for l in livros
+    )
+    db.session.commit()
+
+
+@pytest.mark.parametrize("url, orcamento", ORCAMENTOS.items())
+def test_consultas_cabem_no_orcamento(client, admin, acervo, consultas, url, orcamento):
+    def medir():
+        # Sem cache: mede a montagem da resposta, não a leitura do cache
+        cache.invalidar_prefixo("")
+        resposta, total = consultas(client.get, url, headers=admin)
+        assert resposta.status_code == 200
+        return total, len(resposta.get_data())
+
+    livros, _ = acervo(livros=3, pessoas=2, emprestimos=4)
+    _indicar(livros)
+    # Primeira requisição do token: resolve a identidade (utils/identidade.py)
+    client.get("/categorias", headers=admin)
+    pequeno, tamanho_pequeno = medir()
+
+    livros, _ = acervo(livros=60, pessoas=30, emprestimos=120)
+    _indicar(livros)
+    grande, tamanho_grande = medir()
+
+    assert tamanho_grande > tamanho_pequeno or url == "/categorias"
+    assert pequeno == grande
+    assert grande <= orcamento, f"{url}: {grande} consultas, orçamento de {orcamento}"
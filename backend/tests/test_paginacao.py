@@ -0,0 +1,24 @@
+from utils import paginacao
+
+
+def test_listas_sem_paginacao_sao_limitadas(client, admin, acervo, monkeypatch):
+    acervo(livros=10, pessoas=12, emprestimos=20)
+    monkeypatch.setattr(paginacao, "MAX_POR_PAGINA", 5)
+
+    pessoas = client.get("/pessoas", headers=admin).get_json()
+    assert [p["id"] for p in pessoas] == sorted(p["id"] for p in pessoas)
+    assert len(pessoas) == 5
+    assert len(client.get("/emprestimos", headers=admin).get_json()) == 5
+    assert len(client.get("/emprestimos?fields=id", headers=admin).get_json()) == 5
+
+
+def test_paginas_por_cursor_cobrem_a_lista(client, admin, acervo):
+    acervo(livros=10, pessoas=4, emprestimos=23)
+
+    ids, cursor = [], ""
+    while cursor is not None:
+        dados = client.get(f"/emprestimos?per_page=5&cursor={cursor}", headers=admin).get_json()
+        ids += [e["id"] for e in dados["emprestimos"]]
+        cursor = dados["proximo_cursor"]
+
+    assert len(ids) == len(set(ids)) == 23
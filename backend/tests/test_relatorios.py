@@ -0,0 +1,11 @@
+def test_limite_do_relatorio_e_restrito(client, admin, acervo):
+    acervo(livros=120, emprestimos=240)
+
+    def top(limite):
+        resposta = client.get(f"/relatorios?limite={limite}", headers=admin)
+        assert resposta.status_code == 200
+        return resposta.get_json()["livros_mais_emprestados"]
+
+    assert len(top(1000000)) == 100
+    assert len(top(-5)) == 1
+    assert len(top(3)) == 3
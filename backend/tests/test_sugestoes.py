@@ -0,0 +1,79 @@
+import threading
+from sqlalchemy import update
+from database import db
+from models.livro import Livro
+from utils import sugestoes
+
+
+def _nomes(client, admin, termo):
+    resposta = client.get(f"/livros/sugestoes?q={termo}", headers=admin)
+    assert resposta.status_code == 200
+    return sorted(l["nome"] for l in resposta.get_json())
+
+
+def _esperar_remontagem():
+    for thread in threading.enumerate():
+        if thread.name.startswith("sugestoes-"):
+            thread.join(5)
+
+
+def test_indice_guarda_so_o_inicio_das_palavras(client, admin, acervo):
+    livros, _ = acervo(livros=3, emprestimos=0)
+    livros[0].nome = "O Senhor dos Anéis"
+    livros[1].nome = "Senhora"
+    db.session.commit()
+
+    assert _nomes(client, admin, "senh") == ["O Senhor dos Anéis", "Senhora"]
+    assert _nomes(client, admin, "sen ane") == ["O Senhor dos Anéis"]
+    assert _nomes(client, admin, "enhor") == []
+
+    indice = sugestoes.indice_livros
+    assert all(" " not in token for token in indice._tokens)
+    assert list(indice._ids["aneis"]) == [livros[0].id]
+
+
+def test_escritas_de_outro_processo_remontam_fora_da_requisicao(client, admin, acervo, monkeypatch):
+    livros, _ = acervo(livros=3, emprestimos=0)
+    monkeypatch.setattr(sugestoes, "SUGESTOES_VERIFICAR", 0)
+    assert _nomes(client, admin, "memorias") == []
+
+    # UPDATE em massa não passa pelos eventos do índice, como a escrita de outro worker
+    db.session.execute(update(Livro).where(Livro.id == livros[2].id).values(nome="Memórias Póstumas"))
+    db.session.commit()
+
+    # A requisição que percebe a versão nova ainda responde com o índice atual
+    assert _nomes(client, admin, "memorias") == []
+    _esperar_remontagem()
+    assert _nomes(client, admin, "memorias") == ["Memórias Póstumas"]
+
+
+def _sem_remontagem(monkeypatch):
+    remontagens = []
+    monkeypatch.setattr(sugestoes, "SUGESTOES_VERIFICAR", 0)
+    monkeypatch.setattr(sugestoes.indice_livros, "_remontar_em_segundo_plano", lambda: remontagens.append(1))
+    return remontagens
+
+
+def test_emprestimos_nao_remontam_o_indice(client, admin, acervo, monkeypatch):
+    livros, pessoas = acervo(livros=3, emprestimos=0)
+    assert _nomes(client, admin, "livro") == ["Livro 0", "Livro 1", "Livro 2"]
+    remontagens = _sem_remontagem(monkeypatch)
+
+    for livro in livros:
+        resposta = client.post("/emprestimos", json={"pessoa_id": pessoas[0].id, "livro_id": livro.id}, headers=admin)
+        assert resposta.status_code == 201
+        _nomes(client, admin, "livro")
+
+    assert remontagens == []
+
+
+def test_edicao_local_e_aplicada_sem_remontar(client, admin, acervo, monkeypatch):
+    livros, _ = acervo(livros=3, emprestimos=0)
+    assert _nomes(client, admin, "memorias") == []
+    remontagens = _sem_remontagem(monkeypatch)
+
+    resposta = client.put(f"/livros/{livros[1].id}", json={"nome": "Memórias Póstumas"}, headers=admin)
+    assert resposta.status_code == 200
+
+    assert _nomes(client, admin, "memorias") == ["Memórias Póstumas"]
+    assert remontagens == []
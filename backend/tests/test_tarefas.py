@@ -0,0 +1,66 @@
+import gzip
+import io
+import json
+import os
+import pytest
+import tarefas
+from models.tarefa import Tarefa
+
+
+@pytest.fixture
+def diretorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(tarefas, "TAREFAS_DIRETORIO", str(tmp_path / "tarefas"))
+    return tmp_path / "tarefas"
+
+
+def test_resultado_fica_em_arquivo_e_e_servido_do_disco(client, admin, acervo, diretorio):
+    acervo(livros=5, emprestimos=0)
+    resposta = client.post("/tarefas", json={"tipo": "exportar_livros", "parametros": {"formato": "csv"}}, headers=admin)
+    assert resposta.status_code == 202
+    tarefa_id = resposta.get_json()["id"]
+
+    assert tarefas.executar_proxima()
+    assert os.listdir(diretorio) == [f"{tarefa_id}.gz"]
+    assert "resultado" not in Tarefa.__table__.c
+
+    compactado = client.get(f"/tarefas/{tarefa_id}/resultado", headers={**admin, "Accept-Encoding": "gzip"})
+    assert compactado.headers["Content-Encoding"] == "gzip"
+    texto = gzip.decompress(compactado.get_data()).decode()
+    assert texto.splitlines()[0].startswith("id,nome,autor")
+    assert len(texto.splitlines()) == 6
+
+    simples = client.get(f"/tarefas/{tarefa_id}/resultado", headers=admin)
+    assert "Content-Encoding" not in simples.headers
+    assert simples.get_data(as_text=True) == texto
+
+
+def test_arquivo_enviado_vai_para_o_disco_e_e_apagado_ao_concluir(client, admin, app, diretorio):
+    linhas = "\n".join(json.dumps({"nome": f"Importado {i}", "autor": "Autor", "isbn": f"i{i}", "categorias": "Romance"}) for i in range(3))
+    resposta = client.post("/tarefas", data={
+        "tipo": "importar_livros", "arquivo": (io.BytesIO(linhas.encode()), "livros.jsonl")
+    }, headers=admin)
+    tarefa_id = resposta.get_json()["id"]
+    assert os.listdir(diretorio) == [f"{tarefa_id}.entrada.gz"]
+
+    assert tarefas.executar_proxima()
+    assert os.listdir(diretorio) == [f"{tarefa_id}.gz"]
+    relatorio = client.get(f"/tarefas/{tarefa_id}/resultado", headers=admin).get_json()
+    assert relatorio["inseridos"] == 3
+
+
+def test_resultado_apagado_nao_e_reaproveitado(client, admin, acervo, diretorio):
+    acervo(livros=2, emprestimos=0)
+    corpo = {"tipo": "exportar_livros", "parametros": {"formato": "csv"}}
+    primeira = client.post("/tarefas", json=corpo, headers=admin).get_json()["id"]
+    tarefas.executar_proxima()
+    assert client.post("/tarefas", json=corpo, headers=admin).get_json()["id"] == primeira
+
+    os.remove(tarefas.caminho_resultado(primeira))
+    assert client.get(f"/tarefas/{primeira}/resultado", headers=admin).status_code == 410
+    assert client.post("/tarefas", json=corpo, headers=admin).get_json()["id"] != primeira
+
+
+def test_web_nao_sobe_trabalhadores_por_padrao(app):
+    assert tarefas.TAREFAS_THREADS == 0
+    tarefas.garantir_trabalhadores(app)
+    assert not [t for t in tarefas._threads if t.is_alive()]
@@ -0,0 +1,56 @@
+from sqlalchemy import event, update
+from database import db
+from models.categoria import Categoria
+from models.livro import Livro
+from models.versao import VersaoTabela, linha
+
+
+def _versoes(*tabelas):
+    return dict(zip(tabelas, VersaoTabela.obter(tabelas)))
+
+
+def test_versoes_sobem_uma_vez_no_commit(app, acervo):
+    livros, _ = acervo(livros=2, emprestimos=0)
+    antes = _versoes("livros", "categorias")
+
+    comandos = []
+    event.listen(db.engine, "before_cursor_execute", lambda c, cur, sql, *a: comandos.append(sql))
+
+    db.session.add(Categoria(nome="Nova"))
+    db.session.flush()
+    db.session.execute(update(Livro).where(Livro.id == livros[0].id).values(autor="Outro"))
+    livros[1].nome = "Renomeado"
+    db.session.flush()
+    # Nada de travar versoes_tabela no meio da transação
+    assert not [c for c in comandos if "versoes_tabela" in c]
+
+    db.session.commit()
+    assert len([c for c in comandos if c.startswith("UPDATE versoes_tabela")]) == 1
+    assert _versoes("livros", "categorias") == {"livros": antes["livros"] + 1, "categorias": antes["categorias"] + 1}
+
+
+def test_rollback_nao_sobe_versao(app, acervo):
+    livros, _ = acervo(livros=1, emprestimos=0)
+    antes = _versoes("livros")
+
+    livros[0].nome = "Descartado"
+    db.session.flush()
+    db.session.rollback()
+    db.session.add(Categoria(nome="Outra"))
+    db.session.commit()
+
+    assert _versoes("livros") == antes
+
+
+def test_emprestimo_sobe_so_a_versao_da_linha(client, admin, acervo):
+    livros, pessoas = acervo(livros=2, emprestimos=0)
+    chave = linha("livros", livros[0].id)
+    antes = _versoes("livros", "emprestimos", chave)
+
+    resposta = client.post("/emprestimos", json={"pessoa_id": pessoas[0].id, "livro_id": livros[0].id}, headers=admin)
+    assert resposta.status_code == 201
+
+    depois = _versoes("livros", "emprestimos", chave)
+    assert depois["livros"] == antes["livros"]
+    assert depois["emprestimos"] == antes["emprestimos"] + 1
+    assert depois[chave] == antes[chave] + 1
@@ -0,0 +1,173 @@
+"""
+Busca textual do acervo.
+
+Cada livro guarda em `documento_busca` o texto normalizado (sem acentos, em
+minúsculas) de nome, autor, descrição e categorias. O documento é mantido
+pelos eventos de flush abaixo e indexado conforme o banco:
+
+- PostgreSQL: índice GIN sobre to_tsvector('portuguese', documento_busca),
+  com ordenação por ts_rank.
+- SQLite: tabela virtual FTS5 `livros_fts` (rowid = livros.id), ordenada
+  pelo bm25 da própria FTS5. Permite testar a busca localmente.
+- Outros bancos: LIKE sobre o documento normalizado.
+"""
+
+from sqlalchemy import event, inspect, text, func, literal_column, table, column, update
+from sqlalchemy.orm import Session, load_only, selectinload
+from database import db
+from models.livro import Livro
+from models.categoria import Categoria
+from utils.texto import normalizar, tokens
+
+
+TAMANHO_LOTE = 500
+CAMPOS_DOCUMENTO = ("nome", "autor", "descricao", "categorias", "documento_busca")
+
+fts_livros = table("livros_fts", column("rowid"), column("documento"))
+
+
+def _dialeto(conexao=None):
+    return (conexao or db.engine).dialect.name
+
+
+def montar_documento(livro, ignorar_categoria=None):
+    partes = [livro.nome, livro.autor, livro.descricao or ""]
+    partes += [c.nome for c in livro.categorias if c is not ignorar_categoria]
+    return normalizar(" ".join(p for p in partes if p))
+
+
+def _documento_mudou(livro):
+    estado = inspect(livro)
+    return any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_DOCUMENTO)
+
+
+@event.listens_for(Session, "before_flush")
+def _atualizar_documentos(session, flush_context, instances):
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Livro):
+                obj.documento_busca = montar_documento(obj)
+
+        for obj in session.dirty:
+            if isinstance(obj, Livro) and _documento_mudou(obj):
+                obj.documento_busca = montar_documento(obj)
+
+        for obj in list(session.deleted):
+            if isinstance(obj, Categoria):
+                for livro in obj.livros_rel:
+                    livro.documento_busca = montar_documento(livro, ignorar_categoria=obj)
+
+        # Categoria renomeada: os livros dela já a veem com o nome novo
+        for obj in list(session.dirty):
+            if isinstance(obj, Categoria) and inspect(obj).attrs.nome.history.has_changes():
+                for livro in obj.livros_rel:
+                    livro.documento_busca = montar_documento(livro)
+
+
+@event.listens_for(Session, "after_flush")
+def _sincronizar_fts(session, flush_context):
+    alterados = [o for o in session.new if isinstance(o, Livro)]
+    alterados += [o for o in session.dirty if isinstance(o, Livro) and _documento_mudou(o)]
+    removidos = [o for o in session.deleted if isinstance(o, Livro)]
+    if not (alterados or removidos):
+        return
+
+    conexao = session.connection()
+    if _dialeto(conexao) != "sqlite":
+        return
+
+    for livro in removidos:
+        conexao.execute(text("DELETE FROM livros_fts WHERE rowid = :id"), {"id": livro.id})
+    for livro in alterados:
+        conexao.execute(
+            text("INSERT OR REPLACE INTO livros_fts (rowid, documento) VALUES (:id, :doc)"),
+            {"id": livro.id, "doc": livro.documento_busca or ""}
+        )
+
+
+def preparar_esquema():
+    """Cria coluna e índices de busca em bancos já existentes (idempotente)."""
+    engine = db.engine
+    colunas = [c["name"] for c in inspect(engine).get_columns("livros")]
+    dialeto = _dialeto()
+
+    with engine.begin() as conn:
+        if "documento_busca" not in colunas:
+            conn.execute(text("ALTER TABLE livros ADD COLUMN documento_busca TEXT"))
+
+        if dialeto == "postgresql":
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_livros_documento_busca ON livros "
+                "USING gin (to_tsvector('portuguese', coalesce(documento_busca, '')))"
+            ))
+        elif dialeto == "sqlite":
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS livros_fts "
+                "USING fts5(documento, tokenize='unicode61 remove_diacritics 2')"
+            ))
+
+    if db.session.query(Livro.id).filter(Livro.documento_busca.is_(None)).first():
+        reindexar()
+
+
+def reindexar():
+    """Recalcula o documento de todos os livros e reconstrói o índice FTS5."""
+    sqlite = _dialeto() == "sqlite"
+    if sqlite:
+        db.session.execute(text("DELETE FROM livros_fts"))
+
+    total = 0
+    ultimo_id = 0
+    while True:
+        # Só as colunas do documento: a migração 0002 roda antes das que adicionam as outras
+        lote = Livro.query.options(
+            load_only(Livro.id, Livro.nome, Livro.autor, Livro.descricao),
+            selectinload(Livro.categorias).load_only(Categoria.id, Categoria.nome)
+        ).filter(
+            Livro.id > ultimo_id
+        ).order_by(Livro.id).limit(TAMANHO_LOTE).all()
+        if not lote:
+            break
+
+        docs = [{"id": l.id, "documento_busca": montar_documento(l)} for l in lote]
+        db.session.execute(update(Livro), docs)
+        if sqlite:
+            db.session.execute(
+                text("INSERT INTO livros_fts (rowid, documento) VALUES (:id, :documento_busca)"),
+                docs
+            )
+
+        total += len(lote)
+        ultimo_id = lote[-1].id
+        db.session.commit()
+
+    return total
+
+
+def filtrar(query, termo):
+    """
+    Aplica a busca de `termo` a uma consulta de Livro.
+    Retorna (query, ordem) onde `ordem` ordena por relevância, ou None.
+    """
+    palavras = tokens(termo)
+    if not palavras:
+        return query, None
+
+    dialeto = _dialeto()
+
+    if dialeto == "postgresql":
+        # Prefixo em cada palavra para funcionar enquanto o usuário digita
+        consulta = func.to_tsquery("portuguese", " & ".join(f"{p}:*" for p in palavras))
+        vetor = func.to_tsvector("portuguese", func.coalesce(Livro.documento_busca, ""))
+        return query.filter(vetor.op("@@")(consulta)), func.ts_rank(vetor, consulta).desc()
+
+    if dialeto == "sqlite":
+        expressao = " ".join(f'"{p}"*' for p in palavras)
+        query = query.join(fts_livros, fts_livros.c.rowid == Livro.id).filter(
+            literal_column("livros_fts").op("MATCH")(expressao)
+        )
+        return query, literal_column("livros_fts.rank").asc()
+
+    for p in palavras:
+        query = query.filter(Livro.documento_busca.like(f"%{p}%"))
+    return query, None
@@ -0,0 +1,164 @@
+"""
+Seleção de campos (?fields=) e formato compacto (?compacto=true) das listas.
+
+Com ?fields=id,nome a consulta da rota vira uma consulta de colunas
+(Query.with_entities): só as colunas pedidas saem do banco, sem montar
+objetos do ORM. Campos calculados viram expressões SQL (quantidade
+disponível, status) e nomes de pessoa/livro vêm por JOIN. As categorias de
+um livro, que são uma lista, vêm em uma consulta para a página inteira.
+
+Com ?compacto=true a lista sai em colunas: {"campos": [...], "linhas": [[...]]},
+sem repetir os nomes das chaves em cada item. Sem fields, o compacto traz
+todos os campos, na mesma ordem do catálogo.
+
+Sem nenhum dos dois parâmetros as rotas seguem pelo mostrar_dados de sempre.
+"""
+
+from collections import defaultdict
+from flask import request
+from sqlalchemy import case, func, select
+from database import db
+from models.livro import Livro, livro_categoria
+from models.categoria import Categoria
+from models.pessoa import Pessoa
+from models.emprestimo import Emprestimo
+
+# Categorias de um livro: calculado depois, a partir do id
+CATEGORIAS = object()
+
+
+def _data(valor):
+    return valor.isoformat() if valor else None
+
+
+class Catalogo:
+    def __init__(self, campos, chave, juncoes=None):
+        # campos: nome -> (expressão rotulada com o nome | CATEGORIAS, conversão ou None)
+        # chave: coluna sempre selecionada (id), usada para categorias e cursores
+        # juncoes: nome -> (entidade, condição) para campos de outra tabela
+        self.campos = campos
+        self.chave = chave
+        self.juncoes = juncoes or {}
+
+
+class Selecao:
+    def __init__(self, catalogo, nomes, compacto):
+        self.catalogo = catalogo
+        self.nomes = nomes
+        self.compacto = compacto
+
+    @classmethod
+    def ler(cls, catalogo):
+        """Selecao da requisição, ou None sem fields/compacto. ValueError para campo desconhecido."""
+        fields = request.args.get("fields", "", type=str)
+        compacto = request.args.get("compacto", "false") == "true"
+        if not fields and not compacto:
+            return None
+
+        nomes = [n.strip() for n in fields.split(",") if n.strip()] or list(catalogo.campos)
+        invalidos = [n for n in nomes if n not in catalogo.campos]
+        if invalidos:
+            raise ValueError(f"Campos inválidos: {', '.join(invalidos)}. Use: {', '.join(catalogo.campos)}")
+        return cls(catalogo, list(dict.fromkeys(nomes)), compacto)
+
+    def aplicar(self, query, *extras):
+        """
+        Troca as entidades da consulta pelas colunas pedidas. `extras` são
+        colunas que a rota precisa além delas (ex.: a de ordenação, para o cursor).
+        """
+        colunas = {}
+        for expressao in (self.catalogo.chave, *extras):
+            colunas.setdefault(expressao.key, expressao)
+        for nome in self.nomes:
+            expressao, _ = self.catalogo.campos[nome]
+            if expressao is not CATEGORIAS:
+                colunas.setdefault(nome, expressao)
+
+        query = query.with_entities(*colunas.values())
+        for nome in self.nomes:
+            if nome in self.catalogo.juncoes:
+                entidade, condicao = self.catalogo.juncoes[nome]
+                query = query.outerjoin(entidade, condicao)
+        return query
+
+    def serializar(self, linhas):
+        linhas = list(linhas)
+        categorias = None
+        if any(self.catalogo.campos[n][0] is CATEGORIAS for n in self.nomes):
+            categorias = _categorias_por_livro({getattr(l, self.catalogo.chave.key) for l in linhas})
+
+        valores = []
+        for linha in linhas:
+            item = []
+            for nome in self.nomes:
+                expressao, converter = self.catalogo.campos[nome]
+                if expressao is CATEGORIAS:
+                    item.append(categorias.get(getattr(linha, self.catalogo.chave.key), []))
+                else:
+                    valor = getattr(linha, nome)
+                    item.append(converter(valor) if converter else valor)
+            valores.append(item)
+
+        if self.compacto:
+            return {"campos": self.nomes, "linhas": valores}
+        return [dict(zip(self.nomes, item)) for item in valores]
+
+
+def _categorias_por_livro(ids):
+    por_livro = defaultdict(list)
+    if ids:
+        for livro_id, categoria_id, nome in db.session.execute(
+            select(livro_categoria.c.livro_id, Categoria.id, Categoria.nome)
+            .join(Categoria, Categoria.id == livro_categoria.c.categoria_id)
+            .where(livro_categoria.c.livro_id.in_(ids))
+            .order_by(livro_categoria.c.livro_id, Categoria.id)
+        ):
+            por_livro[livro_id].append({"id": categoria_id, "nome": nome})
+    return por_livro
+
+
+LIVROS = Catalogo({
+    "id": (Livro.id, None),
+    "nome": (Livro.nome, None),
+    "autor": (Livro.autor, None),
+    "isbn": (Livro.isbn, None),
+    "categorias": (CATEGORIAS, None),
+    "descricao": (Livro.descricao, None),
+    "data_aquisicao": (Livro.data_aquisicao, _data),
+    "imagem_url": (Livro.imagem_url, None),
+    "quantidade": (Livro.quantidade, None),
+    "quantidade_disponivel": ((Livro.quantidade - Livro.emprestados_ativos).label("quantidade_disponivel"), None),
+    "ativo": (Livro.ativo, None),
+}, chave=Livro.id)
+
+# Aliases: os filtros de /emprestimos usam Emprestimo.pessoa.has(...), que não
+# pode se correlacionar com uma junção na própria tabela pessoas
+_pessoa = Pessoa.__table__.alias("pessoa_emprestimo")
+_livro = Livro.__table__.alias("livro_emprestimo")
+
+EMPRESTIMOS = Catalogo({
+    "id": (Emprestimo.id, None),
+    "pessoa_id": (Emprestimo.pessoa_id, None),
+    "pessoa_nome": (func.coalesce(_pessoa.c.nome, "Desconhecido").label("pessoa_nome"), None),
+    "livro_id": (Emprestimo.livro_id, None),
+    "livro_nome": (func.coalesce(_livro.c.nome, "Desconhecido").label("livro_nome"), None),
+    "data_emprestimo": (Emprestimo.data_emprestimo, _data),
+    "data_devolucao": (Emprestimo.data_devolucao, _data),
+    "data_prevista": (Emprestimo.data_prevista, _data),
+    "dias_atraso": (Emprestimo.dias_atraso, lambda v: v or 0),
+    "multa": (Emprestimo.multa, lambda v: float(v or 0)),
+    "status": (case((Emprestimo.data_devolucao.is_(None), "ativo"), else_="devolvido").label("status"), None),
+}, chave=Emprestimo.id, juncoes={
+    "pessoa_nome": (_pessoa, _pessoa.c.id == Emprestimo.pessoa_id),
+    "livro_nome": (_livro, _livro.c.id == Emprestimo.livro_id),
+})
+
+PESSOAS = Catalogo({
+    "id": (Pessoa.id, None),
+    "cpf": (Pessoa.cpf, None),
+    "nome": (Pessoa.nome, None),
+    "idade": (Pessoa.idade, None),
+    "email": (Pessoa.email, None),
+    "numero": (Pessoa.numero, None),
+    "tipo": (Pessoa.tipo, None),
+}, chave=Pessoa.id)
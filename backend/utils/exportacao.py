@@ -0,0 +1,115 @@
+"""
+Exportação em fluxo (CSV ou NDJSON) para auditoria.
+
+A consulta é executada com yield_per, que no PostgreSQL usa um cursor no
+servidor: as linhas chegam em blocos de EXPORTACAO_LOTE e cada bloco é
+escrito na resposta antes de buscar o próximo. A memória fica constante
+qualquer que seja o tamanho do histórico.
+
+Para não prender um worker indefinidamente, a exportação para depois de
+EXPORTACAO_TIMEOUT segundos (padrão 50, abaixo do GUNICORN_TIMEOUT). Nesse
+caso a última linha indica o último id enviado; basta repetir a chamada com
+?apos_id=<id> para continuar de onde parou:
+
+- NDJSON: {"_interrompido": true, "apos_id": 123}
+- CSV:    # interrompido; continue com apos_id=123
+"""
+
+import csv
+import io
+import json
+import os
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response, request, stream_with_context
+from database import db
+
+EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "1000"))
+EXPORTACAO_TIMEOUT = float(os.getenv("EXPORTACAO_TIMEOUT", "50"))
+FORMATOS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def ler_formato():
+    formato = request.args.get("formato", "csv", type=str).lower()
+    if formato not in FORMATOS:
+        raise ValueError("Formato inválido. Use csv ou ndjson")
+    return formato
+
+
+def ler_data(nome):
+    valor = request.args.get(nome, type=str)
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("Datas devem estar no formato AAAA-MM-DD")
+
+
+def _valor(v):
+    if isinstance(v, date):
+        return v.isoformat()
+    # Multas (Numeric) saem como número, como no mostrar_dados
+    if isinstance(v, Decimal):
+        return float(v)
+    return v
+
+
+def gerar(consulta, colunas, formato, complementar=None, timeout=None):
+    """Gera o arquivo em blocos de texto; sem timeout, vai até o fim (tarefas em segundo plano)."""
+    limite = time.monotonic() + timeout if timeout is not None else None
+    ultimo_id = None
+    resultado = db.session.execute(consulta.execution_options(yield_per=EXPORTACAO_LOTE))
+    try:
+        if formato == "csv":
+            saida = io.StringIO()
+            escritor = csv.writer(saida)
+            escritor.writerow(colunas)
+            yield saida.getvalue()
+
+        for bloco in resultado.partitions():
+            linhas = [dict(zip(colunas, map(_valor, linha))) for linha in bloco]
+            if complementar:
+                complementar(linhas)
+
+            if formato == "csv":
+                saida = io.StringIO()
+                escritor = csv.writer(saida)
+                escritor.writerows([l[c] for c in colunas] for l in linhas)
+                yield saida.getvalue()
+            else:
+                yield "".join(json.dumps(l, ensure_ascii=False) + "\n" for l in linhas)
+
+            ultimo_id = linhas[-1]["id"]
+            if limite is not None and time.monotonic() > limite:
+                if formato == "csv":
+                    yield f"# interrompido; continue com apos_id={ultimo_id}\n"
+                else:
+                    yield json.dumps({"_interrompido": True, "apos_id": ultimo_id}) + "\n"
+                return
+    finally:
+        resultado.close()
+        db.session.rollback()
+
+
+def ordenar(consulta, coluna_id):
+    apos_id = request.args.get("apos_id", type=int)
+    if apos_id:
+        consulta = consulta.where(coluna_id > apos_id)
+    return consulta.order_by(coluna_id)
+
+
+def exportar(consulta, coluna_id, colunas, nome, complementar=None):
+    """
+    Resposta em fluxo para `consulta` (um select() cujas colunas seguem a
+    ordem de `colunas`, a primeira sendo "id"). Ordena por id e aplica
+    ?apos_id=. `complementar(linhas)` pode acrescentar campos a cada bloco.
+    """
+    formato = ler_formato()
+    gerador = gerar(ordenar(consulta, coluna_id), colunas, formato, complementar, EXPORTACAO_TIMEOUT)
+    return Response(stream_with_context(gerador), mimetype=FORMATOS[formato], headers={
+        "Content-Disposition": f"attachment; filename={nome}.{formato}",
+        # Evita que um proxy (nginx) acumule a resposta inteira antes de repassar
+        "X-Accel-Buffering": "no",
+    })
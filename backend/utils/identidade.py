@@ -0,0 +1,140 @@
+"""
+Identidade do usuário autenticado (user_lookup_loader do flask_jwt_extended).
+
+Em cada requisição com JWT, Usuario e Pessoa são resolvidos juntos em uma
+única consulta (JOIN) e guardados como um retrato imutável em um cache LRU do
+processo, por jti do token, durante IDENTIDADE_TTL segundos. Enquanto o
+retrato estiver no cache a requisição não consulta o banco para saber quem é
+o usuário; as rotas leem `current_user` (usuario_id, username, role,
+pessoa_id e os dados da pessoa).
+
+Commits que alteram um Usuario ou uma Pessoa (perfil, role, exclusão)
+invalidam os retratos correspondentes neste processo pelos eventos de sessão.
+Os outros workers do gunicorn enxergam a mudança quando o TTL vence.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload
+from database import db
+from models.usuario import Usuario
+from models.pessoa import Pessoa
+from cache import CacheMemoria
+
+IDENTIDADE_TTL = int(os.getenv("IDENTIDADE_TTL", "60"))
+IDENTIDADE_MAX_ITENS = int(os.getenv("IDENTIDADE_MAX_ITENS", "4096"))
+
+_retratos = CacheMemoria(IDENTIDADE_MAX_ITENS)
+# Geração por ("usuario", id) / ("pessoa", id): um commit que altera o registro
+# ganha o próximo valor de um contador e os retratos guardados com o valor
+# anterior deixam de valer. No máximo IDENTIDADE_MAX_ITENS chaves, das mais
+# recentes; quem não tem chave vale _piso, o maior valor já descartado, e
+# como o contador só cresce nenhum retrato antigo volta a valer.
+_geracoes = OrderedDict()
+_contador = 0
+_piso = 0
+_lock = threading.Lock()
+_TIPOS = {Usuario: "usuario", Pessoa: "pessoa"}
+
+
+def _geracao(usuario_id, pessoa_id):
+    return _geracoes.get(("usuario", usuario_id), _piso), _geracoes.get(("pessoa", pessoa_id), _piso)
+
+
+def _retratar(usuario):
+    pessoa = usuario.pessoa
+    return SimpleNamespace(
+        usuario_id=usuario.id,
+        username=usuario.username,
+        role=usuario.role,
+        pessoa_id=usuario.pessoa_id,
+        pessoa=pessoa.mostrar_dados() if pessoa else None,
+    )
+
+
+def carregar_identidade(jwt_header, jwt_data):
+    """Retrato do usuário do token, ou None (o flask_jwt_extended responde 401)."""
+    jti = jwt_data.get("jti")
+    item = _retratos.get(jti) if jti else None
+    if item is not None:
+        geracao, retrato = item
+        if geracao == _geracao(retrato.usuario_id, retrato.pessoa_id):
+            return retrato
+
+    try:
+        usuario_id = int(jwt_data["sub"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    # Gerações lidas antes da consulta: se um commit invalidar no meio, o retrato já nasce velho
+    pessoa_id = jwt_data.get("pessoa_id")
+    with _lock:
+        geracao = _geracao(usuario_id, pessoa_id)
+    usuario = db.session.execute(
+        db.select(Usuario).options(joinedload(Usuario.pessoa)).where(Usuario.id == usuario_id)
+    ).scalar_one_or_none()
+    if usuario is None:
+        return None
+
+    retrato = _retratar(usuario)
+    if jti and retrato.pessoa_id == pessoa_id:
+        _retratos.set(jti, (geracao, retrato), IDENTIDADE_TTL)
+    return retrato
+
+
+def usuario_atual():
+    """
+    Usuario (com a pessoa) do token como objeto da sessão, para rotas que
+    escrevem. Se o retrato acabou de ser montado nesta requisição, os objetos
+    já estão no identity map e não há nova consulta.
+    """
+    from flask_jwt_extended import current_user
+    return db.session.get(Usuario, current_user.usuario_id, options=[joinedload(Usuario.pessoa)])
+
+
+def invalidar(usuario_ids=(), pessoa_ids=()):
+    global _contador, _piso
+    with _lock:
+        for chave in [("usuario", i) for i in usuario_ids] + [("pessoa", i) for i in pessoa_ids]:
+            _contador += 1
+            _geracoes[chave] = _contador
+            _geracoes.move_to_end(chave)
+        if len(_geracoes) > IDENTIDADE_MAX_ITENS:
+            # Descarta as mais antigas até a metade: subir o piso derruba os
+            # retratos sem chave, então é melhor que aconteça raramente
+            while len(_geracoes) > IDENTIDADE_MAX_ITENS // 2:
+                _, _piso = _geracoes.popitem(last=False)
+
+
+def registrar(jwt):
+    jwt.user_lookup_loader(carregar_identidade)
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_alteracoes(session, flush_context):
+    pendentes = session.info.setdefault("identidade_pendentes", set())
+    for obj in session.dirty:
+        # Favoritar mexe só na coleção de Pessoa, que não entra no retrato
+        if isinstance(obj, (Usuario, Pessoa)) and session.is_modified(obj, include_collections=False):
+            pendentes.add((_TIPOS[type(obj)], obj.id))
+    for obj in session.deleted:
+        if isinstance(obj, (Usuario, Pessoa)):
+            pendentes.add((_TIPOS[type(obj)], obj.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_alteracoes(session):
+    pendentes = session.info.pop("identidade_pendentes", None)
+    if pendentes:
+        invalidar(
+            usuario_ids=[i for tipo, i in pendentes if tipo == "usuario"],
+            pessoa_ids=[i for tipo, i in pendentes if tipo == "pessoa"],
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_alteracoes(session):
+    session.info.pop("identidade_pendentes", None)
@@ -0,0 +1,274 @@
+"""
+Importação em massa do acervo a partir de CSV ou JSONL.
+
+O arquivo é lido linha a linha e processado em lotes de TAMANHO_LOTE, então
+a memória usada não depende do tamanho do arquivo. Para cada lote:
+
+- as categorias são resolvidas pelo nome em uma consulta e as que faltam são
+  criadas de uma vez (INSERT ... ON CONFLICT DO NOTHING);
+- os livros são gravados com INSERT ... ON CONFLICT (isbn) DO UPDATE, ou seja,
+  um ISBN já cadastrado tem nome, autor, descrição, imagem, quantidade e
+  categorias atualizados;
+- o documento de busca é montado aqui mesmo (o INSERT em massa não passa
+  pelos eventos de flush de utils/busca.py).
+
+Cada lote é uma transação. Linhas inválidas são relatadas e puladas; se o
+banco recusar um lote, ele é refeito linha a linha para isolar o erro.
+
+Colunas: nome, autor, isbn, quantidade, descricao, imagem_url, data_aquisicao
+(AAAA-MM-DD) e categorias. No CSV as categorias vêm separadas por ";"; no
+JSONL podem ser uma lista.
+"""
+
+import csv
+import io
+import json
+import time
+from datetime import date
+from sqlalchemy import select, delete, text
+from sqlalchemy.exc import SQLAlchemyError
+from database import db, insert_dialeto
+from models.livro import Livro, livro_categoria
+from models.categoria import Categoria
+from models import estatistica
+from utils.texto import normalizar
+
+TAMANHO_LOTE = 1000
+# Só os primeiros erros vão para o relatório; os demais são apenas contados
+MAX_ERROS_RELATORIO = 1000
+FORMATOS = ("csv", "jsonl")
+
+
+class LinhaInvalida(ValueError):
+    pass
+
+
+def detectar_formato(nome_arquivo):
+    nome = (nome_arquivo or "").lower()
+    if nome.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if nome.endswith(".csv"):
+        return "csv"
+    return None
+
+
+def ler_linhas(arquivo, formato):
+    """Gera (número da linha, dict ou exceção) a partir de um arquivo de texto."""
+    if formato == "csv":
+        leitor = csv.DictReader(arquivo)
+        for linha in leitor:
+            yield leitor.line_num, linha
+        return
+
+    for numero, bruta in enumerate(arquivo, start=1):
+        if not bruta.strip():
+            continue
+        try:
+            dados = json.loads(bruta)
+        except ValueError:
+            yield numero, LinhaInvalida("JSON inválido")
+            continue
+        yield numero, dados if isinstance(dados, dict) else LinhaInvalida("A linha deve ser um objeto JSON")
+
+
+def _texto(dados, campo, limite):
+    valor = dados.get(campo)
+    valor = str(valor).strip() if valor is not None else ""
+    if len(valor) > limite:
+        raise LinhaInvalida(f"Campo '{campo}' excede {limite} caracteres")
+    return valor
+
+
+def _validar(dados):
+    if isinstance(dados, Exception):
+        raise dados
+
+    livro = {}
+    for campo, limite in (("nome", 200), ("autor", 100), ("isbn", 20)):
+        livro[campo] = _texto(dados, campo, limite)
+        if not livro[campo]:
+            raise LinhaInvalida(f"Campo '{campo}' é obrigatório")
+
+    livro["descricao"] = str(dados.get("descricao") or "")[:500]
+    livro["imagem_url"] = _texto(dados, "imagem_url", 500) or None
+
+    try:
+        livro["quantidade"] = int(dados.get("quantidade") or 1)
+    except (TypeError, ValueError):
+        raise LinhaInvalida("Quantidade inválida")
+    if livro["quantidade"] < 0:
+        raise LinhaInvalida("Quantidade inválida")
+
+    aquisicao = dados.get("data_aquisicao")
+    try:
+        livro["data_aquisicao"] = date.fromisoformat(aquisicao) if aquisicao else date.today()
+    except (TypeError, ValueError):
+        raise LinhaInvalida("Data de aquisição inválida. Use AAAA-MM-DD")
+
+    categorias = dados.get("categorias") or []
+    if isinstance(categorias, str):
+        categorias = categorias.split(";")
+    categorias = sorted({str(c).strip() for c in categorias if str(c).strip()})
+    if not categorias:
+        raise LinhaInvalida("Informe pelo menos uma categoria")
+    if any(len(c) > 100 for c in categorias):
+        raise LinhaInvalida("Nome de categoria excede 100 caracteres")
+
+    return livro, categorias
+
+
+class Importacao:
+    def __init__(self, tamanho_lote=TAMANHO_LOTE):
+        self.tamanho_lote = tamanho_lote
+        # nome -> id; cresce com o número de categorias distintas, não de linhas
+        self._categorias = {}
+        self.linhas = 0
+        self.inseridos = 0
+        self.atualizados = 0
+        self.total_erros = 0
+        self.erros = []
+        self._inicio = None
+
+    def _erro(self, numero, msg):
+        self.total_erros += 1
+        if len(self.erros) < MAX_ERROS_RELATORIO:
+            self.erros.append({"linha": numero, "erro": msg})
+
+    def _resolver_categorias(self, nomes):
+        faltando = [n for n in nomes if n not in self._categorias]
+        if not faltando:
+            return
+
+        tabela = Categoria.__table__
+        db.session.execute(
+            insert_dialeto(tabela).on_conflict_do_nothing(index_elements=["nome"]),
+            [{"nome": n} for n in faltando]
+        )
+        self._categorias.update(db.session.execute(
+            select(tabela.c.nome, tabela.c.id).where(tabela.c.nome.in_(faltando))
+        ).all())
+
+    def _gravar(self, lote):
+        """Grava um lote de (numero, livro, categorias) e faz commit."""
+        tabela = Livro.__table__
+        self._resolver_categorias({c for _, _, cats in lote for c in cats})
+
+        isbns = [livro["isbn"] for _, livro, _ in lote]
+        existentes = set(db.session.execute(
+            select(tabela.c.isbn).where(tabela.c.isbn.in_(isbns))
+        ).scalars())
+
+        linhas = []
+        for _, livro, cats in lote:
+            documento = normalizar(" ".join(p for p in [livro["nome"], livro["autor"], livro["descricao"], *cats] if p))
+            linhas.append({**livro, "ativo": True, "documento_busca": documento})
+
+        stmt = insert_dialeto(tabela)
+        # Atualização de um ISBN existente preserva data de aquisição, estado e contador
+        stmt = stmt.on_conflict_do_update(index_elements=["isbn"], set_={
+            campo: stmt.excluded[campo]
+            for campo in ("nome", "autor", "descricao", "imagem_url", "quantidade", "documento_busca")
+        })
+        db.session.execute(stmt, linhas)
+
+        ids = dict(db.session.execute(
+            select(tabela.c.isbn, tabela.c.id).where(tabela.c.isbn.in_(isbns))
+        ).all())
+        antes = set(db.session.execute(
+            select(livro_categoria.c.livro_id, livro_categoria.c.categoria_id)
+            .where(livro_categoria.c.livro_id.in_(ids.values()))
+        ).all())
+        depois = {(ids[livro["isbn"]], self._categorias[c]) for _, livro, cats in lote for c in cats}
+        db.session.execute(delete(livro_categoria).where(livro_categoria.c.livro_id.in_(ids.values())))
+        db.session.execute(livro_categoria.insert(), [
+            {"livro_id": livro_id, "categoria_id": categoria_id} for livro_id, categoria_id in sorted(depois)
+        ])
+        # Livros que já existiam levam o histórico de empréstimos para as novas categorias
+        estatistica.mover_categorias(
+            [(l, c, 1) for l, c in depois - antes] + [(l, c, -1) for l, c in antes - depois]
+        )
+
+        if db.engine.dialect.name == "sqlite":
+            db.session.execute(
+                text("INSERT OR REPLACE INTO livros_fts (rowid, documento) VALUES (:id, :documento)"),
+                [{"id": ids[l["isbn"]], "documento": l["documento_busca"]} for l in linhas]
+            )
+
+        db.session.commit()
+        self.inseridos += len(isbns) - len(existentes)
+        self.atualizados += len(existentes)
+
+    def _processar(self, lote):
+        if not lote:
+            return
+        try:
+            self._gravar(lote)
+            return
+        except SQLAlchemyError:
+            db.session.rollback()
+            # Categorias criadas no lote desfeito não existem mais
+            self._categorias.clear()
+
+        for item in lote:
+            try:
+                self._gravar([item])
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                self._categorias.clear()
+                self._erro(item[0], str(getattr(e, "orig", e)).splitlines()[0][:200])
+
+    def executar(self, linhas, progresso=None):
+        """Consome o iterável de ler_linhas() e retorna o relatório."""
+        self._inicio = time.perf_counter()
+        lote = {}
+        for numero, dados in linhas:
+            self.linhas += 1
+            try:
+                livro, cats = _validar(dados)
+            except LinhaInvalida as e:
+                self._erro(numero, str(e))
+                continue
+
+            # O mesmo ISBN duas vezes no lote: vale a última ocorrência
+            lote[livro["isbn"]] = (numero, livro, cats)
+            if len(lote) >= self.tamanho_lote:
+                self._processar(list(lote.values()))
+                lote = {}
+                if progresso:
+                    progresso(self.relatorio())
+
+        self._processar(list(lote.values()))
+        self._finalizar()
+        return self.relatorio()
+
+    def _finalizar(self):
+        from cache import invalidar_livros, invalidar_categorias
+        from utils.sugestoes import indice_livros
+
+        if self.inseridos or self.atualizados:
+            invalidar_livros()
+            invalidar_categorias()
+            indice_livros.invalidar()
+
+    def relatorio(self):
+        segundos = time.perf_counter() - self._inicio if self._inicio else 0.0
+        return {
+            "linhas": self.linhas,
+            "inseridos": self.inseridos,
+            "atualizados": self.atualizados,
+            "total_erros": self.total_erros,
+            "erros": self.erros,
+            "segundos": round(segundos, 3),
+            "linhas_por_segundo": round(self.linhas / segundos, 1) if segundos else 0.0,
+        }
+
+
+def importar(arquivo_binario, formato, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Importa de um arquivo aberto em modo binário (upload, stdin ou disco)."""
+    if formato not in FORMATOS:
+        raise ValueError("Formato inválido. Use csv ou jsonl")
+    arquivo = io.TextIOWrapper(arquivo_binario, encoding="utf-8-sig", newline="")
+    try:
+        return Importacao(tamanho_lote).executar(ler_linhas(arquivo, formato), progresso)
+    finally:
+        arquivo.detach()
@@ -0,0 +1,101 @@
+import base64
+import json
+from datetime import date
+from flask import request
+from sqlalchemy import or_, and_
+
+MAX_POR_PAGINA = 1000
+
+
+def pede_paginacao():
+    """Verdadeiro quando o cliente usou o contrato paginado (page/per_page/cursor)."""
+    return any(p in request.args for p in ("page", "per_page", "cursor"))
+
+
+def limitar_legado(query, coluna_id):
+    """
+    Contrato antigo, sem paginação: no máximo MAX_POR_PAGINA itens, por id.
+    Telas que precisam de tudo devem usar page/cursor.
+    """
+    return query.order_by(coluna_id).limit(MAX_POR_PAGINA)
+
+
+def ler_ordenacao(campos, padrao):
+    """
+    Lê ?ordenar=campo ou ?ordenar=-campo (decrescente).
+    `campos` mapeia o nome público para a coluna; campos desconhecidos usam o padrão.
+    """
+    valor = request.args.get("ordenar", padrao, type=str)
+    desc = valor.startswith("-")
+    nome = valor.lstrip("-")
+    if nome not in campos:
+        desc = padrao.startswith("-")
+        nome = padrao.lstrip("-")
+    return campos[nome], desc
+
+
+def _codificar_cursor(valor, id_):
+    if isinstance(valor, date):
+        valor = valor.isoformat()
+    bruto = json.dumps([valor, id_]).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor, coluna):
+    preenchido = cursor + "=" * (-len(cursor) % 4)
+    valor, id_ = json.loads(base64.urlsafe_b64decode(preenchido.encode()))
+    if coluna.type.python_type is date and valor is not None:
+        valor = date.fromisoformat(valor)
+    return valor, int(id_)
+
+
+def paginar(query, coluna, coluna_id, desc=False, per_page_padrao=20):
+    """
+    Pagina `query` ordenando por (coluna, id).
+
+    Com ?cursor= usa paginação por chave (keyset): a próxima página é um range
+    scan a partir do último item, sem OFFSET nem COUNT, então o custo não cresce
+    com a profundidade. Sem cursor, mantém o mesmo contrato page/per_page de
+    /livros, incluindo total_itens e total_paginas.
+
+    Retorna (itens, meta).
+    """
+    per_page = max(1, min(request.args.get("per_page", per_page_padrao, type=int), MAX_POR_PAGINA))
+    cursor = request.args.get("cursor", type=str)
+
+    if desc:
+        ordem = [coluna.desc(), coluna_id.desc()]
+    else:
+        ordem = [coluna.asc(), coluna_id.asc()]
+    query = query.order_by(*ordem)
+
+    if cursor is not None:
+        try:
+            valor, ultimo_id = _decodificar_cursor(cursor, coluna) if cursor else (None, None)
+        except (ValueError, TypeError):
+            raise ValueError("Cursor inválido")
+
+        if ultimo_id is not None:
+            if desc:
+                query = query.filter(or_(coluna < valor, and_(coluna == valor, coluna_id < ultimo_id)))
+            else:
+                query = query.filter(or_(coluna > valor, and_(coluna == valor, coluna_id > ultimo_id)))
+
+        itens = query.limit(per_page + 1).all()
+        tem_mais = len(itens) > per_page
+        itens = itens[:per_page]
+
+        proximo = None
+        if tem_mais:
+            ultimo = itens[-1]
+            proximo = _codificar_cursor(getattr(ultimo, coluna.key), getattr(ultimo, coluna_id.key))
+
+        return itens, {"proximo_cursor": proximo}
+
+    page = request.args.get("page", 1, type=int)
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    return pagination.items, {
+        "total_itens": pagination.total,
+        "total_paginas": pagination.pages,
+        "pagina_atual": page
+    }
@@ -0,0 +1,107 @@
+"""
+Hash de senhas fora da thread da requisição.
+
+O método é o de werkzeug.security (scrypt:N:r:p ou pbkdf2:hash:iterações) e
+vem de SENHA_METODO. Hashes gravados com outro método continuam válidos; no
+próximo login bem-sucedido são refeitos com o método atual (ver
+precisa_rehash e routes/auth.py).
+
+O cálculo roda em um pool de SENHA_PROCESSOS processos, criado na primeira
+chamada de cada processo (cada worker do gunicorn tem o seu). Assim o hash não
+segura o GIL das outras requisições do worker. No máximo SENHA_FILA hashes
+ficam pendentes por worker; passado SENHA_ESPERA segundos esperando vaga,
+levanta SenhasOcupadas (a rota responde 503). SENHA_PROCESSOS=0 calcula na
+própria thread, como antes.
+
+Os processos do pool usam spawn: scripts que chamam set_senha/checar_senha
+precisam do `if __name__ == "__main__"` de praxe.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+
+def _normalizar(metodo):
+    # Mesmo formato que o werkzeug grava no hash: "scrypt" -> "scrypt:32768:8:1"
+    nome, *args = metodo.split(":")
+    if nome == "scrypt" and not args:
+        return "scrypt:32768:8:1"
+    if nome == "pbkdf2" and len(args) < 2:
+        return f"pbkdf2:{(args or ['sha256'])[0]}:{DEFAULT_PBKDF2_ITERATIONS}"
+    return metodo
+
+
+SENHA_METODO = _normalizar(os.getenv("SENHA_METODO", "scrypt:32768:8:1"))
+SENHA_PROCESSOS = int(os.getenv("SENHA_PROCESSOS", str(min(os.cpu_count() or 1, 4))))
+SENHA_FILA = int(os.getenv("SENHA_FILA", str(max(SENHA_PROCESSOS, 1) * 4)))
+SENHA_ESPERA = float(os.getenv("SENHA_ESPERA", "10"))
+
+
+class SenhasOcupadas(RuntimeError):
+    pass
+
+
+_pool = None
+_pool_pid = None
+_vagas = threading.BoundedSemaphore(SENHA_FILA)
+_lock = threading.Lock()
+
+
+def _gevent_ativo():
+    # Com gevent, as threads internas do ProcessPoolExecutor viram greenlets e o pool trava
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("threading")
+
+
+def _obter_pool():
+    global _pool, _pool_pid
+    if SENHA_PROCESSOS <= 0 or _gevent_ativo():
+        return None
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn: o filho não herda conexões do banco nem threads do worker
+            _pool = ProcessPoolExecutor(SENHA_PROCESSOS, mp_context=get_context("spawn"))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _executar(fn, *args):
+    pool = _obter_pool()
+    if pool is None:
+        return fn(*args)
+    if not _vagas.acquire(timeout=SENHA_ESPERA):
+        raise SenhasOcupadas("Servidor ocupado, tente novamente")
+    try:
+        return pool.submit(fn, *args).result()
+    finally:
+        _vagas.release()
+
+
+def _metodo(senha_hash):
+    return senha_hash.split("$", 1)[0]
+
+
+def gerar_hash(senha, metodo=None):
+    return _executar(generate_password_hash, senha, metodo or SENHA_METODO)
+
+
+def verificar(senha_hash, senha):
+    return _executar(check_password_hash, senha_hash, senha)
+
+
+def precisa_rehash(senha_hash):
+    return _metodo(senha_hash) != SENHA_METODO
+
+
+def encerrar():
+    global _pool
+    with _lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
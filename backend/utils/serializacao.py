@@ -0,0 +1,116 @@
+"""
+Serialização de listas sem consultas por linha.
+
+O mostrar_dados() de cada modelo serializa um objeto e, se a relação não veio
+carregada, dispara o lazy load dela. Em uma lista, isso vira uma ou mais
+consultas por item. Aqui, como num dataloader: carregar() junta os ids de
+todos os objetos da lista, busca os relacionados em uma consulta por relação
+e os coloca nos objetos (set_committed_value, sem marcar nada como alterado).
+Depois disso mostrar_dados() só lê o que já está em memória.
+
+Relações que a consulta de origem já trouxe (joinedload/selectinload) são
+puladas. Quantidade disponível não precisa de contagem: vem de
+Livro.emprestados_ativos.
+"""
+
+from collections import defaultdict
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import RelationshipDirection
+from sqlalchemy.orm.attributes import set_committed_value
+from database import db
+
+
+def _carregar_referencia(pendentes, relacao):
+    # Muitos-para-um (Emprestimo.livro): SELECT alvo WHERE pk IN (fks)
+    (coluna_fk, coluna_pk), = [(local, remota) for local, remota in relacao.local_remote_pairs]
+    atributo_fk = relacao.parent.get_property_by_column(coluna_fk).key
+    alvo = relacao.mapper.class_
+
+    ids = {getattr(o, atributo_fk) for o in pendentes} - {None}
+    encontrados = {}
+    if ids:
+        atributo_pk = relacao.mapper.get_property_by_column(coluna_pk).key
+        for obj in db.session.execute(select(alvo).where(coluna_pk.in_(ids))).scalars():
+            encontrados[getattr(obj, atributo_pk)] = obj
+
+    for o in pendentes:
+        set_committed_value(o, relacao.key, encontrados.get(getattr(o, atributo_fk)))
+
+
+def _carregar_colecao(pendentes, relacao):
+    # Muitos-para-muitos (Livro.categorias): um SELECT na associação com JOIN no alvo
+    (pk_pai, coluna_pai), = relacao.synchronize_pairs
+    (pk_alvo, coluna_alvo), = relacao.secondary_synchronize_pairs
+    alvo = relacao.mapper.class_
+    atributo_pk = relacao.parent.get_property_by_column(pk_pai).key
+
+    ids = {getattr(o, atributo_pk) for o in pendentes}
+    por_pai = defaultdict(list)
+    consulta = (
+        select(coluna_pai, alvo)
+        .join(alvo, pk_alvo == coluna_alvo)
+        .where(coluna_pai.in_(ids))
+        .order_by(coluna_pai, pk_alvo)
+    )
+    for id_pai, obj in db.session.execute(consulta):
+        por_pai[id_pai].append(obj)
+
+    for o in pendentes:
+        set_committed_value(o, relacao.key, por_pai[getattr(o, atributo_pk)])
+
+
+def carregar(objetos, *atributos):
+    """Carrega as relações `atributos` de todos os objetos (do mesmo modelo), uma consulta por relação."""
+    if not objetos:
+        return objetos
+    relacoes = inspect(type(objetos[0])).relationships
+    for atributo in atributos:
+        relacao = relacoes[atributo]
+        pendentes = [o for o in objetos if atributo in inspect(o).unloaded]
+        if not pendentes:
+            continue
+        if relacao.direction is RelationshipDirection.MANYTOONE:
+            _carregar_referencia(pendentes, relacao)
+        elif relacao.secondary is not None:
+            _carregar_colecao(pendentes, relacao)
+        else:
+            raise ValueError(f"Relação '{atributo}' não suportada")
+    return objetos
+
+
+def livros(lista):
+    lista = list(lista)
+    carregar(lista, "categorias")
+    return [l.mostrar_dados() for l in lista]
+
+
+def emprestimos(lista):
+    lista = list(lista)
+    carregar(lista, "pessoa", "livro")
+    return [e.mostrar_dados() for e in lista]
+
+
+def pessoas(lista):
+    return [p.mostrar_dados() for p in lista]
+
+
+def categorias(lista):
+    return [c.mostrar_dados() for c in lista]
+
+
+def indicacoes(lista):
+    """Dados do livro de cada indicação mais id_indicacao, data_inicio e data_fim."""
+    lista = list(lista)
+    carregar(lista, "livro")
+    carregar([i.livro for i in lista if i.livro is not None], "categorias")
+
+    resultado = []
+    for i in lista:
+        if i.livro is None:
+            continue
+        dados = i.livro.mostrar_dados()
+        dados["id_indicacao"] = i.id
+        dados["data_inicio"] = i.data_inicio.isoformat()
+        dados["data_fim"] = i.data_fim.isoformat()
+        resultado.append(dados)
+    return resultado
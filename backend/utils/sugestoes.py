@@ -0,0 +1,339 @@
+"""
+Índice de prefixos em memória para o autocomplete de livros e pessoas.
+
+O índice guarda só o início de cada palavra: cada token (palavra normalizada
+do nome/autor, ou os dígitos de CPF/ISBN) aponta para um array com os ids dos
+registros que o contêm, e os tokens ficam em uma lista ordenada. Um prefixo é
+um bisect nessa lista seguido de uma varredura curta; com várias palavras na
+consulta, cada uma precisa ser o começo de alguma palavra do registro
+("sen ane" acha "O Senhor dos Anéis").
+
+O índice é montado na primeira consulta do processo e depois mantido de forma
+incremental pelos eventos de sessão (commits de Livro/Pessoa feitos neste
+processo). Escritas de outros workers aparecem por uma versão própria do
+índice ("livros:sugestoes", em VersaoTabela), que só sobe quando um campo
+indexado muda ou numa escrita em massa na tabela: empréstimos e edições de
+outros campos não contam. No máximo a cada SUGESTOES_VERIFICAR segundos uma
+consulta compara essa versão com a do índice e, se mudou, remonta o índice em
+uma thread, sem segurar a requisição, que segue respondendo com o índice
+atual. Um commit deste processo que o índice já aplicou avança a versão do
+índice junto, sem remontar.
+"""
+
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from types import SimpleNamespace
+from flask import current_app, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from database import db
+from models.livro import Livro
+from models.pessoa import Pessoa
+from models import versao as versoes
+from models.versao import VersaoTabela, linha as chave_linha
+from utils.texto import tokens
+
+SUGESTOES_VERIFICAR = float(os.getenv("SUGESTOES_VERIFICAR", "10"))
+LIMITE_PADRAO = 10
+LIMITE_MAXIMO = 50
+
+
+def _somente_digitos(texto):
+    return "".join(c for c in texto or "" if c.isdigit())
+
+
+class IndicePrefixo:
+    def __init__(self, tabela, carregar, chaves, dados):
+        # carregar() -> iterável de linhas; chaves(linha) -> [token]; dados(linha) -> dict com "id"
+        self.tabela = tabela
+        self.chave_versao = chave_linha(tabela, "sugestoes")
+        self._carregar = carregar
+        self._gerar_chaves = chaves
+        self._gerar_dados = dados
+        self._lock = threading.Lock()
+        self._tokens = []
+        self._ids = {}
+        self._tokens_por_id = {}
+        self._dados = {}
+        self._versao = None
+        self._verificado_em = None
+        self._remontando = False
+        # Alterações locais que chegaram durante uma remontagem, reaplicadas no fim dela
+        self._durante_remontagem = None
+
+    def montar(self):
+        with self._lock:
+            self._durante_remontagem = []
+        try:
+            # Versão lida antes das linhas: uma escrita no meio da carga deixa o índice já velho
+            versao, = VersaoTabela.obter([self.chave_versao])
+            ids, tokens_por_id, dados = {}, {}, {}
+            for linha in self._carregar():
+                item = self._gerar_dados(linha)
+                chaves = tuple(sorted(set(self._gerar_chaves(linha))))
+                dados[item["id"]] = item
+                tokens_por_id[item["id"]] = chaves
+                for c in chaves:
+                    ids.setdefault(c, []).append(item["id"])
+            ids = {c: array("q", sorted(lista)) for c, lista in ids.items()}
+
+            with self._lock:
+                self._tokens = sorted(ids)
+                self._ids = ids
+                self._tokens_por_id = tokens_por_id
+                self._dados = dados
+                self._versao = versao
+                self._verificado_em = time.monotonic()
+                for tipo, valor in self._durante_remontagem:
+                    if tipo == "atualizar":
+                        self._atualizar(valor)
+                    else:
+                        self._remover(valor)
+        finally:
+            with self._lock:
+                self._durante_remontagem = None
+
+    def _remontar_em_segundo_plano(self):
+        app = current_app._get_current_object()
+
+        def remontar():
+            try:
+                with app.app_context():
+                    self.montar()
+            except Exception:
+                app.logger.exception("Falha ao remontar o índice de sugestões de %s", self.tabela)
+            finally:
+                self._remontando = False
+
+        threading.Thread(target=remontar, name=f"sugestoes-{self.tabela}", daemon=True).start()
+
+    def _garantir_atual(self):
+        if self._versao is None:
+            # Primeira consulta do processo: não há índice para responder enquanto monta
+            self.montar()
+            return
+
+        agora = time.monotonic()
+        with self._lock:
+            if self._remontando or (self._verificado_em is not None and agora - self._verificado_em < SUGESTOES_VERIFICAR):
+                return
+            self._verificado_em = agora
+        versao, = VersaoTabela.obter([self.chave_versao])
+        with self._lock:
+            if versao == self._versao or self._remontando:
+                return
+            self._remontando = True
+        self._remontar_em_segundo_plano()
+
+    def invalidar(self):
+        # Confere a versão já na próxima busca (ex.: após uma importação em massa)
+        with self._lock:
+            self._verificado_em = None
+
+    def aplicada(self, versao):
+        """
+        Um commit deste processo subiu a versão do índice para `versao` e as
+        alterações dele já foram aplicadas aqui. Só avança se não houve outra
+        escrita desde a montagem, senão a remontagem ainda é necessária.
+        """
+        with self._lock:
+            if self._versao is not None and versao == self._versao + 1:
+                self._versao = versao
+
+    def atualizar(self, linha):
+        if self._versao is None:
+            return
+        item = self._gerar_dados(linha)
+        valor = (item, tuple(sorted(set(self._gerar_chaves(linha)))))
+        with self._lock:
+            self._atualizar(valor)
+            if self._durante_remontagem is not None:
+                self._durante_remontagem.append(("atualizar", valor))
+
+    def remover(self, id_):
+        if self._versao is None:
+            return
+        with self._lock:
+            self._remover(id_)
+            if self._durante_remontagem is not None:
+                self._durante_remontagem.append(("remover", id_))
+
+    def _atualizar(self, valor):
+        item, chaves = valor
+        id_ = item["id"]
+        self._remover(id_)
+        self._dados[id_] = item
+        self._tokens_por_id[id_] = chaves
+        for c in chaves:
+            ids = self._ids.get(c)
+            if ids is None:
+                self._ids[c] = array("q", [id_])
+                insort(self._tokens, c)
+            else:
+                insort(ids, id_)
+
+    def _remover(self, id_):
+        for c in self._tokens_por_id.pop(id_, ()):
+            ids = self._ids[c]
+            pos = bisect_left(ids, id_)
+            if pos < len(ids) and ids[pos] == id_:
+                del ids[pos]
+            if not ids:
+                del self._ids[c]
+                del self._tokens[bisect_left(self._tokens, c)]
+        self._dados.pop(id_, None)
+
+    def _faixa(self, prefixo):
+        inicio = bisect_left(self._tokens, prefixo)
+        fim = bisect_left(self._tokens, prefixo + "\uffff", inicio)
+        return inicio, fim
+
+    def buscar(self, consulta, limite=LIMITE_PADRAO):
+        """Registros com uma palavra começando por cada palavra da consulta, na ordem dos tokens."""
+        palavras = consulta.split()
+        if not palavras:
+            return []
+        self._garantir_atual()
+
+        resultado, vistos = [], set()
+        with self._lock:
+            # Varre a palavra de faixa mais estreita; as demais só filtram
+            faixas = {p: self._faixa(p) for p in palavras}
+            guia = min(faixas, key=lambda p: faixas[p][1] - faixas[p][0])
+            outras = [p for p in faixas if p != guia]
+            inicio, fim = faixas[guia]
+            for token in self._tokens[inicio:fim]:
+                for id_ in self._ids[token]:
+                    if id_ in vistos:
+                        continue
+                    vistos.add(id_)
+                    if all(any(t.startswith(p) for t in self._tokens_por_id[id_]) for p in outras):
+                        resultado.append(self._dados[id_])
+                        if len(resultado) >= limite:
+                            return resultado
+        return resultado
+
+
+def _carregar_livros():
+    return db.session.query(Livro.id, Livro.nome, Livro.autor, Livro.isbn).filter(Livro.ativo == True).all()
+
+
+def _chaves_livro(l):
+    chaves = tokens(l.nome) + tokens(l.autor)
+    isbn = _somente_digitos(l.isbn)
+    if isbn:
+        chaves.append(isbn)
+    return chaves
+
+
+def _dados_livro(l):
+    return {"id": l.id, "nome": l.nome, "autor": l.autor, "isbn": l.isbn}
+
+
+def _carregar_pessoas():
+    return db.session.query(Pessoa.id, Pessoa.nome, Pessoa.cpf).all()
+
+
+def _chaves_pessoa(p):
+    chaves = tokens(p.nome)
+    cpf = _somente_digitos(p.cpf)
+    if cpf:
+        chaves.append(cpf)
+    return chaves
+
+
+def _dados_pessoa(p):
+    return {"id": p.id, "nome": p.nome, "cpf": p.cpf}
+
+
+indice_livros = IndicePrefixo("livros", _carregar_livros, _chaves_livro, _dados_livro)
+indice_pessoas = IndicePrefixo("pessoas", _carregar_pessoas, _chaves_pessoa, _dados_pessoa)
+
+CAMPOS_INDEXADOS = {
+    Livro: ("nome", "autor", "isbn", "ativo"),
+    Pessoa: ("nome", "cpf"),
+}
+INDICES = {Livro: indice_livros, Pessoa: indice_pessoas}
+_INDICE_POR_TABELA = {modelo.__tablename__: indice for modelo, indice in INDICES.items()}
+
+
+def normalizar_consulta(termo):
+    # CPF e ISBN são indexados só com dígitos; nomes, pelas palavras normalizadas
+    if re.fullmatch(r"[\d.\-/\s]+", termo or ""):
+        return _somente_digitos(termo)
+    return " ".join(tokens(termo))
+
+
+def _mudou(obj):
+    estado = inspect(obj)
+    return any(estado.attrs[c].history.has_changes() for c in CAMPOS_INDEXADOS[type(obj)])
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_alteracoes(session, flush_context):
+    pendentes = session.info.setdefault("sugestoes_pendentes", [])
+    for obj in session.new:
+        if type(obj) in CAMPOS_INDEXADOS:
+            pendentes.append((type(obj), obj.id, _linha(obj)))
+    for obj in session.dirty:
+        if type(obj) in CAMPOS_INDEXADOS and _mudou(obj):
+            pendentes.append((type(obj), obj.id, _linha(obj)))
+    for obj in session.deleted:
+        if type(obj) in CAMPOS_INDEXADOS:
+            pendentes.append((type(obj), obj.id, None))
+    for tipo in {tipo for tipo, _, _ in pendentes}:
+        versoes.marcar_linhas(session, tipo.__tablename__, ["sugestoes"])
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _registrar_em_massa(orm_execute_state):
+    # Escritas em massa (importação) não passam pelo flush: o índice não sabe
+    # o que mudou, e todos os processos, inclusive este, precisam remontar
+    if orm_execute_state.execution_options.get("versao_por_linha"):
+        return
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        tabela = getattr(orm_execute_state.statement, "table", None)
+        if tabela is not None and tabela.name in _INDICE_POR_TABELA:
+            session = orm_execute_state.session
+            session.info.setdefault("sugestoes_em_massa", set()).add(tabela.name)
+            versoes.marcar_linhas(session, tabela.name, ["sugestoes"])
+
+
+def _linha(obj):
+    # Copia os valores agora: depois do commit o objeto estará expirado
+    if isinstance(obj, Livro):
+        if not obj.ativo:
+            return None
+        return SimpleNamespace(id=obj.id, nome=obj.nome, autor=obj.autor, isbn=obj.isbn)
+    return SimpleNamespace(id=obj.id, nome=obj.nome, cpf=obj.cpf)
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_alteracoes(session):
+    for tipo, id_, linha in session.info.pop("sugestoes_pendentes", []):
+        indice = INDICES[tipo]
+        if linha is None:
+            indice.remover(id_)
+        else:
+            indice.atualizar(linha)
+
+    em_massa = session.info.pop("sugestoes_em_massa", set())
+    aplicadas = versoes.versoes_aplicadas(session)
+    for tabela, indice in _INDICE_POR_TABELA.items():
+        if tabela not in em_massa and indice.chave_versao in aplicadas:
+            indice.aplicada(aplicadas[indice.chave_versao])
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_alteracoes(session):
+    session.info.pop("sugestoes_pendentes", None)
+    session.info.pop("sugestoes_em_massa", None)
+
+
+def ler_limite():
+    limite = request.args.get("limite", LIMITE_PADRAO, type=int)
+    return max(1, min(limite, LIMITE_MAXIMO))
@@ -0,0 +1,16 @@
+import re
+import unicodedata
+
+
+def normalizar(texto: str) -> str:
+    # Minúsculas, sem acentos e com espaços simples: "Ação  É" -> "acao e"
+    if not texto:
+        return ""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acento.lower().split())
+
+
+def tokens(texto: str) -> list:
+    # Palavras alfanuméricas do texto normalizado
+    return re.findall(r"\w+", normalizar(texto))
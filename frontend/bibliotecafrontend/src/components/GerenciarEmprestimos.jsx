@@ -19,22 +19,34 @@ import {
   Alert,
   CircularProgress,
   Tooltip,
-  IconButton
+  IconButton,
+  Pagination,
+  Autocomplete
 } from "@mui/material";
 
 import CheckCircleIcon from '@mui/icons-material/CheckCircle';
 import AddCircleOutlineIcon from '@mui/icons-material/AddCircleOutline';
 import SearchIcon from '@mui/icons-material/Search';
 
+const POR_PAGINA = 50;
+
+const rotuloPessoa = (p) => `${p.nome} (CPF: ${p.cpf})`;
+
 const GerenciarEmprestimos = () => {
   const [emprestimos, setEmprestimos] = useState([]);
-  const [pessoas, setPessoas] = useState([]);
   const [livros, setLivros] = useState([]);
   const [loading, setLoading] = useState(true);
-  
+  const [carregandoLista, setCarregandoLista] = useState(false);
+
   const [filtro, setFiltro] = useState("Todos");
   const [busca, setBusca] = useState("");
-  const [pessoaId, setPessoaId] = useState("");
+  const [page, setPage] = useState(1);
+  const [totalPages, setTotalPages] = useState(1);
+
+  // Leitor: autocomplete em /pessoas/sugestoes em vez da lista inteira de pessoas
+  const [pessoa, setPessoa] = useState(null);
+  const [buscaPessoa, setBuscaPessoa] = useState("");
+  const [opcoesPessoas, setOpcoesPessoas] = useState([]);
   const [livroId, setLivroId] = useState("");
   const [dataEmprestimo, setDataEmprestimo] = useState(
     new Date().toISOString().slice(0, 10)
@@ -42,41 +54,70 @@ const GerenciarEmprestimos = () => {
   
   const [msg, setMsg] = useState({ type: "", text: "" });
 
+  const fetchEmprestimos = async (pagina, status, termo) => {
+    setCarregandoLista(true);
+    try {
+      const params = { page: pagina, per_page: POR_PAGINA, ordenar: "-id" };
+      if (status !== "Todos") params.status = status.toLowerCase();
+      if (termo) params.q = termo;
+      const res = await api.get("/emprestimos", { params });
+      setEmprestimos(res.data.emprestimos);
+      setTotalPages(res.data.total_paginas || 1);
+    } catch (err) {
+      console.error("Erro ao buscar empréstimos:", err);
+      setMsg({ type: "error", text: "Erro ao carregar dados do servidor." });
+    } finally {
+      setCarregandoLista(false);
+      setLoading(false);
+    }
+  };
+
   useEffect(() => {
-    const fetchDados = async () => {
-      try {
-        const [empRes, pesRes, livRes] = await Promise.all([
-          api.get("/emprestimos"),
-          api.get("/pessoas"),
-          api.get("/livros?per_page=1000"), 
-        ]);
-        setEmprestimos(empRes.data);
-        setPessoas(pesRes.data);
-        setLivros(livRes.data.livros || []); 
-      } catch (err) {
-        console.error("Erro ao buscar dados:", err);
-        setMsg({ type: "error", text: "Erro ao carregar dados do servidor." });
-      } finally {
-        setLoading(false);
-      }
-    };
-    fetchDados();
+    api.get("/livros?per_page=1000&fields=id,nome")
+      .then((res) => setLivros(res.data.livros || []))
+      .catch((err) => console.error("Erro ao buscar livros:", err));
   }, []);
 
+  useEffect(() => {
+    const delayDebounceFn = setTimeout(() => {
+      fetchEmprestimos(page, filtro, busca.trim());
+    }, 300);
+    return () => clearTimeout(delayDebounceFn);
+  }, [page, filtro, busca]);
+
+  useEffect(() => {
+    // Sem texto, ou com o texto do leitor já escolhido, não há o que buscar
+    if (!buscaPessoa.trim() || (pessoa && buscaPessoa === rotuloPessoa(pessoa))) {
+      setOpcoesPessoas(pessoa ? [pessoa] : []);
+      return;
+    }
+    const delayDebounceFn = setTimeout(() => {
+      api.get("/pessoas/sugestoes", { params: { q: buscaPessoa, limite: 20 } })
+        .then((res) => setOpcoesPessoas(res.data))
+        .catch((err) => console.error("Erro ao buscar leitores:", err));
+    }, 300);
+    return () => clearTimeout(delayDebounceFn);
+  }, [buscaPessoa, pessoa]);
+
   const criarEmprestimo = async (e) => {
     e.preventDefault();
     setMsg({ type: "", text: "" });
+    if (!pessoa) {
+      setMsg({ type: "error", text: "Selecione o leitor." });
+      return;
+    }
 
     try {
-      const res = await api.post("/emprestimos", {
-        pessoa_id: pessoaId,
+      await api.post("/emprestimos", {
+        pessoa_id: pessoa.id,
         livro_id: livroId,
         data_emprestimo: dataEmprestimo
       });
       
-      setEmprestimos((prev) => [...prev, res.data.emprestimo]);
-      
-      setPessoaId("");
+      // Recarrega a página atual: o novo empréstimo pode nem cair nela com os filtros
+      fetchEmprestimos(page, filtro, busca.trim());
+
+      setPessoa(null);
       setLivroId("");
       setMsg({ type: "success", text: "Empréstimo registado com sucesso!" });
       
@@ -104,25 +145,18 @@ const GerenciarEmprestimos = () => {
     }
   };
 
-  const emprestimosFiltrados = emprestimos.filter((e) => {
-    const statusMatch = filtro === "Todos" ? true : e.status?.toLowerCase() === filtro.toLowerCase();
-    
-    const nomePessoa = e.pessoa_nome ? e.pessoa_nome.toLowerCase() : "";
-    const nomeLivro = e.livro_nome ? e.livro_nome.toLowerCase() : "";
-    const buscaLower = busca.toLowerCase();
-
-    const buscaMatch = nomePessoa.includes(buscaLower) || nomeLivro.includes(buscaLower);
-    
-    return statusMatch && buscaMatch;
-  });
+  // Status e busca já vêm filtrados do servidor; aqui só some da lista o que foi devolvido agora
+  const emprestimosFiltrados = emprestimos.filter((e) =>
+    filtro === "Todos" ? true : e.status?.toLowerCase() === filtro.toLowerCase()
+  );
 
   const getStatusChip = (emprestimo) => {
     const hoje = new Date();
-    const dataEmp = new Date(emprestimo.data_emprestimo + "T00:00:00"); 
-    const prazo = new Date(dataEmp.getTime() + 7 * 24 * 60 * 60 * 1000); 
+    // Prazo vem da API (depende da categoria); atrasado só a partir do dia seguinte, como a multa
+    const prazo = emprestimo.data_prevista ? new Date(emprestimo.data_prevista + "T23:59:59") : null;
     
     const isDevolvido = emprestimo.status === "devolvido" || !!emprestimo.data_devolucao;
-    const isAtrasado = !isDevolvido && hoje > prazo;
+    const isAtrasado = !isDevolvido && !!prazo && hoje > prazo;
 
     if (isDevolvido) return <Chip label="Devolvido" size="small" />;
     if (isAtrasado) return <Chip label="Atrasado" color="error" size="small" />;
@@ -154,7 +188,7 @@ const GerenciarEmprestimos = () => {
                     key={f}
                     variant={filtro === f ? "contained" : "outlined"}
                     size="small"
-                    onClick={() => setFiltro(f)}
+                    onClick={() => { setFiltro(f); setPage(1); }}
                     sx={{ borderRadius: 5 }}
                   >
                     {f}
@@ -165,7 +199,7 @@ const GerenciarEmprestimos = () => {
                 placeholder="Buscar leitor ou livro..."
                 size="small"
                 value={busca}
-                onChange={(e) => setBusca(e.target.value)}
+                onChange={(e) => { setBusca(e.target.value); setPage(1); }}
                 InputProps={{
                   startAdornment: <SearchIcon color="action" sx={{ mr: 1 }} />,
                 }}
@@ -173,7 +207,7 @@ const GerenciarEmprestimos = () => {
               />
             </Box>
 
-            <TableContainer sx={{ maxHeight: 600 }}>
+            <TableContainer sx={{ maxHeight: 600, opacity: carregandoLista ? 0.6 : 1 }}>
               <Table stickyHeader>
                 <TableHead>
                   <TableRow>
@@ -220,6 +254,12 @@ const GerenciarEmprestimos = () => {
                 </TableBody>
               </Table>
             </TableContainer>
+
+            {totalPages > 1 && (
+              <Box display="flex" justifyContent="center" mt={2}>
+                <Pagination count={totalPages} page={page} onChange={(e, value) => setPage(value)} color="primary" />
+              </Box>
+            )}
           </Paper>
         </Grid>
 
@@ -233,21 +273,25 @@ const GerenciarEmprestimos = () => {
             <form onSubmit={criarEmprestimo}>
               <Grid container spacing={2}>
                 <Grid item xs={12}>
-                  <TextField
-                    select
-                    label="Leitor"
-                    fullWidth
-                    value={pessoaId}
-                    onChange={(e) => setPessoaId(e.target.value)}
-                    required
-                    helperText="Selecione quem vai levar o livro"
-                  >
-                    {pessoas.map((p) => (
-                      <MenuItem key={p.id} value={p.id}>
-                        {p.nome} (CPF: {p.cpf})
-                      </MenuItem>
-                    ))}
-                  </TextField>
+                  <Autocomplete
+                    options={opcoesPessoas}
+                    value={pessoa}
+                    onChange={(e, valor) => setPessoa(valor)}
+                    inputValue={buscaPessoa}
+                    onInputChange={(e, valor) => setBuscaPessoa(valor)}
+                    filterOptions={(x) => x}
+                    getOptionLabel={rotuloPessoa}
+                    isOptionEqualToValue={(a, b) => a.id === b.id}
+                    noOptionsText={buscaPessoa ? "Nenhum leitor encontrado" : "Digite o nome ou CPF"}
+                    renderInput={(params) => (
+                      <TextField
+                        {...params}
+                        label="Leitor"
+                        required
+                        helperText="Selecione quem vai levar o livro"
+                      />
+                    )}
+                  />
                 </Grid>
 
                 <Grid item xs={12}>
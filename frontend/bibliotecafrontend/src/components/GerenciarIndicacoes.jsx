@@ -42,7 +42,7 @@ const GerenciarIndicacoes = () => {
     const fetchDados = async () => {
       try {
         const [livrosRes, indicacoesRes] = await Promise.all([
-          api.get("/livros?per_page=1000"),
+          api.get("/livros?per_page=1000&fields=id,nome"),
           api.get("/indicacoes"),
         ]);
         setLivros(livrosRes.data.livros || []); 
@@ -16,22 +16,29 @@ import {
   CircularProgress,
   Alert,
   Box,
-  Tooltip
+  Tooltip,
+  Pagination
 } from "@mui/material";
 
 import EditIcon from '@mui/icons-material/Edit';
 
+const POR_PAGINA = 20;
+
 const ListaPessoas = () => {
   const [pessoas, setPessoas] = useState([]);
+  const [page, setPage] = useState(1);
+  const [totalPages, setTotalPages] = useState(1);
   const [loading, setLoading] = useState(true);
   const [erro, setErro] = useState("");
   const navigate = useNavigate();
 
   useEffect(() => {
     const fetchPessoas = async () => {
+      setLoading(true);
       try {
-        const response = await api.get("/pessoas");
-        setPessoas(response.data);
+        const response = await api.get("/pessoas", { params: { page, per_page: POR_PAGINA } });
+        setPessoas(response.data.pessoas);
+        setTotalPages(response.data.total_paginas || 1);
       } catch (error) {
         console.error(error);
         if (error.response) {
@@ -45,7 +52,7 @@ const ListaPessoas = () => {
     };
 
     fetchPessoas();
-  }, []);
+  }, [page]);
 
   const handleEditar = (id) => {
     navigate(`/pessoas/editar/${id}`);
@@ -150,6 +157,17 @@ const ListaPessoas = () => {
           </Table>
         </TableContainer>
       )}
+
+      {!erro && totalPages > 1 && (
+        <Box display="flex" justifyContent="center" mt={3}>
+          <Pagination
+            count={totalPages}
+            page={page}
+            onChange={(e, value) => { setPage(value); window.scrollTo({ top: 0, behavior: 'smooth' }); }}
+            color="primary"
+          />
+        </Box>
+      )}
     </Container>
   );
 };
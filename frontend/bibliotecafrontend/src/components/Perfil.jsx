@@ -68,11 +68,11 @@ const Perfil = () => {
     }, [token, navigate, fetchDados]);
     const getStatusChip = (e) => {
         const hoje = new Date();
-        const dataEmp = new Date(e.data_emprestimo + "T00:00:00"); 
-        const prazo = new Date(dataEmp.getTime() + 7 * 24 * 60 * 60 * 1000);
+        // Prazo vem da API (depende da categoria); atrasado só a partir do dia seguinte, como a multa
+        const prazo = e.data_prevista ? new Date(e.data_prevista + "T23:59:59") : null;
         
         const devolvido = e.status !== "ativo" || !!e.data_devolucao;
-        const atrasado = !devolvido && hoje > prazo;
+        const atrasado = !devolvido && !!prazo && hoje > prazo;
 
         if (atrasado) {
             return <Chip label="ATRASADO" color="error" size="small" />;